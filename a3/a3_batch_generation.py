@@ -0,0 +1,178 @@
+"""Generating many documents from one one-word-context model in parallel.
+
+a3_part2.generate_text_owc uses up the follow lists of the model it is given, so every document
+needs its own copy of the model. Here, the model is saved once with a3_model_files and each
+worker process memory-maps it, so the workers share one read-only copy of the follow lists. Each
+document records only the changes its draws would make to the model, in a small overlay, and
+draws from its own random stream, which depends only on the batch seed and the document's index.
+The documents are therefore the same no matter how many workers generate them.
+"""
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from a3_compact_model import CompactOwcModel
+import a3_model_files as model_files
+
+
+@dataclass
+class SharedOwcModel:
+    """A read-only CompactOwcModel, together with the arrays that every document needs.
+
+    Instance Attributes:
+        - model: the model, which must not be modified
+        - lengths: the length of each word's follow list in model
+        - keys: the id of every word with a non-empty follow list, in order
+
+    Representation Invariants:
+        - len(self.lengths) == len(self.model.words)
+        - all(self.lengths[self.keys] > 0)
+    """
+    model: CompactOwcModel
+    lengths: np.ndarray
+    keys: np.ndarray
+
+    @classmethod
+    def from_compact(cls, model: CompactOwcModel) -> 'SharedOwcModel':
+        """Return a SharedOwcModel for model."""
+        lengths = np.diff(model.offsets)
+        return cls(model, lengths, np.flatnonzero(lengths))
+
+    @classmethod
+    def load(cls, directory: str) -> 'SharedOwcModel':
+        """Return a SharedOwcModel for the model saved in directory by save_shared_model, with
+        its follow lists memory-mapped.
+        """
+        return cls.from_compact(CompactOwcModel.from_model_file(
+            model_files.load_owc_model(directory)))
+
+
+def save_shared_model(directory: str, model: CompactOwcModel) -> None:
+    """Save model to directory, to be loaded by SharedOwcModel.load or generate_documents."""
+    model_files.save_owc_model(directory, model.word_count, model.to_dict())
+
+
+def document_seed(seed: int, index: int) -> int:
+    """Return the seed of the random stream of document index in a batch generated with seed.
+
+    The stream is the index-th child of seed, as spawned by np.random.SeedSequence.
+    """
+    state = np.random.SeedSequence(seed, spawn_key=(index,)).generate_state(4, np.uint64)
+    return int.from_bytes(state.tobytes(), 'little')
+
+
+def generate_document(shared: SharedOwcModel, count: int, seed: int) -> str:
+    """Return a string containing (count - 1) randomly generated words drawn from shared with a
+    new random.Random(seed), without modifying shared.
+
+    The words are the same as shared.model.generate(count, seed) returns. Instead of copying the
+    follow lists, only the follow lists and keys that this document changes are recorded.
+
+    Preconditions:
+        - count >= 1
+    """
+    rng = random.Random(seed)
+    offsets = shared.model.offsets
+    followers = shared.model.followers
+
+    # The overlay of this document on shared: the number of words left in each follow list it has
+    # drawn from, the words it has moved within followers, and the same for the list of keys
+    remaining = {}
+    moved_followers = {}
+    key_count = len(shared.keys)
+    moved_keys = {}
+
+    # ACCUMULATOR ids_so_far: the ids of the randomly-generated words so far
+    ids_so_far = []
+    previous = -1
+
+    for _ in range(0, count - 1):
+        length = remaining.get(previous, shared.lengths[previous]) if previous >= 0 else 0
+        if length > 0:
+            start = int(offsets[previous])
+            index = start + rng.randrange(length)
+            last = start + length - 1
+            next_id = moved_followers.get(index, followers[index])
+            moved_followers[index] = moved_followers.get(last, followers[last])
+            remaining[previous] = length - 1
+        else:
+            while True:
+                index = rng.randrange(key_count)
+                next_id = moved_keys.get(index, shared.keys[index])
+                if remaining.get(next_id, shared.lengths[next_id]) > 0:
+                    break
+                key_count -= 1
+                moved_keys[index] = moved_keys.get(key_count, shared.keys[key_count])
+
+        next_id = int(next_id)
+        ids_so_far.append(next_id)
+        previous = next_id
+
+    return str.join(' ', [shared.model.words[i] for i in ids_so_far])
+
+
+# The model loaded by each worker process of generate_documents
+_worker_model: Optional[SharedOwcModel] = None
+
+
+def _load_worker_model(directory: str) -> None:
+    """Load the model saved in directory into this worker process."""
+    global _worker_model
+    _worker_model = SharedOwcModel.load(directory)
+
+
+def _generate_range(task: tuple[int, int, int, int]) -> list[str]:
+    """Return the documents with indexes in range(start, stop) of a batch, where task is a tuple
+    of (start, stop, count, seed), generated from this worker's model.
+    """
+    start, stop, count, seed = task
+    return [generate_document(_worker_model, count, document_seed(seed, index))
+            for index in range(start, stop)]
+
+
+def generate_documents(directory: str, documents: int, count: Optional[int] = None,
+                       seed: int = 0, max_workers: Optional[int] = None,
+                       chunk_size: Optional[int] = None) -> list[str]:
+    """Return documents strings, each of (count - 1) words generated from the model saved in
+    directory by save_shared_model. count defaults to the model's word count.
+
+    Document i is generate_document(model, count, document_seed(seed, i)), so the batch depends
+    only on seed, not on how the documents are shared between the pool of max_workers
+    processes (by default, one per CPU). The documents are sent to the workers in ranges of
+    chunk_size (by default, enough ranges to give each worker four).
+
+    Preconditions:
+        - documents >= 0
+        - count is None or count >= 1
+        - max_workers is None or max_workers >= 1
+        - chunk_size is None or chunk_size >= 1
+    """
+    if count is None:
+        count = model_files.load_owc_model(directory).word_count
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-documents // (max_workers * 4)))
+
+    tasks = [(start, min(start + chunk_size, documents), count, seed)
+             for start in range(0, documents, chunk_size)]
+
+    # ACCUMULATOR documents_so_far: the documents generated so far, in order
+    documents_so_far = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_load_worker_model,
+                             initargs=(directory,)) as executor:
+        for results in executor.map(_generate_range, tasks):
+            documents_so_far.extend(results)
+
+    return documents_so_far
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,183 @@
+"""A compact form of the one-word-context model.
+
+a3_part2.create_model_owc stores a Python list per key holding a reference to a string for
+every transition. CompactOwcModel instead interns every word to an integer id, in order of first
+occurrence, and stores the follow lists in compressed sparse row (CSR) form: the follow list of
+the word with id i is followers[offsets[i]:offsets[i + 1]]. Each transition then takes four
+bytes.
+"""
+import random
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from a3_model_files import OwcModelFile
+
+# The type of the word ids in followers
+ID_DTYPE = np.uint32
+
+
+@dataclass
+class CompactOwcModel:
+    """A one-word-context model with words interned to ids and follow lists in CSR form.
+
+    Instance Attributes:
+        - word_count: the word count returned by a3_part2.create_model_owc with the model
+        - words: the word with each id
+        - offsets: the index in followers of the first word of each id's follow list, followed
+          by len(followers)
+        - followers: the id of every word of every follow list
+
+    Representation Invariants:
+        - len(self.offsets) == len(self.words) + 1
+        - self.offsets[-1] == len(self.followers)
+        - all(self.offsets[:-1] <= self.offsets[1:])
+    """
+    word_count: int
+    words: list[str]
+    offsets: np.ndarray
+    followers: np.ndarray
+
+    @classmethod
+    def from_ids(cls, word_count: int, words: list[str], token_ids: np.ndarray) -> \
+            'CompactOwcModel':
+        """Return the CompactOwcModel of a text whose i-th word is words[token_ids[i]].
+
+        The follow lists are grouped by a stable sort, so each keeps the order of the text.
+        """
+        counts = np.bincount(token_ids[:-1], minlength=len(words))
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        order = np.argsort(token_ids[:-1], kind='stable')
+
+        return cls(word_count, words, offsets, token_ids[1:][order].astype(ID_DTYPE))
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[str]) -> 'CompactOwcModel':
+        """Return the CompactOwcModel of the sequence of words in tokens, making a single pass
+        over tokens.
+
+        Preconditions:
+            - tokens has at least two words
+            - tokens has fewer than 2 ** 32 distinct words
+        """
+        # ACCUMULATOR ids_so_far: the id of each word seen so far
+        ids_so_far = {}
+        token_ids = array('I', (ids_so_far.setdefault(token, len(ids_so_far))
+                                for token in tokens))
+
+        return cls.from_ids(len(token_ids), list(ids_so_far),
+                            np.frombuffer(token_ids, dtype=ID_DTYPE))
+
+    @classmethod
+    def from_text(cls, text: str) -> 'CompactOwcModel':
+        """Return the CompactOwcModel of text, equivalent to a3_part2.create_model_owc(text).
+
+        Preconditions:
+            - len(str.split(text)) > 1
+        """
+        return cls.from_tokens(text.split())
+
+    @classmethod
+    def from_dict(cls, word_count: int, model: dict[str, list[str]]) -> 'CompactOwcModel':
+        """Return the CompactOwcModel of model and its word_count, as returned by
+        a3_part2.create_model_owc or built with a3_part2.update_follow_list.
+
+        Preconditions:
+            - model has fewer than 2 ** 32 distinct words
+        """
+        # ACCUMULATOR ids_so_far: the id of each word seen so far, keys first
+        ids_so_far = {key: i for i, key in enumerate(model)}
+        followers = array('I', (ids_so_far.setdefault(word, len(ids_so_far))
+                                for follow_list in model.values() for word in follow_list))
+
+        offsets = np.zeros(len(ids_so_far) + 1, dtype=np.int64)
+        np.cumsum([len(follow_list) for follow_list in model.values()],
+                  out=offsets[1:len(model) + 1])
+        offsets[len(model) + 1:] = len(followers)
+
+        return cls(word_count, list(ids_so_far), offsets,
+                   np.frombuffer(followers, dtype=ID_DTYPE))
+
+    @classmethod
+    def from_model_file(cls, model_file: OwcModelFile) -> 'CompactOwcModel':
+        """Return the CompactOwcModel of a model loaded with a3_model_files.load_owc_model.
+
+        The followers array stays memory-mapped.
+        """
+        words = model_file.words.to_list()
+        offsets = np.full(len(words) + 1, len(model_file.follows), dtype=np.int64)
+        offsets[:len(model_file.follow_offsets)] = model_file.follow_offsets
+
+        return cls(model_file.word_count, words, offsets, model_file.follows)
+
+    def to_dict(self) -> dict[str, list[str]]:
+        """Return this model in the format returned by a3_part2.create_model_owc."""
+        followers = [self.words[i] for i in self.followers.tolist()]
+        offsets = self.offsets.tolist()
+
+        return {self.words[i]: followers[offsets[i]:offsets[i + 1]]
+                for i in range(len(self.words)) if offsets[i] < offsets[i + 1]}
+
+    def nbytes(self) -> int:
+        """Return the number of bytes used by the offsets and followers arrays."""
+        return self.offsets.nbytes + self.followers.nbytes
+
+    def generate(self, count: Optional[int] = None, seed: Optional[int] = None) -> str:
+        """Return a string containing (count - 1) randomly generated words, like
+        a3_part2.generate_text_owc, without modifying this model. count defaults to
+        self.word_count.
+
+        With seed None, the words are drawn from the random module, and are the same words that
+        generate_text_owc(count, self.to_dict()) would return from the same random state. With
+        any other seed, they are drawn from a new random.Random(seed).
+
+        Preconditions:
+            - count is None or count >= 1
+        """
+        rng = random if seed is None else random.Random(seed)
+        if count is None:
+            count = self.word_count
+
+        # The working state of the generation, in the same form as the dict version uses: each
+        # follow list is drawn from by swapping with its last remaining word, and keys is a list
+        # of candidate keys from which emptied keys are discarded when drawn
+        offsets = array('q', self.offsets.astype(np.int64).tobytes())
+        followers = array('I', np.ascontiguousarray(self.followers, dtype=ID_DTYPE).tobytes())
+        lengths = np.diff(self.offsets)
+        remaining = array('q', lengths.astype(np.int64).tobytes())
+        keys = array('I', np.flatnonzero(lengths).astype(ID_DTYPE).tobytes())
+
+        # ACCUMULATOR ids_so_far: the ids of the randomly-generated words so far
+        ids_so_far = array('I')
+        previous = -1
+
+        for _ in range(0, count - 1):
+            if previous >= 0 and remaining[previous] > 0:
+                length = remaining[previous]
+                index = offsets[previous] + rng.randrange(length)
+                next_id = followers[index]
+                followers[index] = followers[offsets[previous] + length - 1]
+                remaining[previous] = length - 1
+            else:
+                while True:
+                    index = rng.randrange(len(keys))
+                    next_id = keys[index]
+                    if remaining[next_id] > 0:
+                        break
+                    keys[index] = keys[-1]
+                    keys.pop()
+
+            ids_so_far.append(next_id)
+            previous = next_id
+
+        return str.join(' ', [self.words[i] for i in ids_so_far])
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,156 @@
+"""Reprocessing many station-seasons in parallel with a process pool.
+
+Every station-season is independent of the others, so they are split into shards and calculated
+in separate worker processes. Each shard is sent to its worker as the NumPy structured arrays
+behind WeatherColumns, which pickle as one compact buffer each, rather than as lists of
+dataclasses.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from a3_ffwi_columns import WeatherColumns, FfwiColumns
+import a3_ffwi_vectorized as vffwi
+
+# The fewest seasons of the same length that are stacked and stepped through together, one per
+# column. Each day of a stacked run costs about as much as a single season's day calculated on
+# its own with vffwi.calculate_station_season, up to about this many seasons.
+MIN_STACKED_SEASONS = 32
+
+
+@dataclass
+class WorkerThroughput:
+    """The amount of work done by one worker process during a call to reprocess_seasons.
+
+    Instance Attributes:
+        - pid: the process id of the worker
+        - seasons: the number of station-seasons the worker calculated
+        - rows: the number of daily readings in those station-seasons
+        - seconds: the time the worker spent calculating them
+
+    Representation Invariants:
+        - self.seasons >= 0
+        - self.rows >= 0
+        - self.seconds >= 0.0
+    """
+    pid: int
+    seasons: int
+    rows: int
+    seconds: float
+
+    def rows_per_second(self) -> float:
+        """Return the number of daily readings this worker calculated per second."""
+        return self.rows / self.seconds if self.seconds > 0.0 else 0.0
+
+
+@dataclass
+class BatchReport:
+    """A summary of a call to reprocess_seasons.
+
+    Instance Attributes:
+        - workers: the throughput of each worker process that took part
+        - seconds: the total wall-clock time of the call
+    """
+    workers: list[WorkerThroughput]
+    seconds: float
+
+    def rows_per_second(self) -> float:
+        """Return the number of daily readings calculated per second of wall-clock time."""
+        rows = sum(worker.rows for worker in self.workers)
+        return rows / self.seconds if self.seconds > 0.0 else 0.0
+
+
+def calculate_shard(shard: list[np.ndarray]) -> list[np.ndarray]:
+    """Return the FfwiColumns data calculated for each WeatherColumns data array in shard, in
+    order, with each array as a separate season starting from the initial values.
+
+    At least MIN_STACKED_SEASONS seasons with the same number of days are calculated together,
+    one station per column; every other season is calculated on its own.
+    """
+    results = [np.empty(0)] * len(shard)
+
+    seasons_by_length = {}
+    for i, season in enumerate(shard):
+        seasons_by_length.setdefault(len(season), []).append(i)
+
+    for indexes in seasons_by_length.values():
+        if len(indexes) < MIN_STACKED_SEASONS:
+            for i in indexes:
+                outputs = vffwi.calculate_station_season(
+                    shard[i]['month'], shard[i]['temperature'], shard[i]['humidity'],
+                    shard[i]['wind_speed'], shard[i]['precipitation'])
+                results[i] = FfwiColumns.from_arrays(shard[i]['month'], shard[i]['day'],
+                                                     *outputs).data
+            continue
+
+        stacked = np.stack([shard[i] for i in indexes], axis=1)
+        outputs = vffwi.calculate_season(stacked['month'], stacked['temperature'],
+                                         stacked['humidity'], stacked['wind_speed'],
+                                         stacked['precipitation'])
+        for column, i in enumerate(indexes):
+            results[i] = FfwiColumns.from_arrays(shard[i]['month'], shard[i]['day'],
+                                                 *(values[:, column] for values in outputs)).data
+
+    return results
+
+
+def _timed_shard(shard: list[np.ndarray]) -> tuple[list[np.ndarray], WorkerThroughput]:
+    """Return the results of calculate_shard(shard) together with the WorkerThroughput for it."""
+    start = time.perf_counter()
+    results = calculate_shard(shard)
+    seconds = time.perf_counter() - start
+
+    return results, WorkerThroughput(os.getpid(), len(shard), sum(len(s) for s in shard), seconds)
+
+
+def reprocess_seasons(seasons: list[WeatherColumns], max_workers: Optional[int] = None,
+                      shard_size: Optional[int] = None) -> tuple[list[FfwiColumns], BatchReport]:
+    """Return the FfwiColumns for every station-season in seasons, in the same order, together
+    with a BatchReport of how the work was shared between the worker processes.
+
+    Each season starts from the initial FFMC, DMC, and DC values. The seasons are split into
+    shards of shard_size seasons, which are calculated by a pool of max_workers processes (by
+    default, one per CPU and enough shards to give each worker four).
+
+    Preconditions:
+        - every season in seasons is sorted in chronological order
+        - max_workers is None or max_workers >= 1
+        - shard_size is None or shard_size >= 1
+    """
+    start = time.perf_counter()
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if shard_size is None:
+        shard_size = max(1, -(-len(seasons) // (max_workers * 4)))
+
+    shards = [[season.data for season in seasons[i:i + shard_size]]
+              for i in range(0, len(seasons), shard_size)]
+
+    # ACCUMULATOR results_so_far: the FfwiColumns calculated so far, in the order of seasons
+    results_so_far = []
+    # ACCUMULATOR workers_so_far: the throughput of each worker process seen so far, by pid
+    workers_so_far = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for results, throughput in executor.map(_timed_shard, shards):
+            results_so_far.extend(FfwiColumns(data) for data in results)
+
+            total = workers_so_far.setdefault(throughput.pid,
+                                              WorkerThroughput(throughput.pid, 0, 0, 0.0))
+            total.seasons += throughput.seasons
+            total.rows += throughput.rows
+            total.seconds += throughput.seconds
+
+    return results_so_far, BatchReport(list(workers_so_far.values()),
+                                       time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,360 @@
+"""Benchmarks for the FFWI equations, the season calculation, and data loading.
+
+Run this module as a script to time every benchmark at a range of sizes, save the results as JSON,
+and optionally compare them against a stored baseline:
+
+    python a3_ffwi_benchmarks.py --output results.json --baseline baseline.json
+
+The script exits with status 1 if any benchmark is slower than the baseline by more than the
+regression threshold. Pass --save-baseline to store the new results as the baseline instead.
+Every run also compares each new path in PATH_BASELINES, such as the columnar and vectorized
+paths, against the path it replaces at the same size, and exits with status 1 if a new path is
+slower by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from a3_ffwi_system import WeatherMetrics
+from a3_ffwi_columns import WeatherColumns
+import a3_ffwi_columns as columns
+import a3_ffwi_io as ffwi_io
+import a3_ffwi_system as ffwi
+import a3_ffwi_test_data as test_data
+import a3_ffwi_vectorized as vffwi
+import a3_part4
+
+# The default number of rows for each benchmark: 10 ** 2 to 10 ** 6
+DEFAULT_SIZES = [10 ** exponent for exponent in range(2, 7)]
+
+# The default largest number of rows for benchmarks that loop over rows in Python
+DEFAULT_MAX_PYTHON_ROWS = 10 ** 5
+
+# The benchmarks, other than those in _scalar_benchmarks, that loop over rows in Python and so
+# are only run up to the largest number of rows for those benchmarks
+PER_ROW_BENCHMARKS = frozenset({
+    'part4.calculate_ffwi_outputs[columnar]', 'part4.load_data', 'part4.load_and_calculate',
+    'io.iter_outputs', 'io.process_file'
+})
+
+# Benchmarks of new paths, mapped to the benchmark of the path each one replaces or speeds up
+PATH_BASELINES = {
+    'vectorized.calculate_ffmc': 'ffwi_system.calculate_ffmc',
+    'vectorized.calculate_dmc': 'ffwi_system.calculate_dmc',
+    'vectorized.calculate_dc': 'ffwi_system.calculate_dc',
+    'vectorized.calculate_isi': 'ffwi_system.calculate_isi',
+    'vectorized.calculate_bui': 'ffwi_system.calculate_bui',
+    'vectorized.calculate_fwi': 'ffwi_system.calculate_fwi',
+    'part4.calculate_ffwi_outputs[columnar]': 'part4.calculate_ffwi_outputs',
+    'part4.load_data[columnar]': 'part4.load_data',
+    'io.iter_chunks': 'part4.load_data',
+    'io.iter_outputs': 'part4.load_and_calculate',
+}
+
+# The default fraction by which a benchmark may be slower than its baseline
+DEFAULT_THRESHOLD = 0.25
+
+# Benchmarks that take less time than this are never reported as regressions, since their timing
+# is dominated by noise
+MIN_REGRESSION_SECONDS = 1e-4
+
+# New paths that take less time than this are never reported as slower than the paths they
+# replace, since below it the fixed cost of each NumPy call, which the array paths only pay back
+# over many rows, dominates their timing
+MIN_SLOWER_PATH_SECONDS = 1e-3
+
+
+def generate_previous_codes(n: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return n random previous-day FFMC, DMC, and DC values that take every branch of the FFWI
+    equations, including FFMC values low enough for mo > 150.0 and DMC/DC values high enough for
+    a BUI above 80.0.
+
+    Preconditions:
+        - n >= 0
+    """
+    rng = np.random.default_rng(seed + 1)
+    return rng.uniform(0.0, 101.0, n), rng.uniform(0.0, 300.0, n), rng.uniform(0.0, 800.0, n)
+
+
+def branch_counts(weather: WeatherColumns, f0: np.ndarray, dm0: np.ndarray,
+                  dc0: np.ndarray) -> dict[str, int]:
+    """Return the number of readings in weather that take each branch of the FFWI equations,
+    given the previous day's FFMC, DMC, and DC in f0, dm0, and dc0.
+    """
+    month, temperature, humidity, precipitation = \
+        (weather.column(name) for name in ('month', 'temperature', 'humidity', 'precipitation'))
+    mo = (147.2 * (101.0 - f0)) / (59.5 + f0)
+    bui = vffwi.calculate_bui(vffwi.calculate_dmc(month, temperature, humidity, precipitation, dm0),
+                              vffwi.calculate_dc(month, temperature, precipitation, dc0))
+
+    return {
+        'rain <= 0.5': int(np.sum(precipitation <= 0.5)),
+        '0.5 < rain <= 1.5': int(np.sum((precipitation > 0.5) & (precipitation <= 1.5))),
+        '1.5 < rain <= 2.8': int(np.sum((precipitation > 1.5) & (precipitation <= 2.8))),
+        'rain > 2.8': int(np.sum(precipitation > 2.8)),
+        'equation 3b': int(np.sum((precipitation > 0.5) & (mo > 150.0))),
+        'equation 13b': int(np.sum((precipitation > 1.5) & (dm0 > 33.0) & (dm0 <= 65.0))),
+        'equation 13c': int(np.sum((precipitation > 1.5) & (dm0 > 65.0))),
+        'bui > 80': int(np.sum(bui > 80.0)),
+    }
+
+
+def time_call(function: Callable[[], Any], repeat: int) -> float:
+    """Return the shortest time, in seconds, taken by repeat calls to function."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def _scalar_benchmarks(records: list[WeatherMetrics], f0: list[float], dm0: list[float],
+                       dc0: list[float]) -> dict[str, Callable[[], Any]]:
+    """Return a benchmark for each public function in a3_ffwi_system, applied to every record."""
+    rain = [max(wm.precipitation, 2.9) for wm in records]
+    mo = [(147.2 * (101.0 - f)) / (59.5 + f) for f in f0]
+
+    return {
+        'ffwi_system.calculate_mr':
+            lambda: [ffwi.calculate_mr(r, m) for r, m in zip(rain, mo)],
+        'ffwi_system.calculate_m':
+            lambda: [ffwi.calculate_m(wm, 15.0, min(m, 250.0)) for wm, m in zip(records, mo)],
+        'ffwi_system.calculate_ffmc':
+            lambda: [ffwi.calculate_ffmc(wm, f) for wm, f in zip(records, f0)],
+        'ffwi_system.calculate_dmr':
+            lambda: [ffwi.calculate_dmr(r, d) for r, d in zip(rain, dm0)],
+        'ffwi_system.calculate_dmc_k':
+            lambda: [ffwi.calculate_dmc_k(wm.temperature, wm.humidity, wm.month)
+                     for wm in records],
+        'ffwi_system.calculate_dmc':
+            lambda: [ffwi.calculate_dmc(wm, d) for wm, d in zip(records, dm0)],
+        'ffwi_system.calculate_qr':
+            lambda: [ffwi.calculate_qr(r, d) for r, d in zip(rain, dc0)],
+        'ffwi_system.calculate_dc':
+            lambda: [ffwi.calculate_dc(wm, d) for wm, d in zip(records, dc0)],
+        'ffwi_system.calculate_isi':
+            lambda: [ffwi.calculate_isi(wm, f) for wm, f in zip(records, f0)],
+        'ffwi_system.calculate_bui':
+            lambda: [ffwi.calculate_bui(d, c) for d, c in zip(dm0, dc0)],
+        'ffwi_system.calculate_fwi':
+            lambda: [ffwi.calculate_fwi(i, b) for i, b in zip(f0, dm0)],
+        'part4.calculate_ffwi_outputs':
+            lambda: a3_part4.calculate_ffwi_outputs(records),
+    }
+
+
+def _array_benchmarks(weather: WeatherColumns, f0: np.ndarray, dm0: np.ndarray,
+                      dc0: np.ndarray) -> dict[str, Callable[[], Any]]:
+    """Return a benchmark for the array equations and the columnar season calculation."""
+    month, temperature, humidity, wind_speed, precipitation = \
+        (weather.column(name) for name in ('month', 'temperature', 'humidity', 'wind_speed',
+                                           'precipitation'))
+
+    return {
+        'vectorized.calculate_ffmc':
+            lambda: vffwi.calculate_ffmc(temperature, humidity, wind_speed, precipitation, f0),
+        'vectorized.calculate_dmc':
+            lambda: vffwi.calculate_dmc(month, temperature, humidity, precipitation, dm0),
+        'vectorized.calculate_dc':
+            lambda: vffwi.calculate_dc(month, temperature, precipitation, dc0),
+        'vectorized.calculate_isi': lambda: vffwi.calculate_isi(wind_speed, f0),
+        'vectorized.calculate_bui': lambda: vffwi.calculate_bui(dm0, dc0),
+        'vectorized.calculate_fwi': lambda: vffwi.calculate_fwi(f0, dm0),
+        'vectorized.calculate_all':
+            lambda: vffwi.calculate_all(month, temperature, humidity, wind_speed, precipitation,
+                                        f0, dm0, dc0),
+        'part4.calculate_ffwi_outputs[columnar]':
+            lambda: a3_part4.calculate_ffwi_outputs(weather),
+    }
+
+
+def _load_benchmarks(filename: str) -> dict[str, Callable[[], Any]]:
+    """Return a benchmark for each way of loading the weather file filename."""
+    return {
+        'part4.load_data': lambda: a3_part4.load_data(filename),
+        'part4.load_data[columnar]': lambda: a3_part4.load_data(filename, columnar=True),
+        'part4.load_and_calculate':
+            lambda: a3_part4.calculate_ffwi_outputs(a3_part4.load_data(filename)[0]),
+        'io.iter_chunks': lambda: sum(len(w) for w, _ in ffwi_io.iter_chunks(filename)),
+        'io.iter_outputs': lambda: sum(len(o) for _, o in ffwi_io.iter_outputs(filename)),
+        'io.process_file': lambda: ffwi_io.process_file(filename, os.devnull),
+    }
+
+
+def run_benchmarks(sizes: list[int], max_python_rows: int = DEFAULT_MAX_PYTHON_ROWS,
+                   repeat: int = 3, seed: int = 0,
+                   log: Optional[Callable[[str], None]] = None) -> dict[str, dict[str, float]]:
+    """Return a mapping of benchmark names to their scaling curves, each a mapping from the
+    number of rows (as a string, like the JSON it is saved to) to the best time in seconds.
+
+    Benchmarks that loop over rows in Python, which are the scalar benchmarks and those in
+    PER_ROW_BENCHMARKS, are skipped for sizes above max_python_rows. The repeats of the
+    benchmarks at each size are interleaved, one run of every benchmark at a time, so that a
+    slow period of the machine affects every benchmark and not just the paths compared by
+    find_slower_paths on one side. If log is given, it is called with a line of text after each
+    benchmark size.
+
+    Preconditions:
+        - all(n >= 1 for n in sizes)
+        - repeat >= 1
+    """
+    # ACCUMULATOR results_so_far: the scaling curve of each benchmark measured so far
+    results_so_far = {}
+
+    for n in sizes:
+        weather = test_data.generate_weather(n, seed)
+        f0, dm0, dc0 = generate_previous_codes(n, seed)
+
+        benchmarks = _array_benchmarks(weather, f0, dm0, dc0)
+        if n <= max_python_rows:
+            benchmarks.update(_scalar_benchmarks(list(weather), f0.tolist(), dm0.tolist(),
+                                                 dc0.tolist()))
+
+        # The outputs in the file are only parsed, not checked, so they are calculated from the
+        # random previous-day codes with the array equations rather than chained in Python
+        outputs = columns.FfwiColumns.from_arrays(
+            weather.column('month'), weather.column('day'),
+            *vffwi.calculate_all(*(weather.column(name) for name in
+                                   ('month', 'temperature', 'humidity', 'wind_speed',
+                                    'precipitation')), f0, dm0, dc0))
+        fd, filename = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(ffwi_io.HEADER + '\n')
+                ffwi_io.write_chunk(f, weather, outputs)
+            benchmarks.update(_load_benchmarks(filename))
+            benchmarks = {name: function for name, function in benchmarks.items()
+                          if name not in PER_ROW_BENCHMARKS or n <= max_python_rows}
+
+            # ACCUMULATOR best_so_far: the shortest time of each benchmark so far
+            best_so_far = dict.fromkeys(benchmarks, float('inf'))
+            for _ in range(repeat):
+                for name, function in benchmarks.items():
+                    best_so_far[name] = min(best_so_far[name], time_call(function, 1))
+        finally:
+            os.remove(filename)
+
+        for name, seconds in best_so_far.items():
+            results_so_far.setdefault(name, {})[str(n)] = seconds
+            if log is not None:
+                log(f'{name:45} {n:>10} rows {seconds:12.6f} s')
+
+    return results_so_far
+
+
+def find_regressions(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+                     threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Return a description of every benchmark size in results that is slower than the same
+    benchmark size in baseline by more than the fraction threshold.
+
+    Sizes that only appear in one of results and baseline are ignored, as are sizes that take
+    less than MIN_REGRESSION_SECONDS.
+
+    Preconditions:
+        - threshold >= 0.0
+    """
+    # ACCUMULATOR regressions_so_far: the regressions found so far
+    regressions_so_far = []
+
+    for name, curve in results.items():
+        for n, seconds in curve.items():
+            if n not in baseline.get(name, {}) or seconds < MIN_REGRESSION_SECONDS:
+                continue
+            expected = baseline[name][n]
+            if seconds > expected * (1.0 + threshold):
+                regressions_so_far.append(f'{name} at {n} rows: {seconds:.6f} s, baseline '
+                                          f'{expected:.6f} s (+{seconds / expected - 1.0:.0%})')
+
+    return regressions_so_far
+
+
+def find_slower_paths(results: dict[str, dict[str, float]],
+                      threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Return a description of every benchmark size in results at which a path in PATH_BASELINES
+    is slower than the path it replaces, at the same size, by more than the fraction threshold.
+
+    Sizes at which either path was not run are ignored, as are sizes at which the new path takes
+    less than MIN_SLOWER_PATH_SECONDS.
+
+    Preconditions:
+        - threshold >= 0.0
+    """
+    # ACCUMULATOR slower_so_far: the slower paths found so far
+    slower_so_far = []
+
+    for name, baseline_name in PATH_BASELINES.items():
+        for n, seconds in results.get(name, {}).items():
+            expected = results.get(baseline_name, {}).get(n)
+            if expected is None or seconds < MIN_SLOWER_PATH_SECONDS:
+                continue
+            if seconds > expected * (1.0 + threshold):
+                slower_so_far.append(f'{name} at {n} rows: {seconds:.6f} s, '
+                                     f'{seconds / expected:.1f}x {baseline_name} '
+                                     f'({expected:.6f} s)')
+
+    return slower_so_far
+
+
+def save_results(filename: str, results: dict[str, dict[str, float]]) -> None:
+    """Save results to filename as JSON, together with a description of the environment."""
+    with open(filename, 'w') as f:
+        json.dump({'python': platform.python_version(), 'numpy': np.__version__,
+                   'machine': platform.machine(), 'results': results}, f, indent=2)
+
+
+def load_results(filename: str) -> dict[str, dict[str, float]]:
+    """Return the results saved to filename by save_results."""
+    with open(filename) as f:
+        return json.load(f)['results']
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the benchmarks from the command line and return the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='the numbers of rows to benchmark')
+    parser.add_argument('--max-python-rows', type=int, default=DEFAULT_MAX_PYTHON_ROWS,
+                        help='the largest size for benchmarks that loop in Python')
+    parser.add_argument('--repeat', type=int, default=3, help='the runs per benchmark size')
+    parser.add_argument('--output', default='ffwi_benchmarks.json',
+                        help='where to save the results as JSON')
+    parser.add_argument('--baseline', help='a JSON file of results to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='the fraction slower than the baseline counted as a regression')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results to --baseline instead of comparing')
+    args = parser.parse_args(argv)
+    if args.save_baseline and args.baseline is None:
+        parser.error('--save-baseline requires --baseline')
+
+    results = run_benchmarks(args.sizes, args.max_python_rows, args.repeat, log=print)
+    save_results(args.output, results)
+
+    slower_paths = find_slower_paths(results, args.threshold)
+    for slower_path in slower_paths:
+        print('SLOWER THAN BASELINE PATH:', slower_path, file=sys.stderr)
+
+    if args.baseline is None:
+        return 1 if slower_paths else 0
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        return 1 if slower_paths else 0
+
+    regressions = find_regressions(results, load_results(args.baseline), args.threshold)
+    for regression in regressions:
+        print('REGRESSION:', regression, file=sys.stderr)
+
+    return 1 if regressions or slower_paths else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
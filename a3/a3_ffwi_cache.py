@@ -0,0 +1,152 @@
+"""A binary cache of parsed FFWI weather files.
+
+The first time a weather file is loaded through load_cached (or a3_part4.load_data with
+cache=True), its parsed WeatherColumns and FfwiColumns are saved as .npy files in a cache
+directory. Later loads memory-map those files instead of parsing the text again, as long as the
+size and modification time of the weather file have not changed since.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import BinaryIO, Callable, Optional
+
+import numpy as np
+
+from a3_ffwi_columns import WeatherColumns, FfwiColumns
+import a3_ffwi_io as ffwi_io
+
+# The name of the default cache directory, created next to each weather file
+DEFAULT_CACHE_DIRECTORY = '__ffwi_cache__'
+
+# The length, in hexadecimal digits, of the digest in the name of every cache file
+_DIGEST_LENGTH = 16
+
+# The names of the files written by load_cached: '<weather file name>.<digest>' followed by one of
+# the cache extensions, and for a temporary file, the random part and suffix added by mkstemp
+_CACHE_FILE_NAME = re.compile(r'.+\.[0-9a-f]{%d}\.(json|weather\.npy|ffwi\.npy)'
+                              r'(\.[A-Za-z0-9_]+\.tmp)?' % _DIGEST_LENGTH)
+
+
+def _cache_prefix(filename: str, cache_dir: Optional[str]) -> str:
+    """Return the path, without an extension, shared by every cache file for filename.
+
+    The name includes a hash of the absolute path of filename, so weather files with the same
+    name in different directories can share a cache directory.
+    """
+    source = os.path.abspath(filename)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source), DEFAULT_CACHE_DIRECTORY)
+
+    digest = hashlib.sha1(source.encode()).hexdigest()[:_DIGEST_LENGTH]
+    return os.path.join(cache_dir, f'{os.path.basename(source)}.{digest}')
+
+
+def _source_signature(filename: str) -> dict[str, int]:
+    """Return the size and modification time of filename, which identify its current contents."""
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _write_atomically(path: str, write: Callable[[BinaryIO], None]) -> None:
+    """Call write with a new temporary file in the same directory as path, and then replace path
+    with the temporary file, so path is only replaced once it has been written in full.
+
+    The temporary file has a unique name, so processes writing the same cache file at the same
+    time never write to each other's temporary files.
+    """
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def is_cached(filename: str, cache_dir: Optional[str] = None) -> bool:
+    """Return whether there is an up-to-date cache of filename in cache_dir."""
+    prefix = _cache_prefix(filename, cache_dir)
+    try:
+        with open(prefix + '.json') as f:
+            signature = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    return signature == _source_signature(filename) and os.path.exists(prefix + '.weather.npy') \
+        and os.path.exists(prefix + '.ffwi.npy')
+
+
+def load_cached(filename: str, cache_dir: Optional[str] = None) -> \
+        tuple[WeatherColumns, FfwiColumns]:
+    """Return the WeatherColumns and FfwiColumns for the weather file filename.
+
+    If cache_dir contains an up-to-date cache of filename, the columns are memory-mapped from it
+    without parsing filename (and are read-only). Otherwise, filename is parsed and the cache is
+    written before returning. By default, cache_dir is a directory named DEFAULT_CACHE_DIRECTORY
+    in the same directory as filename.
+
+    Preconditions:
+        - filename is in the format described in a3_part4.load_data
+    """
+    prefix = _cache_prefix(filename, cache_dir)
+
+    if not is_cached(filename, cache_dir):
+        signature = _source_signature(filename)
+        chunks = list(ffwi_io.iter_chunks(filename))
+        weather = np.concatenate([w.data for w, _ in chunks]) if chunks else \
+            WeatherColumns.from_records([]).data
+        outputs = np.concatenate([o.data for _, o in chunks]) if chunks else \
+            FfwiColumns.from_records([], []).data
+
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        _write_atomically(prefix + '.weather.npy', lambda f: np.save(f, weather))
+        _write_atomically(prefix + '.ffwi.npy', lambda f: np.save(f, outputs))
+        # The signature is written last, so the cache is only valid once both arrays are saved
+        _write_atomically(prefix + '.json', lambda f: f.write(json.dumps(signature).encode()))
+
+    return (WeatherColumns(np.load(prefix + '.weather.npy', mmap_mode='r')),
+            FfwiColumns(np.load(prefix + '.ffwi.npy', mmap_mode='r')))
+
+
+def invalidate(filename: str, cache_dir: Optional[str] = None) -> None:
+    """Remove the cache of filename from cache_dir, if there is one."""
+    prefix = _cache_prefix(filename, cache_dir)
+    for extension in ('.json', '.weather.npy', '.ffwi.npy'):
+        if os.path.exists(prefix + extension):
+            os.remove(prefix + extension)
+
+
+def clear_cache(cache_dir: str) -> int:
+    """Remove every cache file written by load_cached from cache_dir, including temporary files
+    left by an interrupted write, and cache_dir itself if it is then empty. Return the number of
+    files removed.
+
+    Other files in cache_dir are left alone.
+    """
+    # ACCUMULATOR removed_so_far: the number of cache files removed so far
+    removed_so_far = 0
+
+    if not os.path.isdir(cache_dir):
+        return removed_so_far
+
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if _CACHE_FILE_NAME.fullmatch(name) and os.path.isfile(path):
+            os.remove(path)
+            removed_so_far += 1
+
+    if os.listdir(cache_dir) == []:
+        os.rmdir(cache_dir)
+
+    return removed_so_far
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,210 @@
+"""Compact columnar storage for WeatherMetrics and FfwiOutput.
+
+A list of dataclass instances stores every row as a separate Python object with its own __dict__
+and a separate float object per attribute. The containers in this module store all rows in one
+NumPy structured array instead, and only create a WeatherMetrics or FfwiOutput when a single row
+is asked for.
+"""
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+from a3_ffwi_system import WeatherMetrics, FfwiOutput
+
+import a3_ffwi_system as ffwi
+import a3_ffwi_vectorized as vffwi
+
+# The layout of one row of WeatherColumns
+WEATHER_DTYPE = np.dtype([('month', np.uint8), ('day', np.uint8), ('temperature', np.float64),
+                          ('humidity', np.float64), ('wind_speed', np.float64),
+                          ('precipitation', np.float64)])
+
+# The layout of one row of FfwiColumns. The month and day are kept alongside the outputs so that
+# the rows can be labelled without the WeatherColumns they were calculated from.
+FFWI_DTYPE = np.dtype([('month', np.uint8), ('day', np.uint8), ('ffmc', np.float64),
+                       ('dmc', np.float64), ('dc', np.float64), ('isi', np.float64),
+                       ('bui', np.float64), ('fwi', np.float64)])
+
+
+@dataclass
+class WeatherColumns:
+    """A sequence of WeatherMetrics stored column by column in a NumPy structured array.
+
+    Indexing with an int returns a new WeatherMetrics for that row; indexing with a slice returns
+    a WeatherColumns that shares memory with this one.
+
+    Instance Attributes:
+        - data: the rows, with the fields in WEATHER_DTYPE
+
+    Representation Invariants:
+        - self.data.dtype == WEATHER_DTYPE
+        - self.data.ndim == 1
+    """
+    data: np.ndarray
+
+    @classmethod
+    def from_records(cls, records: Iterable[WeatherMetrics]) -> 'WeatherColumns':
+        """Return a WeatherColumns containing the given records, in order."""
+        return cls(np.array([(wm.month, wm.day, wm.temperature, wm.humidity, wm.wind_speed,
+                              wm.precipitation) for wm in records], dtype=WEATHER_DTYPE))
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the values of the attribute name for every row, without copying them.
+
+        Preconditions:
+            - name in WEATHER_DTYPE.names
+        """
+        return self.data[name]
+
+    def nbytes_per_row(self) -> int:
+        """Return the number of bytes used to store each row."""
+        return self.data.itemsize
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, (int, np.integer)):
+            return WeatherMetrics(*self.data[index].item())
+        return WeatherColumns(self.data[index])
+
+    def __iter__(self) -> Iterator[WeatherMetrics]:
+        for row in self.data.tolist():
+            yield WeatherMetrics(*row)
+
+
+@dataclass
+class FfwiColumns:
+    """A sequence of FfwiOutput, together with the (month, day) of each one, stored column by
+    column in a NumPy structured array.
+
+    Indexing with an int returns a new FfwiOutput for that row; indexing with a slice returns an
+    FfwiColumns that shares memory with this one.
+
+    Instance Attributes:
+        - data: the rows, with the fields in FFWI_DTYPE
+
+    Representation Invariants:
+        - self.data.dtype == FFWI_DTYPE
+        - self.data.ndim == 1
+    """
+    data: np.ndarray
+
+    @classmethod
+    def from_records(cls, dates: Iterable[tuple[int, int]],
+                     records: Iterable[FfwiOutput]) -> 'FfwiColumns':
+        """Return an FfwiColumns containing the given (month, day) dates and their corresponding
+        records, in order.
+        """
+        return cls(np.array([(month, day, fo.ffmc, fo.dmc, fo.dc, fo.isi, fo.bui, fo.fwi)
+                             for (month, day), fo in zip(dates, records)], dtype=FFWI_DTYPE))
+
+    @classmethod
+    def from_arrays(cls, month: np.ndarray, day: np.ndarray, ffmc: np.ndarray, dmc: np.ndarray,
+                    dc: np.ndarray, isi: np.ndarray, bui: np.ndarray,
+                    fwi: np.ndarray) -> 'FfwiColumns':
+        """Return an FfwiColumns whose columns contain the values in the given arrays.
+
+        Preconditions:
+            - all the arrays have the same length
+        """
+        data = np.empty(len(month), dtype=FFWI_DTYPE)
+        for name, values in zip(FFWI_DTYPE.names, (month, day, ffmc, dmc, dc, isi, bui, fwi)):
+            data[name] = values
+
+        return cls(data)
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the values of the attribute name for every row, without copying them.
+
+        Preconditions:
+            - name in FFWI_DTYPE.names
+        """
+        return self.data[name]
+
+    def dates(self) -> list[tuple[int, int]]:
+        """Return the (month, day) of every row, in order."""
+        return list(zip(self.data['month'].tolist(), self.data['day'].tolist()))
+
+    def to_dict(self) -> dict[tuple[int, int], FfwiOutput]:
+        """Return these rows in the format returned by a3_part4.calculate_ffwi_outputs."""
+        return dict(zip(self.dates(), self))
+
+    def nbytes_per_row(self) -> int:
+        """Return the number of bytes used to store each row."""
+        return self.data.itemsize
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, (int, np.integer)):
+            return FfwiOutput(*self.data[index].item()[2:])
+        return FfwiColumns(self.data[index])
+
+    def __iter__(self) -> Iterator[FfwiOutput]:
+        for row in self.data.tolist():
+            yield FfwiOutput(*row[2:])
+
+
+def columns_from_table(table: np.ndarray) -> tuple[WeatherColumns, FfwiColumns]:
+    """Return the WeatherColumns and FfwiColumns for a table of numbers with one row per CSV row
+    in the 12-column format read by a3_part4.load_data.
+
+    Preconditions:
+        - table.ndim == 2
+        - table.shape[1] == 12
+    """
+    weather = np.empty(len(table), dtype=WEATHER_DTYPE)
+    outputs = np.empty(len(table), dtype=FFWI_DTYPE)
+
+    for i, name in enumerate(WEATHER_DTYPE.names):
+        weather[name] = table[:, i]
+    outputs['month'] = weather['month']
+    outputs['day'] = weather['day']
+    for i, name in enumerate(FFWI_DTYPE.names[2:]):
+        outputs[name] = table[:, i + 6]
+
+    return WeatherColumns(weather), FfwiColumns(outputs)
+
+
+def calculate_outputs(readings: WeatherColumns, f0: float = ffwi.INITIAL_FFMC,
+                      dm0: float = ffwi.INITIAL_DMC, dc0: float = ffwi.INITIAL_DC) -> FfwiColumns:
+    """Return the FfwiColumns for a season of daily readings, chaining each day's FFMC, DMC, and
+    DC into the next day, starting from f0, dm0, and dc0.
+
+    The season is calculated by a3_ffwi_vectorized.calculate_station_season, so the outputs are
+    exactly those of a3_part4.calculate_ffwi_outputs for the same readings.
+
+    Preconditions:
+        - readings is sorted in chronological order
+    """
+    season = vffwi.calculate_station_season(*(readings.column(name) for name in
+                                              ('month', 'temperature', 'humidity', 'wind_speed',
+                                               'precipitation')), f0, dm0, dc0)
+
+    return FfwiColumns.from_arrays(readings.column('month'), readings.column('day'), *season)
+
+
+def dataclass_bytes_per_row(records: list) -> float:
+    """Return the average number of bytes used by each dataclass instance in records, including
+    the list slot, the instance, its __dict__, and the attribute values it refers to.
+
+    Preconditions:
+        - records != []
+    """
+    total = sys.getsizeof(records)
+    for record in records:
+        total += sys.getsizeof(record) + sys.getsizeof(record.__dict__)
+        total += sum(sys.getsizeof(getattr(record, f.name)) for f in fields(record))
+
+    return total / len(records)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,149 @@
+"""Monte Carlo ensembles of FFWI seasons.
+
+An ensemble runs the same season many times, each time with random noise added to the weather,
+to show how uncertain the calculated outputs are. Every member is calculated together in a
+single run of a3_ffwi_vectorized.calculate_season, with the members along the stations axis.
+Each member draws its noise from its own random stream, spawned from one seed, so a member's
+weather is the same no matter how many other members there are.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from a3_ffwi_columns import WeatherColumns
+import a3_ffwi_system as ffwi
+import a3_ffwi_vectorized as vffwi
+
+# The attributes of FfwiOutput, in the order they are returned by calculate_season
+ATTRIBUTES = ('ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi')
+
+# The percentiles summarised by default
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+
+@dataclass
+class WeatherNoise:
+    """The sizes of the random noise applied to each weather measurement.
+
+    The temperature, humidity, and wind speed have Gaussian noise added to them. The rainfall is
+    instead multiplied by lognormal noise with a mean of 1, so dry days stay dry and the average
+    rainfall of every day is the observed rainfall. Additive noise clipped at 0 would make every
+    dry day wet in some members, and raise the average rainfall of every day.
+
+    Instance Attributes:
+        - temperature: the standard deviation of the temperature noise, in degrees Celsius
+        - humidity: the standard deviation of the relative humidity noise, in %
+        - wind_speed: the standard deviation of the wind speed noise, in km/h
+        - precipitation: the standard deviation of the natural log of the factor each rainfall
+          is multiplied by
+
+    Representation Invariants:
+        - self.temperature >= 0.0
+        - self.humidity >= 0.0
+        - self.wind_speed >= 0.0
+        - self.precipitation >= 0.0
+    """
+    temperature: float = 1.5
+    humidity: float = 5.0
+    wind_speed: float = 3.0
+    precipitation: float = 0.25
+
+
+@dataclass
+class EnsembleBands:
+    """Percentiles of the outputs of an ensemble on each day of a season.
+
+    Instance Attributes:
+        - dates: the (month, day) of each day
+        - percentiles: the percentiles summarised, in increasing order
+        - values: a mapping from each attribute of FfwiOutput to an array of shape
+          (len(percentiles), len(dates)) whose row i holds the percentiles[i] percentile
+
+    Representation Invariants:
+        - list(self.percentiles) == sorted(self.percentiles)
+        - all(self.values[a].shape == (len(self.percentiles), len(self.dates)) for a in self.values)
+    """
+    dates: list[tuple[int, int]]
+    percentiles: tuple[float, ...]
+    values: dict[str, np.ndarray]
+
+    def band(self, attribute: str, percentile: float) -> np.ndarray:
+        """Return the value of the given percentile of attribute on each day.
+
+        Preconditions:
+            - attribute in self.values
+            - percentile in self.percentiles
+        """
+        return self.values[attribute][self.percentiles.index(percentile)]
+
+
+def perturb_weather(readings: WeatherColumns, members: int, noise: WeatherNoise,
+                    seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the temperature, humidity, wind speed, and precipitation of every member of an
+    ensemble of readings, each as an array of shape (days, members).
+
+    The humidity is kept between 0 and 100, and the wind speed at least 0. The precipitation is
+    multiplied by lognormal noise, as described in WeatherNoise. Member i's noise comes from the
+    i-th stream spawned from seed, so it depends only on seed and i.
+
+    Preconditions:
+        - members >= 1
+    """
+    days = len(readings)
+    noise_scale = np.array([noise.temperature, noise.humidity, noise.wind_speed,
+                            noise.precipitation])
+    streams = np.random.SeedSequence(seed).spawn(members)
+    draws = np.stack([np.random.default_rng(stream).standard_normal((days, 4))
+                      for stream in streams], axis=1) * noise_scale
+
+    temperature = readings.column('temperature')[:, None] + draws[:, :, 0]
+    humidity = np.clip(readings.column('humidity')[:, None] + draws[:, :, 1], 0.0, 100.0)
+    wind_speed = np.maximum(readings.column('wind_speed')[:, None] + draws[:, :, 2], 0.0)
+    rain_factor = np.exp(draws[:, :, 3] - noise.precipitation ** 2 / 2)
+    precipitation = readings.column('precipitation')[:, None] * rain_factor
+
+    return temperature, humidity, wind_speed, precipitation
+
+
+def run_members(readings: WeatherColumns, members: int, noise: WeatherNoise = WeatherNoise(),
+                seed: int = 0) -> tuple[np.ndarray, ...]:
+    """Return the FFMC, DMC, DC, ISI, BUI, and FWI of every member of an ensemble of readings,
+    each as an array of shape (days, members), with every member starting from the initial
+    values.
+
+    Preconditions:
+        - members >= 1
+        - readings is sorted in chronological order
+    """
+    months = np.repeat(readings.column('month')[:, None], members, axis=1)
+    weather = perturb_weather(readings, members, noise, seed)
+
+    return vffwi.calculate_season(months, *weather, ffwi.INITIAL_FFMC, ffwi.INITIAL_DMC,
+                                  ffwi.INITIAL_DC)
+
+
+def run_ensemble(readings: WeatherColumns, members: int, noise: WeatherNoise = WeatherNoise(),
+                 seed: int = 0,
+                 percentiles: tuple[float, ...] = DEFAULT_PERCENTILES) -> EnsembleBands:
+    """Return the percentiles of the outputs of an ensemble of readings on each day.
+
+    Preconditions:
+        - members >= 1
+        - readings is sorted in chronological order
+        - all(0.0 <= p <= 100.0 for p in percentiles)
+    """
+    percentiles = tuple(sorted(percentiles))
+    outputs = run_members(readings, members, noise, seed)
+
+    return EnsembleBands(list(zip(readings.column('month').tolist(),
+                                  readings.column('day').tolist())),
+                         percentiles,
+                         {attribute: np.percentile(values, percentiles, axis=1)
+                          for attribute, values in zip(ATTRIBUTES, outputs)})
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
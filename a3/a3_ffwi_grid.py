@@ -0,0 +1,130 @@
+"""Gridded FFWI calculations over memory-mapped weather rasters.
+
+The weather for a gridded forecast is stored as one .npy file per variable, each an array of
+shape (days, rows, columns), together with a months.npy file giving the month of each day. The
+grids are calculated one tile at a time: each tile is chained through every day of the season,
+carrying only that tile's FFMC, DMC, and DC, so the memory used depends on the tile size rather
+than the size of the grid. The outputs are written to memory-mapped .npy files of the same shape.
+"""
+import os
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+import a3_ffwi_system as ffwi
+import a3_ffwi_vectorized as vffwi
+
+# The weather variables of a grid, each stored in a file named after it
+WEATHER_VARIABLES = ('temperature', 'humidity', 'wind_speed', 'precipitation')
+
+# The outputs of a grid, each stored in a file named after it
+OUTPUT_VARIABLES = ('ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi')
+
+# The default (rows, columns) of a tile
+DEFAULT_TILE_SHAPE = (256, 256)
+
+
+@dataclass
+class WeatherGrids:
+    """A season of daily gridded weather.
+
+    Instance Attributes:
+        - months: the month of each day
+        - temperature: the noon temperature of each cell on each day, in degrees Celsius
+        - humidity: the noon relative humidity of each cell on each day, in %
+        - wind_speed: the noon wind speed of each cell on each day, in km/h
+        - precipitation: the rainfall of each cell on each day, in mm
+
+    Representation Invariants:
+        - self.temperature.ndim == 3
+        - self.temperature.shape == self.humidity.shape == self.wind_speed.shape \
+            == self.precipitation.shape
+        - self.months.shape == (self.temperature.shape[0],)
+    """
+    months: np.ndarray
+    temperature: np.ndarray
+    humidity: np.ndarray
+    wind_speed: np.ndarray
+    precipitation: np.ndarray
+
+    def shape(self) -> tuple[int, int, int]:
+        """Return the (days, rows, columns) of these grids."""
+        return self.temperature.shape
+
+
+def save_weather_grids(directory: str, grids: WeatherGrids) -> None:
+    """Save grids to directory in the format read by open_weather_grids."""
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, 'months.npy'), np.asarray(grids.months))
+    for name in WEATHER_VARIABLES:
+        np.save(os.path.join(directory, name + '.npy'), getattr(grids, name))
+
+
+def open_weather_grids(directory: str) -> WeatherGrids:
+    """Return the WeatherGrids stored in directory, memory-mapped rather than read into memory."""
+    return WeatherGrids(np.load(os.path.join(directory, 'months.npy')),
+                        *(np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+                          for name in WEATHER_VARIABLES))
+
+
+def iter_tiles(rows: int, columns: int, tile_shape: tuple[int, int] = DEFAULT_TILE_SHAPE) -> \
+        Iterator[tuple[slice, slice]]:
+    """Yield the (row slice, column slice) of every tile of a grid with the given number of rows
+    and columns, in row-major order. Tiles at the bottom and right edges may be smaller.
+
+    Preconditions:
+        - tile_shape[0] >= 1 and tile_shape[1] >= 1
+    """
+    for row in range(0, rows, tile_shape[0]):
+        for column in range(0, columns, tile_shape[1]):
+            yield slice(row, row + tile_shape[0]), slice(column, column + tile_shape[1])
+
+
+def calculate_grids(weather: WeatherGrids, output_directory: str,
+                    tile_shape: tuple[int, int] = DEFAULT_TILE_SHAPE,
+                    f0: np.ndarray | float = ffwi.INITIAL_FFMC,
+                    dm0: np.ndarray | float = ffwi.INITIAL_DMC,
+                    dc0: np.ndarray | float = ffwi.INITIAL_DC,
+                    dtype: np.dtype | type = np.float32) -> dict[str, np.ndarray]:
+    """Calculate the FFMC, DMC, DC, ISI, BUI, and FWI grids for every day in weather and write
+    them to memory-mapped .npy files in output_directory, one per output variable. Return a
+    mapping from each output variable to its memory-mapped array of shape (days, rows, columns).
+
+    Each tile of tile_shape cells is chained from f0, dm0, and dc0 (a single value, or a grid of
+    shape (rows, columns)) through every day in order before the next tile is started.
+
+    Preconditions:
+        - tile_shape[0] >= 1 and tile_shape[1] >= 1
+    """
+    days, rows, columns = weather.shape()
+    os.makedirs(output_directory, exist_ok=True)
+    outputs = {name: np.lib.format.open_memmap(os.path.join(output_directory, name + '.npy'),
+                                               mode='w+', dtype=dtype, shape=(days, rows, columns))
+               for name in OUTPUT_VARIABLES}
+    initial = [np.broadcast_to(np.asarray(value, dtype=float), (rows, columns))
+               for value in (f0, dm0, dc0)]
+
+    for row_slice, column_slice in iter_tiles(rows, columns, tile_shape):
+        ffmc, dmc, dc = (np.array(value[row_slice, column_slice]) for value in initial)
+
+        for day in range(days):
+            tile = [np.asarray(getattr(weather, name)[day, row_slice, column_slice], dtype=float)
+                    for name in WEATHER_VARIABLES]
+            day_outputs = vffwi.calculate_all(weather.months[day], *tile, ffmc, dmc, dc)
+
+            for name, values in zip(OUTPUT_VARIABLES, day_outputs):
+                outputs[name][day, row_slice, column_slice] = values
+            ffmc, dmc, dc = day_outputs[0], day_outputs[1], day_outputs[2]
+
+    for array in outputs.values():
+        array.flush()
+
+    return outputs
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
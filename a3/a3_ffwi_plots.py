@@ -0,0 +1,219 @@
+"""Plotting long FFWI time series.
+
+Long series are downsampled with a shape-preserving algorithm before they are sent to the
+browser, and drawn with WebGL (go.Scattergl) rather than SVG once they have many points.
+"""
+from typing import Optional
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from a3_ffwi_system import FfwiOutput
+from a3_ffwi_columns import FfwiColumns
+from a3_ffwi_ensemble import EnsembleBands
+from a3_ffwi_store import FfwiSeries
+
+# The attributes of FfwiOutput, in the order they are plotted
+ATTRIBUTES = ('ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi')
+
+# The number of points above which traces are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 10000
+
+# The number of points a trace is downsampled to by default
+DEFAULT_MAX_POINTS = 5000
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Return the sorted indexes of n_out points of y chosen by the Largest-Triangle-Three-Buckets
+    algorithm, which keeps the peaks and troughs that give the series its shape.
+
+    The points are treated as evenly spaced. The first and last points are always kept. If
+    n_out >= len(y) or n_out < 3, return the indexes of every point.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # The points between the first and the last are split into n_out - 2 buckets, and one point
+    # is chosen from each bucket
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    chosen = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = (edges[i + 1] + edges[i + 2] - 1) / 2.0
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = n - 1, y[n - 1]
+
+        # Choose the point that makes the largest triangle with the point chosen from the
+        # previous bucket and the average of the next bucket
+        x = np.arange(start, end)
+        area = np.abs((chosen - next_x) * (y[start:end] - y[chosen])
+                      - (chosen - x) * (next_y - y[chosen]))
+        chosen = start + int(np.argmax(area))
+        indices[i + 1] = chosen
+
+    return indices
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Return the sorted indexes of at most n_out points of y, made up of the smallest and largest
+    point in each of n_out // 2 equal buckets.
+
+    If n_out >= len(y) or n_out < 2, return the indexes of every point.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(int)
+    indices = set()
+    for start, end in zip(edges[:-1], edges[1:]):
+        indices.add(start + int(np.argmin(y[start:end])))
+        indices.add(start + int(np.argmax(y[start:end])))
+
+    return np.array(sorted(indices))
+
+
+def make_trace(x_data: list[str], y_data: list[float] | np.ndarray, name: str,
+               max_points: Optional[int] = DEFAULT_MAX_POINTS,
+               webgl_threshold: int = WEBGL_THRESHOLD,
+               method: str = 'lttb') -> go.Scatter | go.Scattergl:
+    """Return a trace of y_data against x_data, downsampled to max_points points with method.
+    The trace is drawn with WebGL if y_data has more than webgl_threshold points.
+
+    If max_points is None, the trace is not downsampled.
+
+    Preconditions:
+        - len(x_data) == len(y_data)
+        - method in {'lttb', 'minmax'}
+    """
+    y_data = np.asarray(y_data, dtype=float)
+    use_webgl = len(y_data) > webgl_threshold
+
+    if max_points is not None and len(y_data) > max_points:
+        if method == 'lttb':
+            indices = lttb_indices(y_data, max_points)
+        else:
+            indices = minmax_indices(y_data, max_points)
+        x_data = [x_data[i] for i in indices]
+        y_data = y_data[indices]
+
+    if use_webgl:
+        return go.Scattergl(x=x_data, y=y_data, name=name)
+    else:
+        return go.Scatter(x=x_data, y=y_data, name=name)
+
+
+def x_axis_title(outputs: dict[tuple[int, int], FfwiOutput] | FfwiColumns | FfwiSeries) -> str:
+    """Return the title of the x-axis for the labels of outputs returned by get_all_xy_data (and
+    a3_part4.get_xy_data): 'Date' for the dates of an FfwiSeries, and '(Month, Day)' otherwise.
+    """
+    return 'Date' if isinstance(outputs, FfwiSeries) else '(Month, Day)'
+
+
+def add_percentile_bands(fig: go.Figure, bands: EnsembleBands, attribute: str,
+                         x_data: Optional[list[str]] = None) -> None:
+    """Add the percentiles of attribute in bands to fig as shaded ranges, one for each pair of
+    percentiles the same distance from the median (for example, 5-95 and 25-75). Inner ranges are
+    shaded more darkly than outer ones.
+
+    x_data is the label of each day in bands, which should be the labels of the series the bands
+    are drawn behind, so that they line up. By default, the days are labelled 'month, day'.
+
+    Preconditions:
+        - attribute in bands.values
+        - x_data is None or len(x_data) == len(bands.dates)
+    """
+    if x_data is None:
+        x_data = [f'{month}, {day}' for month, day in bands.dates]
+    pairs = len(bands.percentiles) // 2
+
+    for i in range(pairs):
+        lower = bands.percentiles[i]
+        upper = bands.percentiles[len(bands.percentiles) - 1 - i]
+        opacity = 0.15 + 0.2 * i / max(pairs - 1, 1)
+        fig.add_trace(go.Scatter(x=x_data, y=bands.band(attribute, lower), mode='lines',
+                                 line={'width': 0}, showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=x_data, y=bands.band(attribute, upper), mode='lines',
+                                 line={'width': 0}, fill='tonexty',
+                                 fillcolor=f'rgba(99, 110, 250, {opacity:.2f})',
+                                 name=f'{attribute} {lower:g}-{upper:g}%'))
+
+
+def get_all_xy_data(outputs: dict[tuple[int, int], FfwiOutput] | FfwiColumns | FfwiSeries) -> \
+        tuple[list[str], dict[str, np.ndarray]]:
+    """Return the keys of outputs as strings in the format 'month, day' (or the dates of an
+    FfwiSeries in the format 'YYYY-MM-DD'), together with a mapping from each attribute in
+    ATTRIBUTES to an array of its values, in a single pass over outputs.
+    """
+    if isinstance(outputs, FfwiSeries):
+        return outputs.labels(), {attribute: outputs.column(attribute) for attribute in ATTRIBUTES}
+    if isinstance(outputs, FfwiColumns):
+        return ([f'{month}, {day}' for month, day in outputs.dates()],
+                {attribute: outputs.column(attribute) for attribute in ATTRIBUTES})
+
+    # ACCUMULATOR labels_so_far: the labels of the outputs seen so far
+    labels_so_far = []
+    # ACCUMULATOR rows_so_far: the values of every attribute of the outputs seen so far
+    rows_so_far = []
+    for (month, day), output in outputs.items():
+        labels_so_far.append(f'{month}, {day}')
+        rows_so_far.append((output.ffmc, output.dmc, output.dc, output.isi, output.bui,
+                            output.fwi))
+
+    table = np.array(rows_so_far, dtype=float).reshape(-1, len(ATTRIBUTES))
+    return labels_so_far, {attribute: table[:, i] for i, attribute in enumerate(ATTRIBUTES)}
+
+
+def ffwi_attributes_figure(outputs: dict[tuple[int, int], FfwiOutput] | FfwiColumns | FfwiSeries,
+                           max_points: Optional[int] = DEFAULT_MAX_POINTS,
+                           webgl_threshold: int = WEBGL_THRESHOLD,
+                           method: str = 'lttb') -> go.Figure:
+    """Return a figure with one time series subplot for each attribute in ATTRIBUTES, sharing
+    an x-axis. Each series is downsampled and drawn as described in make_trace.
+
+    Preconditions:
+        - len(outputs) > 0
+        - method in {'lttb', 'minmax'}
+    """
+    x_data, y_data = get_all_xy_data(outputs)
+
+    fig = make_subplots(rows=len(ATTRIBUTES), cols=1, shared_xaxes=True,
+                        subplot_titles=[attribute.upper() for attribute in ATTRIBUTES])
+    for row, attribute in enumerate(ATTRIBUTES, start=1):
+        fig.add_trace(make_trace(x_data, y_data[attribute], attribute, max_points,
+                                 webgl_threshold, method), row=row, col=1)
+
+    fig.update_layout(title='Time Series of the FFWI Outputs', showlegend=False,
+                      height=200 * len(ATTRIBUTES))
+    fig.update_xaxes(title_text=x_axis_title(outputs), row=len(ATTRIBUTES), col=1)
+
+    return fig
+
+
+def plot_ffwi_attributes(outputs: dict[tuple[int, int], FfwiOutput] | FfwiColumns | FfwiSeries,
+                         max_points: Optional[int] = DEFAULT_MAX_POINTS,
+                         webgl_threshold: int = WEBGL_THRESHOLD, method: str = 'lttb') -> None:
+    """Plot every attribute of FfwiOutput as a time series, one subplot each, in the browser.
+
+    Preconditions:
+        - len(outputs) > 0
+        - method in {'lttb', 'minmax'}
+    """
+    ffwi_attributes_figure(outputs, max_points, webgl_threshold, method).show()
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,242 @@
+"""Opt-in profiling counters for a3_ffwi_system and a3_part4.
+
+enable() replaces each public function of a3_ffwi_system, and load_data and
+calculate_ffwi_outputs in a3_part4, with a wrapper that counts its calls, the time spent in it
+(including the functions it calls), and which of its branches each call took. disable() puts the
+original functions back, so there is no overhead at all while profiling is off.
+
+The wrappers are installed as module attributes, so they see every call made through the module
+(a3_part4 calls ffwi.calculate_ffmc, and calculate_ffmc calls calculate_mr through the module's
+globals). Names imported with "from a3_part4 import load_data" before enable() still refer to the
+original functions.
+"""
+import functools
+import inspect
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import a3_ffwi_system as ffwi
+import a3_part4
+
+
+def _mr_branches(args: tuple, _: float) -> list[str]:
+    """Return the branches of calculate_mr taken by a call with args."""
+    return ['equation 3b' if args[1] > 150.0 else 'equation 3a']
+
+
+def _m_branches(args: tuple, _: float) -> list[str]:
+    """Return the branches of calculate_m taken by a call with args.
+
+    When mo < ed, the EMC for wetting (ew) is calculated with the same function calculate_m
+    uses, since a wetting call can leave mo unchanged (when kw is 0 or mo == ew). The original
+    function is called, so the call is not counted.
+    """
+    wm, ed, mo = args
+    if mo == ed:
+        return ['mo == ed']
+    elif mo > ed:
+        return ['drying']
+
+    ew = _originals.get((ffwi, 'calculate_ew'), ffwi.calculate_ew)(wm)
+    if mo <= ew:
+        return ['wetting']
+    else:
+        return ['between ed and ew']
+
+
+def _ffmc_branches(args: tuple, result: float) -> list[str]:
+    """Return the branches of calculate_ffmc taken by a call with args that returned result."""
+    branches = ['rain > 0.5' if args[0].precipitation > 0.5 else 'rain <= 0.5']
+    if result in (0.0, 101.0):
+        branches.append('clamped')
+    return branches
+
+
+def _dmr_branches(args: tuple, _: float) -> list[str]:
+    """Return the branches of calculate_dmr taken by a call with args."""
+    dm0 = args[1]
+    if dm0 <= 33.0:
+        return ['equation 13a']
+    elif dm0 <= 65.0:
+        return ['equation 13b']
+    else:
+        return ['equation 13c']
+
+
+def _dmc_k_branches(args: tuple, _: float) -> list[str]:
+    """Return the branches of calculate_dmc_k taken by a call with args."""
+    return ['temperature < -1.1'] if args[0] < -1.1 else []
+
+
+def _dmc_branches(args: tuple, result: float) -> list[str]:
+    """Return the branches of calculate_dmc taken by a call with args that returned result."""
+    branches = ['rain > 1.5' if args[0].precipitation > 1.5 else 'rain <= 1.5']
+    if result == 1.0:
+        branches.append('clamped')
+    return branches
+
+
+def _dc_branches(args: tuple, _: float) -> list[str]:
+    """Return the branches of calculate_dc taken by a call with args."""
+    branches = ['rain > 2.8' if args[0].precipitation > 2.8 else 'rain <= 2.8']
+    if args[0].temperature < -2.8:
+        branches.append('temperature < -2.8')
+    return branches
+
+
+def _bui_branches(args: tuple, result: float) -> list[str]:
+    """Return the branches of calculate_bui taken by a call with args that returned result."""
+    branches = ['dmc <= 0.4 * dc' if args[0] <= 0.4 * args[1] else 'dmc > 0.4 * dc']
+    if result == 0.0:
+        branches.append('clamped')
+    return branches
+
+
+def _fwi_branches(args: tuple, result: float) -> list[str]:
+    """Return the branches of calculate_fwi taken by a call with args that returned result."""
+    # Equation 30a only applies when bb > 1.0, and then always gives a result above 1.0
+    return ['equation 28a' if args[1] <= 80.0 else 'equation 28b',
+            'equation 30b' if result <= 1.0 else 'equation 30a']
+
+
+# The functions that are profiled, by module, each with a function that returns the branches
+# taken by a call given its arguments and result (or None if the function has no branches)
+PROFILED_FUNCTIONS = {
+    ffwi: {
+        'calculate_mr': _mr_branches,
+        'calculate_ew': None,
+        'calculate_m': _m_branches,
+        'calculate_ffmc': _ffmc_branches,
+        'calculate_dmr': _dmr_branches,
+        'calculate_dmc_k': _dmc_k_branches,
+        'calculate_dmc': _dmc_branches,
+        'calculate_qr': None,
+        'calculate_dc': _dc_branches,
+        'calculate_isi': None,
+        'calculate_bui': _bui_branches,
+        'calculate_fwi': _fwi_branches,
+    },
+    a3_part4: {
+        'load_data': None,
+        'calculate_ffwi_outputs': None,
+    },
+}
+
+
+@dataclass
+class FunctionStats:
+    """The profiling counters of one function.
+
+    Instance Attributes:
+        - calls: the number of times the function was called, including calls that raised
+        - errors: the number of calls that raised an exception
+        - seconds: the total time spent in the function, including the functions it called
+        - branches: the number of calls that took each branch of the function, counted only for
+          calls that returned
+
+    Representation Invariants:
+        - 0 <= self.errors <= self.calls
+        - self.seconds >= 0.0
+        - all(self.branches[b] <= self.calls - self.errors for b in self.branches)
+    """
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    branches: dict[str, int] = field(default_factory=dict)
+
+
+# The counters of every profiled function, by qualified name, and the original functions that
+# the wrappers replaced while profiling is enabled
+_stats: dict[str, FunctionStats] = {}
+_originals: dict[tuple[Any, str], Callable] = {}
+
+
+def _wrap(name: str, function: Callable,
+          branches: Optional[Callable[[tuple, Any], list[str]]]) -> Callable:
+    """Return a wrapper of function that updates the counters of name on every call."""
+    stats = _stats.setdefault(name, FunctionStats())
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+        if branches is not None:
+            if kwargs:
+                args = signature.bind(*args, **kwargs).args
+            for branch in branches(args, result):
+                stats.branches[branch] = stats.branches.get(branch, 0) + 1
+        return result
+
+    return wrapper
+
+
+def is_enabled() -> bool:
+    """Return whether profiling is enabled."""
+    return _originals != {}
+
+
+def enable() -> None:
+    """Start counting calls, time, and branches of every function in PROFILED_FUNCTIONS.
+
+    Calling enable() while profiling is already enabled has no effect.
+    """
+    if is_enabled():
+        return
+
+    for module, functions in PROFILED_FUNCTIONS.items():
+        for function_name, branches in functions.items():
+            original = getattr(module, function_name)
+            _originals[(module, function_name)] = original
+            setattr(module, function_name,
+                    _wrap(f'{module.__name__}.{function_name}', original, branches))
+
+
+def disable() -> None:
+    """Stop profiling and restore the original functions. The counters are kept."""
+    for (module, function_name), original in _originals.items():
+        setattr(module, function_name, original)
+    _originals.clear()
+
+
+def reset() -> None:
+    """Set every counter back to zero."""
+    for stats in _stats.values():
+        stats.calls = 0
+        stats.errors = 0
+        stats.seconds = 0.0
+        stats.branches.clear()
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    """Return a copy of the counters of every function that has been called, by qualified name.
+    """
+    return {name: {'calls': stats.calls, 'errors': stats.errors, 'seconds': stats.seconds,
+                   'branches': dict(stats.branches)}
+            for name, stats in sorted(_stats.items()) if stats.calls > 0}
+
+
+def export_json(filename: Optional[str] = None) -> str:
+    """Return snapshot() as a JSON string, and also write it to filename if it is given."""
+    text = json.dumps(snapshot(), indent=2)
+    if filename is not None:
+        with open(filename, 'w') as f:
+            f.write(text)
+
+    return text
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,466 @@
+"""A local asyncio service that answers FFWI queries for many weather stations.
+
+Clients connect over TCP and send one JSON request per line, each a batch of observations:
+
+    {"observations": [{"station": "S1", "month": 7, "day": 1, "temperature": 25.0,
+                       "humidity": 40.0, "wind_speed": 12.0, "precipitation": 0.0}, ...]}
+
+and receive one JSON line in reply, holding the FfwiOutput of each observation in the same order:
+
+    {"outputs": [{"ffmc": 88.1, "dmc": 9.3, "dc": 21.4, "isi": 5.2, "bui": 9.7, "fwi": 6.0}, ...]}
+
+or {"error": "..."} if the request was invalid. Each station's previous FFMC, DMC, and DC are kept
+in memory, so the observations of a station must arrive in chronological order.
+
+Requests that arrive close together are coalesced into a single micro-batch, which is calculated
+with one vectorized update of the station states rather than one update per request. Run this
+module as a script to start the service, or to load-test a running one:
+
+    python a3_ffwi_service.py serve --port 8765
+    python a3_ffwi_service.py load-test --port 8765 --connections 32
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from a3_ffwi_system import WeatherMetrics, FfwiOutput
+from a3_ffwi_columns import WeatherColumns
+from a3_ffwi_test_data import generate_weather
+from a3_ffwi_state import StationStates
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# The default largest number of observations calculated in one micro-batch
+DEFAULT_MAX_BATCH_SIZE = 4096
+
+# The default time, in seconds, that a micro-batch waits for more requests before it is calculated
+DEFAULT_MAX_DELAY = 0.002
+
+# The default longest request line, in bytes, that the server reads. asyncio's own default of
+# 64 KiB holds only a few hundred observations, well short of DEFAULT_MAX_BATCH_SIZE.
+DEFAULT_LINE_LIMIT = 2 ** 24
+
+# The fields of each observation in a request, besides its station
+OBSERVATION_FIELDS = ('month', 'day', 'temperature', 'humidity', 'wind_speed', 'precipitation')
+
+
+def parse_observations(observations: list[dict[str, Any]]) -> \
+        tuple[list[str], list[WeatherMetrics]]:
+    """Return the station id and WeatherMetrics of each observation in a request.
+
+    Raise a ValueError if an observation is missing a field or has an invalid value, including a
+    value that is not finite (JSON allows NaN and Infinity).
+    """
+    station_ids = []
+    readings = []
+    for observation in observations:
+        try:
+            station_ids.append(str(observation['station']))
+            wm = WeatherMetrics(int(observation['month']), int(observation['day']),
+                                *(float(observation[name]) for name in OBSERVATION_FIELDS[2:]))
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValueError(f'invalid observation {observation!r}') from error
+
+        if not (1 <= wm.month <= 12 and 1 <= wm.day <= 31 and math.isfinite(wm.temperature)
+                and 0.0 <= wm.humidity <= 100.0 and 0.0 <= wm.wind_speed < math.inf
+                and 0.0 <= wm.precipitation < math.inf):
+            raise ValueError(f'invalid observation {observation!r}')
+        readings.append(wm)
+
+    return station_ids, readings
+
+
+def schedule_rounds(station_ids: list[str]) -> list[int]:
+    """Return the round in which each observation of a micro-batch is calculated.
+
+    Each round updates each station at most once, so an observation's round is the number of
+    earlier observations of the same station in the micro-batch.
+    """
+    seen_so_far = {}
+    rounds = []
+    for station_id in station_ids:
+        rounds.append(seen_so_far.get(station_id, 0))
+        seen_so_far[station_id] = rounds[-1] + 1
+
+    return rounds
+
+
+class FfwiService:
+    """Calculates FFWI outputs for batches of observations, coalescing concurrent batches.
+
+    Instance Attributes:
+        - states: the previous day's FFMC, DMC, and DC of every station seen so far
+        - max_batch_size: the largest number of observations calculated in one micro-batch
+        - max_delay: the time, in seconds, a micro-batch waits for more requests
+        - batches: the number of micro-batches calculated so far
+        - requests: the number of requests answered so far
+
+    Representation Invariants:
+        - self.max_batch_size >= 1
+        - self.max_delay >= 0.0
+    """
+    states: StationStates
+    max_batch_size: int
+    max_delay: float
+    batches: int
+    requests: int
+    _queue: Optional[asyncio.Queue]
+    _worker: Optional[asyncio.Task]
+
+    def __init__(self, states: Optional[StationStates] = None,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_delay: float = DEFAULT_MAX_DELAY) -> None:
+        self.states = StationStates.empty() if states is None else states
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.batches = 0
+        self.requests = 0
+        self._queue = None
+        self._worker = None
+
+    def calculate(self, requests: list[tuple[list[str], list[WeatherMetrics]]]) -> \
+            list[list[FfwiOutput]]:
+        """Return the FfwiOutput of every observation in requests, a list of (station ids,
+        readings) pairs, and update the station states.
+
+        The observations are applied in order, so a station that appears several times is
+        chained through them as if each request had been calculated on its own. The rounds are
+        calculated on a copy of the states of the stations in requests, which replaces their
+        states only once every round has succeeded, so a batch that raises changes no states.
+        """
+        station_ids = [station_id for ids, _ in requests for station_id in ids]
+        readings = WeatherColumns.from_records(wm for _, batch in requests for wm in batch)
+        rounds = np.array(schedule_rounds(station_ids), dtype=int)
+        station_array = np.asarray(station_ids, dtype=str)
+        states = self.states.subset(station_array)
+        outputs = [None] * len(station_ids)
+
+        for i in range(int(rounds.max(initial=-1)) + 1):
+            index = np.flatnonzero(rounds == i)
+            round_outputs = states.update(station_array[index], readings[index])
+            for j, fo in zip(index.tolist(), round_outputs):
+                outputs[j] = fo
+
+        self.states.merge(states)
+        self.batches += 1
+        self.requests += len(requests)
+        results = []
+        start = 0
+        for ids, _ in requests:
+            results.append(outputs[start:start + len(ids)])
+            start += len(ids)
+
+        return results
+
+    async def start(self) -> None:
+        """Start calculating the requests passed to submit."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop calculating requests. Requests that are still waiting are cancelled."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()[2].cancel()
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, station_ids: list[str],
+                     readings: list[WeatherMetrics]) -> list[FfwiOutput]:
+        """Return the FfwiOutput of each reading, where readings[i] was measured at the station
+        station_ids[i], once the micro-batch it joins has been calculated.
+
+        Preconditions:
+            - self.start() has been awaited
+            - len(station_ids) == len(readings)
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((station_ids, readings, future))
+        return await future
+
+    def _take_waiting(self, batch: list, size: int) -> int:
+        """Move requests waiting in the queue into batch until it holds max_batch_size
+        observations, and return the new number of observations in batch.
+        """
+        while size < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            size += len(batch[-1][0])
+
+        return size
+
+    async def _run(self) -> None:
+        """Calculate the submitted requests in micro-batches, forever."""
+        while True:
+            batch = [await self._queue.get()]
+            size = self._take_waiting(batch, len(batch[0][0]))
+            if size < self.max_batch_size and self.max_delay > 0.0:
+                await asyncio.sleep(self.max_delay)
+                self._take_waiting(batch, size)
+
+            requests = [(station_ids, readings) for station_ids, readings, _ in batch]
+            try:
+                results = self.calculate(requests)
+            except Exception:
+                # A failed micro-batch changes no states, so each request is calculated again
+                # on its own, and only the requests that fail by themselves get the error
+                for station_ids, readings, future in batch:
+                    try:
+                        outputs = self.calculate([(station_ids, readings)])[0]
+                    except Exception as error:
+                        if not future.done():
+                            future.set_exception(error)
+                    else:
+                        if not future.done():
+                            future.set_result(outputs)
+                continue
+
+            for (_, _, future), outputs in zip(batch, results):
+                if not future.done():
+                    future.set_result(outputs)
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Answer each JSON request line read from reader with a JSON line written to writer,
+        until the client closes the connection.
+
+        A line longer than the reader's limit is skipped, and it and any request that raises are
+        answered with an error.
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b'\n')
+                except asyncio.IncompleteReadError as error:
+                    line = error.partial
+                except asyncio.LimitOverrunError:
+                    await _skip_line(reader)
+                    line = None
+
+                if line == b'':
+                    break
+                elif line is None:
+                    response = {'error': 'request line is too long'}
+                else:
+                    try:
+                        observations = json.loads(line)['observations']
+                        station_ids, readings = parse_observations(observations)
+                        outputs = await self.submit(station_ids, readings)
+                        response = {'outputs': [vars(fo) for fo in outputs]}
+                    except Exception as error:
+                        response = {'error': str(error) or type(error).__name__}
+
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _skip_line(reader: asyncio.StreamReader) -> None:
+    """Read and discard the rest of the current line of reader, however long it is."""
+    while True:
+        try:
+            await reader.readuntil(b'\n')
+            return
+        except asyncio.LimitOverrunError as error:
+            await reader.readexactly(error.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
+
+async def serve(service: FfwiService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                limit: int = DEFAULT_LINE_LIMIT) -> asyncio.Server:
+    """Start service and return a server answering its requests on host and port, reading
+    request lines of up to limit bytes.
+
+    A port of 0 picks any free port.
+    """
+    await service.start()
+    return await asyncio.start_server(service.handle_connection, host, port, limit=limit)
+
+
+@dataclass
+class LoadTestReport:
+    """The results of a load test.
+
+    Instance Attributes:
+        - requests: the number of requests answered
+        - observations: the number of observations in those requests
+        - seconds: the time taken to answer every request
+        - latencies: the time, in seconds, taken to answer each request
+        - errors: the number of requests answered with an error
+
+    Representation Invariants:
+        - self.requests == len(self.latencies)
+        - self.seconds >= 0.0
+    """
+    requests: int
+    observations: int
+    seconds: float
+    latencies: list[float]
+    errors: int = 0
+
+    def percentile(self, percentile: float) -> float:
+        """Return the given percentile of the latencies, in seconds.
+
+        Preconditions:
+            - self.latencies != []
+            - 0.0 <= percentile <= 100.0
+        """
+        return float(np.percentile(self.latencies, percentile))
+
+    def requests_per_second(self) -> float:
+        """Return the number of requests answered per second."""
+        return self.requests / self.seconds if self.seconds > 0.0 else 0.0
+
+    def summary(self) -> str:
+        """Return a one-line summary of this report."""
+        return (f'{self.requests} requests ({self.observations} observations) in '
+                f'{self.seconds:.3f} s: {self.requests_per_second():.0f} requests/s, '
+                f'p50 {self.percentile(50) * 1000:.2f} ms, '
+                f'p99 {self.percentile(99) * 1000:.2f} ms, {self.errors} errors')
+
+
+def make_requests(count: int, stations_per_request: int, total_stations: int,
+                  seed: int = 0) -> list[bytes]:
+    """Return count random request lines, each with observations for stations_per_request
+    different stations drawn from total_stations stations.
+
+    Preconditions:
+        - count >= 0
+        - 1 <= stations_per_request <= total_stations
+    """
+    rng = np.random.default_rng(seed)
+    weather = generate_weather(count * stations_per_request, seed).data.tolist()
+    lines = []
+    for i in range(count):
+        stations = rng.choice(total_stations, stations_per_request, replace=False)
+        observations = [dict(zip(OBSERVATION_FIELDS, row), station=f'S{station}')
+                        for station, row in zip(stations.tolist(),
+                                                weather[i * stations_per_request:
+                                                        (i + 1) * stations_per_request])]
+        lines.append(json.dumps({'observations': observations}).encode() + b'\n')
+
+    return lines
+
+
+async def run_load_test(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                        connections: int = 32, requests_per_connection: int = 100,
+                        stations_per_request: int = 10, total_stations: int = 1000,
+                        seed: int = 0) -> LoadTestReport:
+    """Return the results of sending requests_per_connection requests, one after another, on
+    each of connections concurrent connections to the service at host and port.
+
+    Preconditions:
+        - connections >= 1
+        - requests_per_connection >= 1
+        - 1 <= stations_per_request <= total_stations
+    """
+    latencies = []
+    errors = 0
+
+    async def client(lines: list[bytes]) -> None:
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port, limit=DEFAULT_LINE_LIMIT)
+        try:
+            for line in lines:
+                start = time.perf_counter()
+                writer.write(line)
+                await writer.drain()
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - start)
+                errors += 'error' in response
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    all_lines = [make_requests(requests_per_connection, stations_per_request, total_stations,
+                               seed + i)
+                 for i in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(lines) for lines in all_lines))
+    seconds = time.perf_counter() - start
+
+    return LoadTestReport(len(latencies), len(latencies) * stations_per_request, seconds,
+                          latencies, errors)
+
+
+async def _serve_forever(args: argparse.Namespace) -> None:
+    """Run the service described by args until it is interrupted."""
+    server = await serve(FfwiService(max_batch_size=args.max_batch_size,
+                                     max_delay=args.max_delay), args.host, args.port)
+    print(f'Serving FFWI queries on {args.host}:{args.port}')
+    async with server:
+        await server.serve_forever()
+
+
+async def _load_test(args: argparse.Namespace) -> LoadTestReport:
+    """Run the load test described by args, against a new local service if args.local is set."""
+    server = None
+    service = FfwiService(max_batch_size=args.max_batch_size, max_delay=args.max_delay)
+    if args.local:
+        server = await serve(service, args.host, 0)
+        args.port = server.sockets[0].getsockname()[1]
+
+    try:
+        report = await run_load_test(args.host, args.port, args.connections, args.requests,
+                                     args.stations_per_request, args.total_stations)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+            await service.stop()
+
+    if args.local:
+        print(f'{service.requests} requests in {service.batches} micro-batches')
+    return report
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the service or the load test from the command line and return the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['serve', 'load-test'])
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help='the most observations calculated in one micro-batch')
+    parser.add_argument('--max-delay', type=float, default=DEFAULT_MAX_DELAY,
+                        help='the seconds a micro-batch waits for more requests')
+    parser.add_argument('--local', action='store_true',
+                        help='load-test a new service in this process instead of --port')
+    parser.add_argument('--connections', type=int, default=32,
+                        help='the concurrent load-test connections')
+    parser.add_argument('--requests', type=int, default=100,
+                        help='the load-test requests sent on each connection')
+    parser.add_argument('--stations-per-request', type=int, default=10)
+    parser.add_argument('--total-stations', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(_serve_forever(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    report = asyncio.run(_load_test(args))
+    print(report.summary())
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Incremental daily FFWI updates with persisted per-station state.
+
+Each station's FFWI outputs depend on its FFMC, DMC, and DC from the day before. The functions
+in this module keep those three values for every station in a small checkpoint file, so that one
+new day of readings can be applied without recalculating the season from the start.
+"""
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from a3_ffwi_system import WeatherMetrics, FfwiOutput
+from a3_ffwi_columns import WeatherColumns, FfwiColumns
+import a3_ffwi_system as ffwi
+import a3_ffwi_vectorized as vffwi
+
+
+@dataclass
+class StationStates:
+    """The previous day's FFMC, DMC, and DC for a collection of weather stations.
+
+    The stations are kept sorted by id so that a whole day of readings can be matched to their
+    stations with a single binary search.
+
+    Instance Attributes:
+        - station_ids: the id of every station, in sorted order
+        - ffmc: the previous day's FFMC of each station in station_ids
+        - dmc: the previous day's DMC of each station in station_ids
+        - dc: the previous day's DC of each station in station_ids
+
+    Representation Invariants:
+        - all(self.station_ids[:-1] < self.station_ids[1:])
+        - len(self.station_ids) == len(self.ffmc) == len(self.dmc) == len(self.dc)
+    """
+    station_ids: np.ndarray
+    ffmc: np.ndarray
+    dmc: np.ndarray
+    dc: np.ndarray
+
+    @classmethod
+    def empty(cls) -> 'StationStates':
+        """Return a StationStates with no stations."""
+        return cls(np.array([], dtype=str), np.array([]), np.array([]), np.array([]))
+
+    def add_stations(self, station_ids: np.ndarray) -> None:
+        """Add every station in station_ids that is not already in self, starting from the initial
+        FFMC, DMC, and DC values.
+        """
+        new_ids = np.setdiff1d(station_ids, self.station_ids)
+        if len(new_ids) == 0:
+            return
+
+        all_ids = np.concatenate([self.station_ids, new_ids])
+        order = np.argsort(all_ids, kind='stable')
+        self.station_ids = all_ids[order]
+        self.ffmc = np.concatenate([self.ffmc, np.full(len(new_ids), ffwi.INITIAL_FFMC)])[order]
+        self.dmc = np.concatenate([self.dmc, np.full(len(new_ids), ffwi.INITIAL_DMC)])[order]
+        self.dc = np.concatenate([self.dc, np.full(len(new_ids), ffwi.INITIAL_DC)])[order]
+
+    def subset(self, station_ids: np.ndarray) -> 'StationStates':
+        """Return a new StationStates with a copy of the state of every station in station_ids.
+
+        Stations that are not in self start from the initial FFMC, DMC, and DC values.
+        """
+        subset = StationStates.empty()
+        subset.add_stations(station_ids)
+        if len(self.station_ids) == 0:
+            return subset
+
+        index = np.minimum(np.searchsorted(self.station_ids, subset.station_ids),
+                           len(self.station_ids) - 1)
+        found = self.station_ids[index] == subset.station_ids
+        subset.ffmc[found] = self.ffmc[index[found]]
+        subset.dmc[found] = self.dmc[index[found]]
+        subset.dc[found] = self.dc[index[found]]
+
+        return subset
+
+    def merge(self, other: 'StationStates') -> None:
+        """Replace the state of every station in other with its state in other, adding the
+        stations that are not already in self.
+        """
+        self.add_stations(other.station_ids)
+        index = np.searchsorted(self.station_ids, other.station_ids)
+        self.ffmc[index], self.dmc[index], self.dc[index] = other.ffmc, other.dmc, other.dc
+
+    def update(self, station_ids: Iterable[str], readings: WeatherColumns) -> FfwiColumns:
+        """Return the FfwiColumns for one day of readings, where readings[i] was measured at the
+        station station_ids[i], and replace each station's state with the new FFMC, DMC, and DC.
+
+        Stations that have not been seen before start from the initial FFMC, DMC, and DC values.
+
+        Preconditions:
+            - the ids in station_ids are unique
+            - len(station_ids) == len(readings)
+        """
+        station_ids = np.asarray(list(station_ids), dtype=str)
+        self.add_stations(station_ids)
+        index = np.searchsorted(self.station_ids, station_ids)
+
+        outputs = vffwi.calculate_all(readings.column('month'), readings.column('temperature'),
+                                      readings.column('humidity'), readings.column('wind_speed'),
+                                      readings.column('precipitation'), self.ffmc[index],
+                                      self.dmc[index], self.dc[index])
+        self.ffmc[index], self.dmc[index], self.dc[index] = outputs[0], outputs[1], outputs[2]
+
+        return FfwiColumns.from_arrays(readings.column('month'), readings.column('day'), *outputs)
+
+
+def load_states(filename: str) -> StationStates:
+    """Return the StationStates stored in filename by save_states, or a StationStates with no
+    stations if filename does not exist.
+    """
+    if not os.path.exists(filename):
+        return StationStates.empty()
+
+    with np.load(filename) as checkpoint:
+        return StationStates(checkpoint['station_ids'], checkpoint['ffmc'], checkpoint['dmc'],
+                             checkpoint['dc'])
+
+
+def save_states(filename: str, states: StationStates) -> None:
+    """Store states in filename.
+
+    The states are written to a temporary file in the same directory, which then replaces
+    filename, so a crash part way through never leaves a partly written checkpoint behind.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, station_ids=states.station_ids, ffmc=states.ffmc, dmc=states.dmc,
+                     dc=states.dc)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def update_daily(filename: str, station_ids: Iterable[str],
+                 readings: WeatherColumns | list[WeatherMetrics]) -> FfwiColumns:
+    """Return the FfwiColumns for one day of readings, where readings[i] was measured at the
+    station station_ids[i], using and then updating the station states checkpointed in filename.
+
+    Preconditions:
+        - the ids in station_ids are unique
+        - len(station_ids) == len(readings)
+    """
+    if not isinstance(readings, WeatherColumns):
+        readings = WeatherColumns.from_records(readings)
+
+    states = load_states(filename)
+    outputs = states.update(station_ids, readings)
+    save_states(filename, states)
+
+    return outputs
+
+
+def update_station(filename: str, station_id: str, wm: WeatherMetrics) -> FfwiOutput:
+    """Return the FfwiOutput for one day's reading wm at the station station_id, using and then
+    updating the station states checkpointed in filename.
+    """
+    return update_daily(filename, [station_id], [wm])[0]
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
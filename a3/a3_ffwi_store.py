@@ -0,0 +1,136 @@
+"""A store of FFWI outputs indexed by station and date.
+
+a3_part4.calculate_ffwi_outputs keys its outputs by (month, day), so several years of data for
+the same station collapse onto the same keys. FfwiResultStore keeps every output with its station
+and its real date instead, sorted so that the outputs for one station over a range of dates are a
+contiguous slice that can be found with binary search and returned without copying.
+"""
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from a3_ffwi_columns import FfwiColumns
+
+
+def make_dates(year: np.ndarray | int, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """Return an array of datetime64[D] dates for each year, month, and day.
+
+    Preconditions:
+        - every (year, month, day) is a valid date
+    """
+    year = np.asarray(year, dtype=np.int64)
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+
+    first_of_month = ((year - 1970) * 12 + (month - 1)).astype('datetime64[M]')
+    return first_of_month.astype('datetime64[D]') + (day - 1)
+
+
+@dataclass
+class FfwiSeries:
+    """The FFWI outputs of one station over a range of dates, in chronological order.
+
+    The arrays are views into an FfwiResultStore, so they must not be modified.
+
+    Instance Attributes:
+        - station_id: the station the outputs were calculated for
+        - dates: the date of each output, as datetime64[D]
+        - outputs: the outputs
+
+    Representation Invariants:
+        - len(self.dates) == len(self.outputs)
+        - all(self.dates[:-1] <= self.dates[1:])
+    """
+    station_id: str
+    dates: np.ndarray
+    outputs: FfwiColumns
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the values of the attribute name for every date, without copying them.
+
+        Preconditions:
+            - name in {'ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi'}
+        """
+        return self.outputs.column(name)
+
+    def labels(self) -> list[str]:
+        """Return the dates of the outputs as strings in the format 'YYYY-MM-DD'."""
+        return np.datetime_as_string(self.dates, unit='D').tolist()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+@dataclass
+class FfwiResultStore:
+    """FFWI outputs for many stations, sorted by station and then by date.
+
+    The outputs of station_ids[i] are the rows offsets[i]:offsets[i + 1] of dates and outputs.
+
+    Instance Attributes:
+        - station_ids: the id of every station, in sorted order
+        - offsets: the index of the first row of each station, followed by the number of rows
+        - dates: the date of each row, as datetime64[D]
+        - outputs: the outputs of each row
+
+    Representation Invariants:
+        - all(self.station_ids[:-1] < self.station_ids[1:])
+        - len(self.offsets) == len(self.station_ids) + 1
+        - self.offsets[-1] == len(self.dates) == len(self.outputs)
+    """
+    station_ids: np.ndarray
+    offsets: np.ndarray
+    dates: np.ndarray
+    outputs: FfwiColumns
+
+    @classmethod
+    def from_columns(cls, station_ids: Iterable[str], dates: np.ndarray,
+                     outputs: FfwiColumns) -> 'FfwiResultStore':
+        """Return an FfwiResultStore containing the rows of outputs, where outputs[i] was
+        calculated for the station station_ids[i] on the date dates[i]. The rows may be in any
+        order.
+
+        Preconditions:
+            - len(station_ids) == len(dates) == len(outputs)
+        """
+        station_ids = np.asarray(list(station_ids), dtype=str)
+        dates = np.asarray(dates, dtype='datetime64[D]')
+
+        order = np.lexsort((dates, station_ids))
+        unique_ids, starts = np.unique(station_ids[order], return_index=True)
+
+        return cls(unique_ids, np.append(starts, len(order)), dates[order],
+                   FfwiColumns(outputs.data[order]))
+
+    def series(self, station_id: str, start: str | np.datetime64 | None = None,
+               end: str | np.datetime64 | None = None) -> FfwiSeries:
+        """Return the outputs of station_id dated from start to end, inclusive, without copying
+        them. A start or end of None leaves that end of the range open.
+
+        Raise a KeyError if station_id is not in this store.
+        """
+        i = int(np.searchsorted(self.station_ids, station_id))
+        if i == len(self.station_ids) or self.station_ids[i] != station_id:
+            raise KeyError(station_id)
+
+        first, last = int(self.offsets[i]), int(self.offsets[i + 1])
+        station_dates = self.dates[first:last]
+        if start is not None:
+            first += int(np.searchsorted(station_dates, np.datetime64(start, 'D'), side='left'))
+        if end is not None:
+            last = int(self.offsets[i]) + int(np.searchsorted(station_dates,
+                                                              np.datetime64(end, 'D'),
+                                                              side='right'))
+
+        return FfwiSeries(station_id, self.dates[first:last], self.outputs[first:last])
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
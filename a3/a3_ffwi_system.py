@@ -89,6 +89,15 @@ def calculate_mr(precipitation: float, mo: float) -> float:
     return mr
 
 
+def calculate_ew(wm: WeatherMetrics) -> float:
+    """Return the fine fuel equilibrium moisture content (EMC) for wetting (ew) based on the
+    measurements in wm.
+    """
+    # Equation 5
+    return 0.618 * (wm.humidity ** .753) + (10.0 * math.exp((wm.humidity - 100.0) / 10.0)) \
+        + 0.18 * (21.1 - wm.temperature) * (1.0 - 1.0 / math.exp(0.115 * wm.humidity))
+
+
 def calculate_m(wm: WeatherMetrics, ed: float, mo: float) -> float:
     """Return the fine fuel moisture content after drying (m) based on the measurements in wm, the
     EMC for drying in ed, and the fine fuel moisture content from the previous day in mo.
@@ -100,9 +109,7 @@ def calculate_m(wm: WeatherMetrics, ed: float, mo: float) -> float:
         return mo
 
     if mo < ed:
-        # Equation 5
-        ew = 0.618 * (wm.humidity ** .753) + (10.0 * math.exp((wm.humidity - 100.0) / 10.0)) \
-             + 0.18 * (21.1 - wm.temperature) * (1.0 - 1.0 / math.exp(0.115 * wm.humidity))
+        ew = calculate_ew(wm)
 
         if mo <= ew:
             # Use log wetting rate
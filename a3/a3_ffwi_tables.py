@@ -0,0 +1,244 @@
+"""Precomputed lookup tables for the ISI and FWI equations.
+
+The ISI is a smooth function of the FFMC and the wind speed, and the FWI is a smooth function of
+the ISI and the BUI. A LookupTable evaluates one of these functions once on a regular grid and
+then answers each query by bilinear interpolation between the four surrounding grid points.
+Queries outside the grid fall back to the exact function, so the table only changes the results
+inside its grid, and by at most the error reported by max_error.
+
+The tables are an opt-in replacement for the scalar functions in a3_ffwi_system, which
+calculate one value per call: measure_speedup reports how much faster a table is than them for
+bulk evaluation. A table is not faster than the array functions in a3_ffwi_vectorized, which
+measure_speedup also reports, so code that already holds its values in arrays should keep
+calling those. On the default grids, the ISI table is within about 0.3 of the exact ISI
+(a relative error under 1e-3), and the FWI table is within about 0.25 of the exact FWI. The FWI
+error is largest for FWI values near 1.0, where the slope of Equation 30a is infinite.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+
+import a3_ffwi_system as ffwi
+import a3_ffwi_vectorized as vffwi
+
+
+@dataclass
+class LookupTable:
+    """A function of two arguments tabulated on a regular grid.
+
+    values[i, j] is the value of exact at (x_start + i * x_step, y_start + j * y_step).
+
+    Instance Attributes:
+        - x_start: the smallest first argument in the grid
+        - x_step: the distance between neighbouring first arguments in the grid
+        - y_start: the smallest second argument in the grid
+        - y_step: the distance between neighbouring second arguments in the grid
+        - values: the value of exact at every grid point
+        - exact: the function that was tabulated, used for arguments outside the grid
+
+    Representation Invariants:
+        - self.x_step > 0.0 and self.y_step > 0.0
+        - self.values.ndim == 2
+        - self.values.shape[0] >= 2 and self.values.shape[1] >= 2
+    """
+    x_start: float
+    x_step: float
+    y_start: float
+    y_step: float
+    values: np.ndarray
+    exact: Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+    @classmethod
+    def build(cls, exact: Callable[[np.ndarray, np.ndarray], np.ndarray],
+              x_range: tuple[float, float, float],
+              y_range: tuple[float, float, float]) -> 'LookupTable':
+        """Return a LookupTable of exact on the grid given by x_range and y_range, each a tuple
+        of (start, stop, step) with stop included.
+
+        Preconditions:
+            - x_range[2] > 0.0 and y_range[2] > 0.0
+            - x_range[1] > x_range[0] and y_range[1] > y_range[0]
+        """
+        x_start, x_stop, x_step = x_range
+        y_start, y_stop, y_step = y_range
+        x = x_start + x_step * np.arange(round((x_stop - x_start) / x_step) + 1)
+        y = y_start + y_step * np.arange(round((y_stop - y_start) / y_step) + 1)
+        grid_x, grid_y = np.meshgrid(x, y, indexing='ij')
+
+        return cls(x_start, x_step, y_start, y_step, exact(grid_x, grid_y), exact)
+
+    def x_stop(self) -> float:
+        """Return the largest first argument in the grid."""
+        return self.x_start + self.x_step * (self.values.shape[0] - 1)
+
+    def y_stop(self) -> float:
+        """Return the largest second argument in the grid."""
+        return self.y_start + self.y_step * (self.values.shape[1] - 1)
+
+    def evaluate(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Return the tabulated function at each pair of values in x and y, interpolated
+        bilinearly inside the grid and calculated exactly outside it.
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        rows, columns = self.values.shape
+
+        fx = (x - self.x_start) / self.x_step
+        fy = (y - self.y_start) / self.y_step
+        inside = (fx >= 0.0) & (fx <= rows - 1) & (fy >= 0.0) & (fy <= columns - 1)
+
+        # The index of the grid point below and to the left of each query, kept inside the grid
+        # so that the four surrounding points can always be read
+        i = np.clip(fx, 0, rows - 2).astype(np.intp)
+        j = np.clip(fy, 0, columns - 2).astype(np.intp)
+        tx = fx - i
+        ty = fy - j
+
+        flat = self.values.ravel()
+        corner = i * columns + j
+        v00 = flat[corner]
+        v10 = flat[corner + columns]
+        v01 = flat[corner + 1]
+        v11 = flat[corner + columns + 1]
+        result = v00 + (v10 - v00) * tx + (v01 - v00) * ty + (v00 - v10 - v01 + v11) * tx * ty
+
+        if not inside.all():
+            result[~inside] = self.exact(x[~inside], y[~inside])
+
+        return result
+
+    def max_error(self, samples: int = 1000000, seed: int = 0) -> dict[str, float]:
+        """Return the largest difference between evaluate and exact found at samples random
+        points inside the grid and at the centre of every grid cell, both as an absolute
+        difference and relative to the exact value (or to 1.0, for exact values smaller than 1.0).
+        """
+        rng = np.random.default_rng(seed)
+        rows, columns = self.values.shape
+        x_centres = self.x_start + self.x_step * (np.arange(rows - 1) + 0.5)
+        y_centres = self.y_start + self.y_step * (np.arange(columns - 1) + 0.5)
+        x = np.concatenate([rng.uniform(self.x_start, self.x_stop(), samples),
+                            np.repeat(x_centres, columns - 1)])
+        y = np.concatenate([rng.uniform(self.y_start, self.y_stop(), samples),
+                            np.tile(y_centres, rows - 1)])
+
+        exact = self.exact(x, y)
+        error = np.abs(self.evaluate(x, y) - exact)
+        return {'absolute': float(np.max(error)),
+                'relative': float(np.max(error / np.maximum(np.abs(exact), 1.0)))}
+
+
+def build_isi_table(ffmc_step: float = 0.1, wind_max: float = 100.0,
+                    wind_step: float = 0.5) -> LookupTable:
+    """Return a LookupTable of the ISI as a function of the FFMC (from 0 to 101) and the wind
+    speed (from 0 to wind_max km/h).
+
+    Preconditions:
+        - ffmc_step > 0.0
+        - wind_max > 0.0 and wind_step > 0.0
+    """
+    return LookupTable.build(lambda ffmc, wind_speed: vffwi.calculate_isi(wind_speed, ffmc),
+                             (0.0, 101.0, ffmc_step), (0.0, wind_max, wind_step))
+
+
+def build_fwi_table(isi_max: float = 100.0, isi_step: float = 0.1, bui_max: float = 500.0,
+                    bui_step: float = 0.5) -> LookupTable:
+    """Return a LookupTable of the FWI as a function of the ISI (from 0 to isi_max) and the BUI
+    (from 0 to bui_max).
+
+    Preconditions:
+        - isi_max > 0.0 and isi_step > 0.0
+        - bui_max > 0.0 and bui_step > 0.0
+    """
+    return LookupTable.build(vffwi.calculate_fwi, (0.0, isi_max, isi_step),
+                             (0.0, bui_max, bui_step))
+
+
+@dataclass
+class FfwiTables:
+    """Lookup tables that replace the ISI and FWI equations in a3_ffwi_vectorized.
+
+    Instance Attributes:
+        - isi: a table of the ISI by FFMC and wind speed
+        - fwi: a table of the FWI by ISI and BUI
+    """
+    isi: LookupTable
+    fwi: LookupTable
+
+    @classmethod
+    def build(cls) -> 'FfwiTables':
+        """Return FfwiTables on the default grids of build_isi_table and build_fwi_table."""
+        return cls(build_isi_table(), build_fwi_table())
+
+    def calculate_isi(self, wind_speed: np.ndarray, ffmc: np.ndarray) -> np.ndarray:
+        """Return the ISI for each pair of values in wind_speed and ffmc, like
+        a3_ffwi_vectorized.calculate_isi, from the ISI table.
+        """
+        return self.isi.evaluate(ffmc, wind_speed)
+
+    def calculate_fwi(self, isi: np.ndarray, bui: np.ndarray) -> np.ndarray:
+        """Return the FWI for each pair of values in isi and bui, like
+        a3_ffwi_vectorized.calculate_fwi, from the FWI table.
+        """
+        return self.fwi.evaluate(isi, bui)
+
+    def calculate_all(self, month: np.ndarray, temperature: np.ndarray, humidity: np.ndarray,
+                      wind_speed: np.ndarray, precipitation: np.ndarray, f0: np.ndarray,
+                      dm0: np.ndarray, dc0: np.ndarray) -> tuple[np.ndarray, ...]:
+        """Return the same tuple as a3_ffwi_vectorized.calculate_all, with the ISI and FWI read
+        from the tables.
+        """
+        ffmc = vffwi.calculate_ffmc(temperature, humidity, wind_speed, precipitation, f0)
+        dmc = vffwi.calculate_dmc(month, temperature, humidity, precipitation, dm0)
+        dc = vffwi.calculate_dc(month, temperature, precipitation, dc0)
+        isi = self.calculate_isi(wind_speed, ffmc)
+        bui = vffwi.calculate_bui(dmc, dc)
+        fwi = self.calculate_fwi(isi, bui)
+
+        return ffmc, dmc, dc, isi, bui, fwi
+
+
+def scalar_isi(ffmc: float, wind_speed: float) -> float:
+    """Return the ISI for ffmc and wind_speed from a3_ffwi_system.calculate_isi, with the
+    arguments in the order of the ISI table.
+    """
+    return ffwi.calculate_isi(ffwi.WeatherMetrics(1, 1, 0.0, 0.0, wind_speed, 0.0), ffmc)
+
+
+def measure_speedup(table: LookupTable, scalar: Callable[[float, float], float],
+                    n: int = 100000, repeat: int = 3, seed: int = 0) -> dict[str, float]:
+    """Return the best time, in seconds, to evaluate n random points inside the grid of table
+    with the table, with its exact function, and with scalar (the a3_ffwi_system function it
+    replaces, called once per point), along with how many times faster the table is than each.
+
+    Preconditions:
+        - n >= 1
+        - repeat >= 1
+        - scalar takes the same two arguments, in the same order, as table.exact
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(table.x_start, table.x_stop(), n)
+    y = rng.uniform(table.y_start, table.y_stop(), n)
+
+    def best_time(function: Callable[[np.ndarray, np.ndarray], Any]) -> float:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(x, y)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    table_seconds = best_time(table.evaluate)
+    exact_seconds = best_time(table.exact)
+    scalar_seconds = best_time(lambda xs, ys: [scalar(a, b)
+                                               for a, b in zip(xs.tolist(), ys.tolist())])
+    return {'table': table_seconds, 'exact': exact_seconds, 'scalar': scalar_seconds,
+            'speedup': scalar_seconds / table_seconds,
+            'speedup_over_exact': exact_seconds / table_seconds}
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,40 @@
+"""Synthetic FFWI weather for the benchmarks, the tests, and the service's load test.
+
+The readings are random but reproducible from a seed, and are spread so that every branch of the
+FFWI equations is taken.
+"""
+import numpy as np
+
+from a3_ffwi_columns import WeatherColumns, WEATHER_DTYPE
+
+
+def generate_weather(n: int, seed: int = 0) -> WeatherColumns:
+    """Return n random daily readings, in order, that take every branch of the FFWI equations.
+
+    A quarter of the days are dry and the rest have rain spread below and above the 0.5, 1.5,
+    and 2.8 mm thresholds, including heavy rain; the humidity covers both the wetting and drying
+    paths of calculate_m.
+
+    Preconditions:
+        - n >= 0
+    """
+    rng = np.random.default_rng(seed)
+    data = np.empty(n, dtype=WEATHER_DTYPE)
+
+    day_of_year = np.arange(n) % 365
+    data['month'] = np.minimum(day_of_year // 31 + 1, 12)
+    data['day'] = day_of_year % 31 + 1
+    data['temperature'] = rng.uniform(-10.0, 35.0, n)
+    data['humidity'] = rng.uniform(5.0, 100.0, n)
+    data['wind_speed'] = rng.uniform(0.0, 60.0, n)
+    rain = rng.choice([0.0, 1.0, 2.2, 4.0], n) * rng.uniform(0.5, 1.5, n)
+    data['precipitation'] = np.where(rng.random(n) < 0.05, rng.uniform(10.0, 60.0, n), rain)
+
+    return WeatherColumns(data)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
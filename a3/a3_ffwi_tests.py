@@ -0,0 +1,925 @@
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import warnings
+from typing import Any
+
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+
+from a3_ffwi_system import WeatherMetrics
+from a3_part4 import load_data
+
+import a3_ffwi_batch as ffwi_batch
+import a3_ffwi_benchmarks as ffwi_benchmarks
+import a3_ffwi_cache as ffwi_cache
+import a3_ffwi_columns as columns
+import a3_ffwi_ensemble as ffwi_ensemble
+import a3_ffwi_grid as ffwi_grid
+import a3_ffwi_io as ffwi_io
+import a3_ffwi_plots as ffwi_plots
+import a3_ffwi_profiling as ffwi_profiling
+import a3_ffwi_service as ffwi_service
+import a3_ffwi_state as ffwi_state
+import a3_ffwi_store as ffwi_store
+import a3_ffwi_system as ffwi
+import a3_ffwi_test_data as ffwi_test_data
+import a3_ffwi_tables as ffwi_tables
+import a3_ffwi_vectorized as vffwi
+import a3_part4
+
+
+@pytest.fixture
+def random_readings() -> list[tuple[WeatherMetrics, float, float, float]]:
+    """A pytest fixture containing random WeatherMetrics with random previous-day FFMC, DMC, and DC
+    values, chosen so that every branch in a3_ffwi_system is taken by some of them.
+    """
+    rng = random.Random(110)
+    readings = []
+    for _ in range(2000):
+        wm = WeatherMetrics(rng.randint(1, 12), 1, rng.uniform(-10.0, 35.0),
+                            rng.uniform(5.0, 100.0), rng.uniform(0.0, 60.0),
+                            rng.choice([0.0, rng.uniform(0.0, 3.5), rng.uniform(0.0, 40.0)]))
+        readings.append((wm, rng.uniform(0.0, 101.0), rng.uniform(0.0, 150.0),
+                         rng.uniform(0.0, 800.0)))
+    return readings
+
+
+class TestVectorizedEquations:
+    """Tests comparing a3_ffwi_vectorized against the scalar functions in a3_ffwi_system."""
+
+    def test_all_match_scalar(self, random_readings) -> None:
+        """Test that calculate_all matches the scalar functions within vffwi.TOLERANCE."""
+        columns = [np.array([getattr(wm, name) for wm, _, _, _ in random_readings])
+                   for name in ('month', 'temperature', 'humidity', 'wind_speed',
+                                'precipitation')]
+        f0, dm0, dc0 = (np.array(values) for values in zip(*(r[1:] for r in random_readings)))
+        ffmc, dmc, dc, isi, bui, fwi = vffwi.calculate_all(*columns, f0, dm0, dc0)
+
+        for i, (wm, f, dm, d) in enumerate(random_readings):
+            expected_ffmc = ffwi.calculate_ffmc(wm, f)
+            expected_dmc = ffwi.calculate_dmc(wm, dm)
+            expected_dc = ffwi.calculate_dc(wm, d)
+            expected_isi = ffwi.calculate_isi(wm, expected_ffmc)
+            expected_bui = ffwi.calculate_bui(expected_dmc, expected_dc)
+            expected_fwi = ffwi.calculate_fwi(expected_isi, expected_bui)
+
+            assert math.isclose(ffmc[i], expected_ffmc, rel_tol=vffwi.TOLERANCE)
+            assert math.isclose(dmc[i], expected_dmc, rel_tol=vffwi.TOLERANCE)
+            assert math.isclose(dc[i], expected_dc, rel_tol=vffwi.TOLERANCE)
+            assert math.isclose(isi[i], expected_isi, rel_tol=vffwi.TOLERANCE)
+            assert math.isclose(bui[i], expected_bui, rel_tol=vffwi.TOLERANCE)
+            assert math.isclose(fwi[i], expected_fwi, rel_tol=vffwi.TOLERANCE)
+
+    def test_mr_both_branches(self) -> None:
+        """Test that calculate_mr matches the scalar function on both sides of Equation 3a/3b."""
+        actual = vffwi.calculate_mr(np.array([1.0, 1.0]), np.array([150.0, 150.000000000001]))
+
+        assert actual[0] == pytest.approx(ffwi.calculate_mr(1.0, 150.0))
+        assert actual[1] == pytest.approx(ffwi.calculate_mr(1.0, 150.000000000001))
+
+    def test_dmr_all_branches(self) -> None:
+        """Test that calculate_dmr matches the scalar function for Equations 13a, 13b, and 13c."""
+        dm0 = np.array([10.0, 33.0, 50.0, 65.0, 100.0])
+        actual = vffwi.calculate_dmr(np.full(5, 10.0), dm0)
+
+        assert list(actual) == pytest.approx([ffwi.calculate_dmr(10.0, x) for x in dm0])
+
+    def test_fwi_both_branches(self) -> None:
+        """Test that calculate_fwi matches the scalar function for Equations 28a/b and 30a/b."""
+        isi = np.array([0.1, 0.1, 10.0, 10.0])
+        bui = np.array([5.0, 90.0, 5.0, 90.0])
+        actual = vffwi.calculate_fwi(isi, bui)
+
+        assert list(actual) == pytest.approx([ffwi.calculate_fwi(x, y) for x, y in zip(isi, bui)])
+
+
+class TestCalculateSeason:
+    """Tests for the day-chained season runners."""
+
+    def test_part4_outputs_match_ground_truth(self) -> None:
+        """Test that calculate_ffwi_outputs, which chains each day into the next, matches the
+        values in data/ffwi/sample_data.csv to one decimal place."""
+        inputs, outputs = load_data('data/ffwi/sample_data.csv')
+        actual = a3_part4.calculate_ffwi_outputs(inputs)
+
+        for wm, expected in zip(inputs, outputs):
+            for attribute in ('ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi'):
+                assert round(getattr(actual[(wm.month, wm.day)], attribute), 1) == \
+                    pytest.approx(getattr(expected, attribute), abs=0.11)
+
+    def test_many_stations_match_part4(self) -> None:
+        """Test that calculate_season, run on several stations at once, matches
+        calculate_ffwi_outputs run on each station separately."""
+        inputs, _ = load_data('data/ffwi/sample_data.csv')
+        stations = [inputs, inputs[::-1], [WeatherMetrics(wm.month, wm.day, wm.temperature + 5.0,
+                                                          wm.humidity, wm.wind_speed,
+                                                          wm.precipitation * 3.0)
+                                           for wm in inputs]]
+        columns = [np.array([[getattr(wm, name) for wm in station] for station in stations]).T
+                   for name in ('month', 'temperature', 'humidity', 'wind_speed',
+                                'precipitation')]
+        actual = vffwi.calculate_season(*columns)
+
+        for i, station in enumerate(stations):
+            expected = list(a3_part4.calculate_ffwi_outputs(station).values())
+            for j, attribute in enumerate(('ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi')):
+                assert list(actual[j][:, i]) == \
+                    pytest.approx([getattr(x, attribute) for x in expected], rel=vffwi.TOLERANCE)
+
+    def test_one_station_matches_part4_exactly(self) -> None:
+        """Test that calculate_season on one-dimensional arrays chains the scalar functions, so
+        its outputs are exactly those of calculate_ffwi_outputs, including from other starting
+        codes."""
+        inputs, _ = load_data('data/ffwi/sample_data.csv')
+        columns = [np.array([getattr(wm, name) for wm in inputs])
+                   for name in ('month', 'temperature', 'humidity', 'wind_speed',
+                                'precipitation')]
+        actual = vffwi.calculate_season(*columns)
+        expected = list(a3_part4.calculate_ffwi_outputs(inputs).values())
+
+        for j, attribute in enumerate(('ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi')):
+            assert actual[j].shape == (len(inputs),)
+            assert actual[j].tolist() == [getattr(x, attribute) for x in expected]
+
+        resumed = vffwi.calculate_season(*(column[10:] for column in columns),
+                                         actual[0][9], actual[1][9], actual[2][9])
+        assert resumed[5].tolist() == actual[5][10:].tolist()
+        assert all(len(output) == 0 for output in vffwi.calculate_season(*[[]] * 5))
+
+
+class TestColumns:
+    """Tests for WeatherColumns and FfwiColumns."""
+
+    def test_load_data_columnar_matches_lists(self) -> None:
+        """Test that the columnar form of load_data hands out the same records as the lists."""
+        inputs, outputs = load_data('data/ffwi/sample_data.csv')
+        weather, ffwi_outputs = load_data('data/ffwi/sample_data.csv', columnar=True)
+
+        assert list(weather) == inputs
+        assert list(ffwi_outputs) == outputs
+        assert weather[3] == inputs[3]
+        assert list(weather[10:20]) == inputs[10:20]
+
+    def test_smaller_than_dataclass_lists(self) -> None:
+        """Test that the columns use less memory per row than the lists of dataclasses."""
+        inputs, outputs = load_data('data/ffwi/sample_data.csv')
+        weather, ffwi_outputs = load_data('data/ffwi/sample_data.csv', columnar=True)
+
+        assert weather.nbytes_per_row() < columns.dataclass_bytes_per_row(inputs)
+        assert ffwi_outputs.nbytes_per_row() < columns.dataclass_bytes_per_row(outputs)
+
+    def test_part4_accepts_columns(self) -> None:
+        """Test that calculate_ffwi_outputs and get_xy_data give the same results for columns as
+        for lists."""
+        inputs, _ = load_data('data/ffwi/sample_data.csv')
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        expected = a3_part4.calculate_ffwi_outputs(inputs)
+        actual = a3_part4.calculate_ffwi_outputs(weather)
+
+        assert actual.dates() == list(expected)
+        expected_x, expected_y = a3_part4.get_xy_data(expected, 'fwi')
+        actual_x, actual_y = a3_part4.get_xy_data(actual, 'fwi')
+        assert actual_x == expected_x
+        assert actual_y == expected_y
+        assert actual.to_dict() == expected
+
+    def test_load_header_only_file(self, tmp_path) -> None:
+        """Test that both paths of load_data read a file with only a header as no rows."""
+        source = str(tmp_path / 'header.csv')
+        with open(source, 'w') as f:
+            f.write(ffwi_io.HEADER + '\n')
+
+        assert load_data(source) == ([], [])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            weather, outputs = load_data(source, columnar=True)
+        assert (len(weather), len(outputs)) == (0, 0)
+        assert a3_part4.calculate_ffwi_outputs(weather).to_dict() == {}
+
+
+class TestStreaming:
+    """Tests for the chunked readers and writers in a3_ffwi_io."""
+
+    def test_chunks_match_load_data(self) -> None:
+        """Test that the chunks, put back together, contain the same records as load_data."""
+        inputs, outputs = load_data('data/ffwi/sample_data.csv')
+        chunks = list(ffwi_io.iter_chunks('data/ffwi/sample_data.csv', chunk_size=10))
+
+        assert [len(weather) for weather, _ in chunks] == [10, 10, 10, 10, 9]
+        assert [wm for weather, _ in chunks for wm in weather] == inputs
+        assert [fo for _, ffwi_outputs in chunks for fo in ffwi_outputs] == outputs
+
+    def test_bad_row(self, tmp_path) -> None:
+        """Test that a row with the wrong number of columns raises a ValueError."""
+        filename = tmp_path / 'bad.csv'
+        filename.write_text(ffwi_io.HEADER + '\n4,13,17.0,42.0,25.0,0.0\n')
+
+        with pytest.raises(ValueError):
+            list(ffwi_io.iter_chunks(str(filename)))
+
+    def test_empty_file(self, tmp_path) -> None:
+        """Test that a file with no rows, or no header either, has no chunks."""
+        header_only = tmp_path / 'header.csv'
+        header_only.write_text(ffwi_io.HEADER + '\n')
+        empty = tmp_path / 'empty.csv'
+        empty.write_text('')
+
+        assert list(ffwi_io.iter_chunks(str(header_only))) == []
+        assert list(ffwi_io.iter_outputs(str(empty))) == []
+        assert ffwi_io.process_file(str(empty), str(tmp_path / 'outputs.csv')) == 0
+
+    def test_trailing_blank_lines(self, tmp_path) -> None:
+        """Test that blank lines at the end of a file are skipped, even when they fill a whole
+        chunk."""
+        with open('data/ffwi/sample_data.csv') as f:
+            text = f.read()
+        source = tmp_path / 'blank.csv'
+        source.write_text(text + '\n\n')
+
+        expected = list(ffwi_io.iter_chunks('data/ffwi/sample_data.csv', 49))
+        actual = list(ffwi_io.iter_chunks(str(source), 49))
+        assert len(actual) == len(expected) == 1
+        assert np.array_equal(actual[0][0].data, expected[0][0].data)
+
+    def test_process_file_chains_across_chunks(self, tmp_path) -> None:
+        """Test that process_file writes the same outputs as calculate_ffwi_outputs, even though
+        the season is split into several chunks."""
+        inputs, _ = load_data('data/ffwi/sample_data.csv')
+        expected = list(a3_part4.calculate_ffwi_outputs(inputs).values())
+        destination = str(tmp_path / 'outputs.csv')
+
+        assert ffwi_io.process_file('data/ffwi/sample_data.csv', destination, chunk_size=8) == 49
+
+        actual_inputs, actual_outputs = load_data(destination)
+        assert actual_inputs == inputs
+        for actual, exact in zip(actual_outputs, expected):
+            assert actual.fwi == pytest.approx(exact.fwi, abs=0.051)
+            assert actual.dc == pytest.approx(exact.dc, abs=0.051)
+
+
+class TestStationStates:
+    """Tests for the incremental daily updates in a3_ffwi_state."""
+
+    def test_daily_updates_match_season(self, tmp_path) -> None:
+        """Test that applying a season one day at a time through a checkpoint file gives the same
+        outputs as calculating the whole season at once, for two stations."""
+        inputs, _ = load_data('data/ffwi/sample_data.csv')
+        expected_a = list(a3_part4.calculate_ffwi_outputs(inputs).values())
+        expected_b = list(a3_part4.calculate_ffwi_outputs(inputs[::-1]).values())
+        checkpoint = str(tmp_path / 'states.npz')
+
+        for wm_a, wm_b, fo_a, fo_b in zip(inputs, inputs[::-1], expected_a, expected_b):
+            actual = ffwi_state.update_daily(checkpoint, ['station-b', 'station-a'], [wm_b, wm_a])
+            assert actual[1].fwi == pytest.approx(fo_a.fwi, rel=vffwi.TOLERANCE)
+            assert actual[0].fwi == pytest.approx(fo_b.fwi, rel=vffwi.TOLERANCE)
+
+        states = ffwi_state.load_states(checkpoint)
+        assert list(states.station_ids) == ['station-a', 'station-b']
+        assert list(tmp_path.iterdir()) == [tmp_path / 'states.npz']
+
+    def test_new_station_starts_from_initial_values(self, tmp_path) -> None:
+        """Test that a station without a checkpointed state starts from the initial values."""
+        wm = WeatherMetrics(4, 13, 17.0, 42.0, 25.0, 0.0)
+        actual = ffwi_state.update_station(str(tmp_path / 'states.npz'), 'new', wm)
+
+        assert actual.ffmc == pytest.approx(ffwi.calculate_ffmc(wm, ffwi.INITIAL_FFMC))
+        assert actual.dc == pytest.approx(ffwi.calculate_dc(wm, ffwi.INITIAL_DC))
+
+
+class TestReprocessSeasons:
+    """Tests for the process pool in a3_ffwi_batch."""
+
+    def test_matches_sequential(self) -> None:
+        """Test that reprocess_seasons returns the same outputs, in the same order, as calculating
+        each season on its own."""
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        seasons = [weather, weather[5:], weather[::-1], weather[:20], weather[3:23]] * 3
+        actual, report = ffwi_batch.reprocess_seasons(seasons, max_workers=2, shard_size=4)
+
+        assert len(actual) == len(seasons)
+        for season, outputs in zip(seasons, actual):
+            expected = columns.calculate_outputs(season)
+            assert outputs.dates() == expected.dates()
+            assert list(outputs.column('fwi')) == \
+                pytest.approx(list(expected.column('fwi')), rel=vffwi.TOLERANCE)
+
+        assert sum(worker.seasons for worker in report.workers) == len(seasons)
+        assert sum(worker.rows for worker in report.workers) == sum(len(s) for s in seasons)
+
+    def test_shard_of_mixed_lengths(self) -> None:
+        """Test that calculate_shard gives the same outputs for seasons it calculates on their
+        own as for seasons of the same length that it stacks."""
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        singles = [weather[:length] for length in (10, 25, 49)]
+        stacked = [weather[::-1][:30]] * ffwi_batch.MIN_STACKED_SEASONS
+        shard = [season.data for season in singles + stacked]
+        results = ffwi_batch.calculate_shard(shard)
+
+        for season, data in zip(singles + stacked[:1], results):
+            expected = columns.calculate_outputs(season)
+            assert list(data['fwi']) == pytest.approx(list(expected.column('fwi')),
+                                                      rel=vffwi.TOLERANCE)
+        for season, data in zip(singles, results):
+            assert np.array_equal(data, columns.calculate_outputs(season).data)
+        assert all(np.array_equal(data, results[3]) for data in results[4:])
+
+
+class TestCache:
+    """Tests for the binary parse cache in a3_ffwi_cache."""
+
+    def test_cache_round_trip(self, tmp_path) -> None:
+        """Test that the first load writes the cache and the second memory-maps it."""
+        source = str(tmp_path / 'sample_data.csv')
+        shutil.copy('data/ffwi/sample_data.csv', source)
+        cache_dir = str(tmp_path / 'cache')
+        inputs, outputs = load_data(source)
+
+        assert not ffwi_cache.is_cached(source, cache_dir)
+        ffwi_cache.load_cached(source, cache_dir)
+        assert ffwi_cache.is_cached(source, cache_dir)
+
+        weather, ffwi_outputs = ffwi_cache.load_cached(source, cache_dir)
+        assert isinstance(weather.data, np.memmap)
+        assert list(weather) == inputs
+        assert list(ffwi_outputs) == outputs
+
+    def test_load_data_reads_cache(self, tmp_path, monkeypatch) -> None:
+        """Test that load_data with cache=True parses the file on the first load only, on both
+        the columnar and the list path."""
+        source = str(tmp_path / 'sample_data.csv')
+        shutil.copy('data/ffwi/sample_data.csv', source)
+        cache_dir = str(tmp_path / 'cache')
+        inputs, outputs = load_data(source)
+
+        weather, _ = load_data(source, columnar=True, cache=True, cache_dir=cache_dir)
+        assert list(weather) == inputs
+
+        def fail(*args: Any) -> None:
+            raise AssertionError('the file was parsed again')
+
+        monkeypatch.setattr(ffwi_io, 'iter_chunks', fail)
+        monkeypatch.setattr(np, 'loadtxt', fail)
+        weather, _ = load_data(source, columnar=True, cache=True, cache_dir=cache_dir)
+        assert isinstance(weather.data, np.memmap)
+        assert load_data(source, cache=True, cache_dir=cache_dir) == (inputs, outputs)
+
+    def test_changed_source_is_reparsed(self, tmp_path) -> None:
+        """Test that the cache is not used once the source file changes."""
+        source = str(tmp_path / 'sample_data.csv')
+        shutil.copy('data/ffwi/sample_data.csv', source)
+        cache_dir = str(tmp_path / 'cache')
+        ffwi_cache.load_cached(source, cache_dir)
+
+        with open(source, 'a') as f:
+            f.write('6,1,20.0,30.0,10.0,0.0,90.0,50.0,300.0,8.0,70.0,20.0\n')
+
+        assert not ffwi_cache.is_cached(source, cache_dir)
+        weather, _ = ffwi_cache.load_cached(source, cache_dir)
+        assert len(weather) == 50
+
+    def test_invalidate_and_clear(self, tmp_path) -> None:
+        """Test that invalidate removes one file's cache and clear_cache removes the directory."""
+        source = str(tmp_path / 'sample_data.csv')
+        shutil.copy('data/ffwi/sample_data.csv', source)
+        cache_dir = str(tmp_path / 'cache')
+        ffwi_cache.load_cached(source, cache_dir)
+
+        ffwi_cache.invalidate(source, cache_dir)
+        assert not ffwi_cache.is_cached(source, cache_dir)
+
+        ffwi_cache.load_cached(source, cache_dir)
+        assert ffwi_cache.clear_cache(cache_dir) == 3
+        assert not os.path.exists(cache_dir)
+        assert ffwi_cache.clear_cache(cache_dir) == 0
+
+    def test_clear_cache_keeps_other_files(self, tmp_path) -> None:
+        """Test that clear_cache removes only the cache's own files, including a temporary file
+        left by an interrupted write, from a directory shared with other files."""
+        source = str(tmp_path / 'sample_data.csv')
+        shutil.copy('data/ffwi/sample_data.csv', source)
+        ffwi_cache.load_cached(source, str(tmp_path))
+        prefix = ffwi_cache._cache_prefix(source, str(tmp_path))
+        with open(prefix + '.ffwi.npy.k3x_9q.tmp', 'w') as f:
+            f.write('partial')
+        for name in ('settings.json', 'notes.tmp', 'sample_data.json'):
+            (tmp_path / name).write_text('{}')
+
+        assert ffwi_cache.clear_cache(str(tmp_path)) == 4
+        assert sorted(os.listdir(tmp_path)) == ['notes.tmp', 'sample_data.csv',
+                                                'sample_data.json', 'settings.json']
+
+
+class TestBenchmarks:
+    """Tests for the synthetic data and regression checks in a3_ffwi_benchmarks."""
+
+    def test_synthetic_data_takes_every_branch(self) -> None:
+        """Test that the synthetic weather and previous-day codes take every branch."""
+        weather = ffwi_test_data.generate_weather(10000)
+        counts = ffwi_benchmarks.branch_counts(weather,
+                                               *ffwi_benchmarks.generate_previous_codes(10000))
+
+        assert all(count > 0 for count in counts.values())
+
+    def test_run_benchmarks(self) -> None:
+        """Test that every benchmark is run at every size."""
+        results = ffwi_benchmarks.run_benchmarks([100, 200], max_python_rows=100, repeat=1)
+
+        assert set(results['vectorized.calculate_all']) == {'100', '200'}
+        assert set(results['ffwi_system.calculate_mr']) == {'100'}
+        assert set(results['part4.load_data[columnar]']) == {'100', '200'}
+
+    def test_per_row_benchmarks_are_capped(self) -> None:
+        """Test that no benchmark that loops over rows in Python, including the columnar and
+        streaming ones, is run above max_python_rows."""
+        results = ffwi_benchmarks.run_benchmarks([50, 120], max_python_rows=50, repeat=1)
+
+        for name in ffwi_benchmarks.PER_ROW_BENCHMARKS:
+            assert set(results[name]) == {'50'}
+        assert set(results['io.iter_chunks']) == {'50', '120'}
+
+    def test_find_slower_paths(self) -> None:
+        """Test that a new path is reported only where it is slower than the path it replaces
+        by more than the threshold."""
+        results = {'part4.calculate_ffwi_outputs[columnar]': {'100': 0.5, '1000': 16.0,
+                                                              '10000': 1.0},
+                   'part4.calculate_ffwi_outputs': {'100': 0.1, '1000': 0.4},
+                   'vectorized.calculate_fwi': {'100': 0.0001},
+                   'ffwi_system.calculate_fwi': {'100': 0.00001}}
+
+        slower = ffwi_benchmarks.find_slower_paths(results, threshold=0.25)
+        assert len(slower) == 2
+        assert slower[1].startswith('part4.calculate_ffwi_outputs[columnar] at 1000 rows')
+        assert '40.0x' in slower[1]
+
+    def test_save_baseline_requires_baseline(self) -> None:
+        """Test that --save-baseline without --baseline is a usage error."""
+        with pytest.raises(SystemExit) as info:
+            ffwi_benchmarks.main(['--save-baseline', '--sizes', '10'])
+        assert info.value.code == 2
+
+    def test_find_regressions(self) -> None:
+        """Test that only benchmarks slower than the threshold are reported."""
+        baseline = {'fast': {'100': 1.0, '1000': 10.0}, 'slow': {'100': 1.0}}
+        results = {'fast': {'100': 1.1, '1000': 10.0}, 'slow': {'100': 1.3},
+                   'new': {'100': 5.0}}
+
+        regressions = ffwi_benchmarks.find_regressions(results, baseline, threshold=0.25)
+        assert len(regressions) == 1
+        assert regressions[0].startswith('slow at 100 rows')
+
+
+class TestPlots:
+    """Tests for the downsampling and large-series plotting in a3_ffwi_plots."""
+
+    def test_lttb_keeps_shape(self) -> None:
+        """Test that LTTB keeps the endpoints and a single spike in a long flat series."""
+        y = np.zeros(100000)
+        y[31415] = 50.0
+        indices = ffwi_plots.lttb_indices(y, 500)
+
+        assert len(indices) == 500
+        assert indices[0] == 0 and indices[-1] == len(y) - 1
+        assert 31415 in indices
+        assert list(indices) == sorted(indices)
+
+    def test_minmax_keeps_extremes(self) -> None:
+        """Test that min/max bucketing keeps the smallest and largest points."""
+        y = np.sin(np.linspace(0.0, 100.0, 100000))
+        indices = ffwi_plots.minmax_indices(y, 1000)
+
+        assert len(indices) <= 1000
+        assert y[indices].max() == y.max() and y[indices].min() == y.min()
+
+    def test_make_trace_switches_to_webgl(self) -> None:
+        """Test that long series are downsampled and drawn with WebGL, and short ones are not."""
+        short = ffwi_plots.make_trace(['a', 'b'], [1.0, 2.0], 'fwi')
+        long = ffwi_plots.make_trace([str(i) for i in range(20000)], np.arange(20000.0), 'fwi',
+                                     max_points=1000, webgl_threshold=10000)
+
+        assert type(short).__name__ == 'Scatter' and list(short.y) == [1.0, 2.0]
+        assert type(long).__name__ == 'Scattergl' and len(long.y) == 1000
+
+    def test_figure_has_every_attribute(self) -> None:
+        """Test that the figure has one subplot per attribute for both kinds of outputs."""
+        inputs, _ = load_data('data/ffwi/sample_data.csv')
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+
+        for outputs in (a3_part4.calculate_ffwi_outputs(inputs),
+                        a3_part4.calculate_ffwi_outputs(weather)):
+            fig = ffwi_plots.ffwi_attributes_figure(outputs)
+            assert [trace.name for trace in fig.data] == list(ffwi_plots.ATTRIBUTES)
+            assert list(fig.data[5].y) == a3_part4.get_xy_data(outputs, 'fwi')[1]
+
+
+class TestResultStore:
+    """Tests for the station- and date-indexed FfwiResultStore."""
+
+    @pytest.fixture
+    def store(self) -> ffwi_store.FfwiResultStore:
+        """Return a store of the sample season for three years at two stations, added in a
+        shuffled order."""
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        outputs = columns.calculate_outputs(weather)
+        rows = [(station, year, i) for station in ('B', 'A') for year in (2019, 2020, 2021)
+                for i in range(len(outputs))]
+        random.Random(0).shuffle(rows)
+
+        indices = [i for _, _, i in rows]
+        dates = ffwi_store.make_dates([year for _, year, _ in rows],
+                                      outputs.column('month')[indices],
+                                      outputs.column('day')[indices])
+        return ffwi_store.FfwiResultStore.from_columns([station for station, _, _ in rows], dates,
+                                                       outputs[indices])
+
+    def test_range_query(self, store) -> None:
+        """Test that a range query returns exactly the rows in the range, in date order, as a
+        view into the store."""
+        series = store.series('A', '2019-05-01', '2021-05-31')
+
+        assert series.labels()[0] == '2019-05-01' and series.labels()[-1] == '2021-05-31'
+        assert len(series) == 31 + 49 + 49
+        assert all(np.diff(series.dates).astype(int) > 0)
+        assert np.shares_memory(series.column('fwi'), store.outputs.data)
+
+    def test_open_range_and_missing_station(self, store) -> None:
+        """Test that an open range returns every row of a station, and that an unknown station
+        raises a KeyError."""
+        assert len(store.series('B')) == 49 * 3
+        assert len(store.series('B', end='2019-12-31')) == 49
+
+        with pytest.raises(KeyError):
+            store.series('C')
+
+    def test_get_xy_data_reads_series(self, store) -> None:
+        """Test that get_xy_data labels an FfwiSeries with its dates."""
+        series = store.series('A', '2020-01-01', '2020-12-31')
+        x_data, y_data = a3_part4.get_xy_data(series, 'bui')
+
+        assert x_data[0] == '2020-04-13'
+        assert y_data == list(series.column('bui'))
+
+    def test_plot_titles_axis_by_labels(self, store, monkeypatch) -> None:
+        """Test that plot_ffwi_attribute and ffwi_attributes_figure title the x-axis 'Date' for
+        a series labelled with dates, and '(Month, Day)' for outputs labelled with the month and
+        day, and that percentile bands are labelled like the series they are drawn behind."""
+        shown = []
+        monkeypatch.setattr(go.Figure, 'show', lambda fig: shown.append(fig))
+        inputs, _ = load_data('data/ffwi/sample_data.csv')
+
+        a3_part4.plot_ffwi_attribute(store.series('A'), 'fwi')
+        a3_part4.plot_ffwi_attribute(a3_part4.calculate_ffwi_outputs(inputs), 'fwi')
+
+        assert [fig.layout.xaxis.title.text for fig in shown] == ['Date', '(Month, Day)']
+
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        series = store.series('A', '2020-01-01', '2020-12-31')
+        a3_part4.plot_ffwi_attribute(series, 'fwi', bands=ffwi_ensemble.run_ensemble(weather, 20))
+        assert all(list(trace.x) == series.labels() for trace in shown[2].data)
+
+        figure = ffwi_plots.ffwi_attributes_figure(series)
+        assert figure.layout.xaxis6.title.text == 'Date'
+
+
+class TestGrids:
+    """Tests for the tiled, memory-mapped grid calculations in a3_ffwi_grid."""
+
+    def test_grids_match_season(self, tmp_path) -> None:
+        """Test that calculating a grid tile by tile matches calculating every cell as a station,
+        including tiles that are cut short at the edges."""
+        rng = np.random.default_rng(11)
+        days, rows, cols = 12, 5, 7
+        weather = ffwi_grid.WeatherGrids(np.array([4] * 6 + [5] * 6),
+                                         rng.uniform(-5.0, 30.0, (days, rows, cols)),
+                                         rng.uniform(10.0, 100.0, (days, rows, cols)),
+                                         rng.uniform(0.0, 40.0, (days, rows, cols)),
+                                         rng.choice([0.0, 1.0, 2.0, 10.0], (days, rows, cols)))
+        ffwi_grid.save_weather_grids(str(tmp_path / 'weather'), weather)
+
+        outputs = ffwi_grid.calculate_grids(ffwi_grid.open_weather_grids(str(tmp_path / 'weather')),
+                                            str(tmp_path / 'outputs'), tile_shape=(2, 3),
+                                            dtype=np.float64)
+        expected = vffwi.calculate_season(
+            np.repeat(weather.months[:, None], rows * cols, axis=1),
+            *(getattr(weather, name).reshape(days, -1) for name in ffwi_grid.WEATHER_VARIABLES))
+
+        for name, values in zip(ffwi_grid.OUTPUT_VARIABLES, expected):
+            stored = np.load(str(tmp_path / 'outputs' / (name + '.npy')), mmap_mode='r')
+            assert stored.shape == (days, rows, cols)
+            assert np.allclose(outputs[name].reshape(days, -1), values, rtol=vffwi.TOLERANCE)
+            assert np.array_equal(stored, outputs[name])
+
+    def test_iter_tiles_covers_grid(self) -> None:
+        """Test that the tiles cover every cell exactly once."""
+        covered = np.zeros((10, 9), dtype=int)
+        for row_slice, column_slice in ffwi_grid.iter_tiles(10, 9, (4, 4)):
+            covered[row_slice, column_slice] += 1
+
+        assert (covered == 1).all()
+
+
+class TestEnsemble:
+    """Tests for the Monte Carlo ensembles in a3_ffwi_ensemble."""
+
+    def test_members_match_perturbed_seasons(self) -> None:
+        """Test that each member of a batched ensemble matches its perturbed weather run as a
+        separate season, and that members do not depend on the ensemble size."""
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        noise = ffwi_ensemble.WeatherNoise()
+        outputs = ffwi_ensemble.run_members(weather, 8, noise, seed=42)
+        perturbed = ffwi_ensemble.perturb_weather(weather, 8, noise, seed=42)
+
+        member = weather.data.copy()
+        for name, values in zip(('temperature', 'humidity', 'wind_speed', 'precipitation'),
+                                perturbed):
+            member[name] = values[:, 3]
+        expected = columns.calculate_outputs(columns.WeatherColumns(member))
+        assert list(outputs[5][:, 3]) == pytest.approx(list(expected.column('fwi')),
+                                                       rel=vffwi.TOLERANCE)
+
+        fewer = ffwi_ensemble.run_members(weather, 4, noise, seed=42)
+        assert np.array_equal(fewer[5], outputs[5][:, :4])
+
+    def test_bands_are_ordered_and_plotted(self) -> None:
+        """Test that the percentile bands are in increasing order on every day and can be drawn
+        as shaded ranges."""
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        bands = ffwi_ensemble.run_ensemble(weather, 100, seed=1)
+
+        assert bands.values['fwi'].shape == (5, len(weather))
+        assert (np.diff(bands.values['fwi'], axis=0) >= 0.0).all()
+
+        fig = go.Figure()
+        ffwi_plots.add_percentile_bands(fig, bands, 'fwi')
+        assert [trace.fill for trace in fig.data] == [None, 'tonexty'] * 2
+
+    def test_median_tracks_deterministic_run(self) -> None:
+        """Test that dry days stay dry in every member, and that the median of a large ensemble
+        stays close to the season calculated from the observed weather."""
+        weather, _ = load_data('data/ffwi/sample_data.csv', columnar=True)
+        noise = ffwi_ensemble.WeatherNoise()
+        precipitation = ffwi_ensemble.perturb_weather(weather, 50, noise, seed=2)[3]
+        dry = weather.column('precipitation') == 0.0
+        assert (precipitation[dry] == 0.0).all()
+        assert (precipitation[~dry] > 0.0).all()
+
+        bands = ffwi_ensemble.run_ensemble(weather, 1000, noise, percentiles=(50.0,), seed=2)
+        expected = columns.calculate_outputs(weather)
+        for attribute in ffwi_ensemble.ATTRIBUTES:
+            difference = bands.band(attribute, 50.0) - expected.column(attribute)
+            assert abs(np.mean(difference)) < 0.5
+            assert np.max(np.abs(difference)) < 2.0
+
+
+class TestLookupTables:
+    """Tests for the ISI and FWI lookup tables in a3_ffwi_tables."""
+
+    def test_exact_at_grid_points_and_outside_grid(self) -> None:
+        """Test that the table is exact at its grid points and falls back to the exact function
+        outside its grid."""
+        table = ffwi_tables.build_fwi_table(isi_max=50.0, isi_step=0.5, bui_max=200.0,
+                                            bui_step=1.0)
+        isi = np.array([0.0, 10.5, 50.0, 75.0, 10.0])
+        bui = np.array([0.0, 81.0, 200.0, 20.0, 250.0])
+
+        assert list(table.evaluate(isi, bui)) == \
+            pytest.approx([ffwi.calculate_fwi(x, y) for x, y in zip(isi, bui)])
+
+    def test_max_error(self) -> None:
+        """Test that the reported maximum error bounds the error at random points."""
+        tables = ffwi_tables.FfwiTables(ffwi_tables.build_isi_table(),
+                                        ffwi_tables.build_fwi_table(isi_max=50.0, bui_max=200.0))
+        error = tables.isi.max_error(samples=10000)
+        assert error['relative'] < 1e-3
+
+        rng = np.random.default_rng(3)
+        ffmc, wind_speed = rng.uniform(0.0, 101.0, 1000), rng.uniform(0.0, 100.0, 1000)
+        actual = tables.calculate_isi(wind_speed, ffmc)
+        assert np.max(np.abs(actual - vffwi.calculate_isi(wind_speed, ffmc))) <= error['absolute']
+
+    def test_measure_speedup(self) -> None:
+        """Test that the speedup is reported against both the scalar function the table replaces
+        and the exact array function."""
+        table = ffwi_tables.build_isi_table(ffmc_step=1.0, wind_step=5.0)
+        assert ffwi_tables.scalar_isi(85.0, 20.0) == \
+            pytest.approx(float(table.exact(np.array(85.0), np.array(20.0))))
+
+        result = ffwi_tables.measure_speedup(table, ffwi_tables.scalar_isi, n=100, repeat=1)
+        assert result['speedup'] == pytest.approx(result['scalar'] / result['table'])
+        assert result['speedup_over_exact'] == pytest.approx(result['exact'] / result['table'])
+
+
+class TestProfiling:
+    """Tests for the opt-in counters in a3_ffwi_profiling."""
+
+    def test_counts_calls_and_branches(self) -> None:
+        """Test that a season run through a3_part4 is counted, including the calls between the
+        functions in a3_ffwi_system, and that disabling restores the original functions."""
+        original = ffwi.calculate_mr
+        ffwi_profiling.reset()
+        ffwi_profiling.enable()
+        try:
+            inputs, _ = a3_part4.load_data('data/ffwi/sample_data.csv')
+            a3_part4.calculate_ffwi_outputs(inputs)
+            ffwi.calculate_mr(1.0, 150.000000000001)
+        finally:
+            ffwi_profiling.disable()
+
+        stats = ffwi_profiling.snapshot()
+        rainy_days = sum(1 for wm in inputs if wm.precipitation > 0.5)
+        assert stats['a3_part4.load_data']['calls'] == 1
+        assert stats['a3_ffwi_system.calculate_ffmc']['calls'] == 49
+        assert stats['a3_ffwi_system.calculate_mr']['calls'] == rainy_days + 1
+        assert stats['a3_ffwi_system.calculate_mr']['branches']['equation 3b'] == 1
+        assert sum(stats['a3_ffwi_system.calculate_fwi']['branches'].values()) == 49 * 2
+        assert ffwi.calculate_mr is original
+
+        ffwi_profiling.reset()
+        assert ffwi_profiling.snapshot() == {}
+        assert ffwi_profiling.export_json() == '{}'
+
+    def test_m_branches_and_errors(self) -> None:
+        """Test that calculate_m's wetting branch is counted even when it leaves mo unchanged,
+        and that calls that raise are counted."""
+        ffwi_profiling.reset()
+        ffwi_profiling.enable()
+        try:
+            # At 0% humidity and no wind, kw is 0, so wetting leaves mo unchanged
+            calm = ffwi.WeatherMetrics(6, 1, 20.0, 0.0, 0.0, 0.0)
+            assert ffwi.calculate_m(calm, 50.0, 0.0) == 0.0
+            # Wetting with mo == ew also leaves mo unchanged
+            humid = ffwi.WeatherMetrics(6, 1, 20.0, 100.0, 10.0, 0.0)
+            ew = ffwi.calculate_ew(humid)
+            assert ffwi.calculate_m(humid, 40.0, ew) == ew
+            # At 50% humidity ew is about 12.0, so mo = 15.0 is between ew and ed
+            dry = ffwi.WeatherMetrics(6, 1, 20.0, 50.0, 10.0, 0.0)
+            assert ffwi.calculate_m(dry, 20.0, 15.0) == 15.0
+            ffwi.calculate_m(dry, 20.0, 25.0)
+            with pytest.raises(AttributeError):
+                ffwi.calculate_m(None, 20.0, 5.0)
+        finally:
+            ffwi_profiling.disable()
+
+        # calculate_ew is counted for the test's own call and for every call of calculate_m with
+        # mo < ed, including the one that raised, but not for the profiler's own calls
+        stats = ffwi_profiling.snapshot()['a3_ffwi_system.calculate_ew']
+        assert (stats['calls'], stats['errors']) == (5, 1)
+        stats = ffwi_profiling.snapshot()['a3_ffwi_system.calculate_m']
+        assert stats['calls'] == 5
+        assert stats['errors'] == 1
+        assert stats['branches'] == {'wetting': 2, 'between ed and ew': 1, 'drying': 1}
+
+
+class TestService:
+    """Tests for the micro-batching query service in a3_ffwi_service."""
+
+    def test_calculate_chains_repeated_stations(self) -> None:
+        """Test that a micro-batch with several readings for one station gives the same outputs
+        as calculating each station's readings in order."""
+        inputs, _ = a3_part4.load_data('data/ffwi/sample_data.csv')
+        service = ffwi_service.FfwiService()
+        requests = [(['A', 'B'], inputs[0:2]), (['A'], inputs[2:3]), (['B', 'A'], inputs[3:5])]
+        results = service.calculate(requests)
+
+        expected_a = a3_part4.calculate_ffwi_outputs([inputs[0], inputs[2], inputs[4]])
+        expected_b = a3_part4.calculate_ffwi_outputs([inputs[1], inputs[3]])
+        actual_a = [results[0][0], results[1][0], results[2][1]]
+        actual_b = [results[0][1], results[2][0]]
+        for actual, expected in [(actual_a, expected_a), (actual_b, expected_b)]:
+            for fo, expected_fo in zip(actual, expected.values()):
+                assert vars(fo) == pytest.approx(vars(expected_fo), rel=vffwi.TOLERANCE)
+
+    def test_rejects_non_finite_values(self) -> None:
+        """Test that observations with NaN or infinite values are rejected."""
+        observation = {'station': 'A', 'month': 7, 'day': 1, 'temperature': 25.0,
+                       'humidity': 40.0, 'wind_speed': 12.0, 'precipitation': 0.0}
+        assert ffwi_service.parse_observations([observation])[0] == ['A']
+
+        for name in ffwi_service.OBSERVATION_FIELDS[2:]:
+            for value in json.loads('[NaN, Infinity, -Infinity]'):
+                with pytest.raises(ValueError):
+                    ffwi_service.parse_observations([{**observation, name: value}])
+
+    def test_failed_batch_changes_no_states(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that a micro-batch that raises part way through leaves every station state as
+        it was."""
+        inputs, _ = a3_part4.load_data('data/ffwi/sample_data.csv')
+        service = ffwi_service.FfwiService()
+        service.calculate([(['A'], inputs[0:1])])
+        before = (service.states.station_ids.tolist(), service.states.ffmc.tolist())
+
+        update = ffwi_state.StationStates.update
+        calls = []
+
+        def failing_update(states: ffwi_state.StationStates, *args: Any) -> Any:
+            calls.append(len(calls))
+            if len(calls) == 2:
+                raise RuntimeError('round failed')
+            return update(states, *args)
+
+        monkeypatch.setattr(ffwi_state.StationStates, 'update', failing_update)
+        with pytest.raises(RuntimeError):
+            service.calculate([(['A', 'B'], inputs[1:3]), (['A'], inputs[3:4])])
+        assert (service.states.station_ids.tolist(), service.states.ffmc.tolist()) == before
+
+        monkeypatch.setattr(ffwi_state.StationStates, 'update', update)
+        results = service.calculate([(['A', 'B'], inputs[1:3]), (['A'], inputs[3:4])])
+        expected = a3_part4.calculate_ffwi_outputs(inputs[0:2] + inputs[3:4])
+        assert results[1][0].ffmc == pytest.approx(list(expected.values())[2].ffmc,
+                                                   rel=vffwi.TOLERANCE)
+        assert service.states.station_ids.tolist() == ['A', 'B']
+
+    def test_load_test_round_trip(self) -> None:
+        """Test that concurrent requests over TCP are answered and coalesced into fewer
+        micro-batches than requests."""
+        async def run() -> tuple[ffwi_service.LoadTestReport, ffwi_service.FfwiService]:
+            service = ffwi_service.FfwiService()
+            server = await ffwi_service.serve(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                report = await ffwi_service.run_load_test(port=port, connections=8,
+                                                          requests_per_connection=5)
+            finally:
+                server.close()
+                await server.wait_closed()
+                await service.stop()
+            return report, service
+
+        report, service = asyncio.run(run())
+        assert report.requests == service.requests == 40
+        assert report.errors == 0
+        assert service.batches < service.requests
+        assert report.percentile(50) <= report.percentile(99)
+
+    def test_long_request_lines(self) -> None:
+        """Test that a batch far longer than asyncio's default line limit is answered, and that
+        a line longer than the server's limit gets an error reply without closing the
+        connection."""
+        async def run(limit: int, lines: list[bytes]) -> list[dict]:
+            service = ffwi_service.FfwiService()
+            server = await ffwi_service.serve(service, port=0, limit=limit)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port, limit=ffwi_service.DEFAULT_LINE_LIMIT)
+                writer.writelines(lines)
+                await writer.drain()
+                responses = [json.loads(await reader.readline()) for _ in lines]
+                writer.close()
+                await writer.wait_closed()
+            finally:
+                server.close()
+                await server.wait_closed()
+                await service.stop()
+            return responses
+
+        big, small = ffwi_service.make_requests(1, 800, 1000) + ffwi_service.make_requests(1, 1, 1)
+        assert len(big) > 2 ** 16
+        responses = asyncio.run(run(ffwi_service.DEFAULT_LINE_LIMIT, [big, small]))
+        assert [len(response['outputs']) for response in responses] == [800, 1]
+
+        responses = asyncio.run(run(2 ** 12, [big, small, small]))
+        assert 'error' in responses[0]
+        assert [len(response['outputs']) for response in responses[1:]] == [1, 1]
+
+    def test_invalid_observation(self) -> None:
+        """Test that an observation with an invalid month is rejected."""
+        with pytest.raises(ValueError):
+            ffwi_service.parse_observations([{'station': 'A', 'month': 13, 'day': 1,
+                                              'temperature': 20.0, 'humidity': 40.0,
+                                              'wind_speed': 10.0, 'precipitation': 0.0}])
+        with pytest.raises(ValueError):
+            ffwi_service.parse_observations([{'station': 'A', 'month': 7, 'day': 300,
+                                              'temperature': 20.0, 'humidity': 40.0,
+                                              'wind_speed': 10.0, 'precipitation': 0.0}])
+
+    def test_bad_request_fails_alone(self) -> None:
+        """Test that a request that cannot be calculated fails without failing the requests it
+        was coalesced with, and without changing any station state."""
+        inputs, _ = a3_part4.load_data('data/ffwi/sample_data.csv')
+        bad = WeatherMetrics(7, 300, 20.0, 40.0, 10.0, 0.0)
+
+        async def run() -> tuple[list, ffwi_service.FfwiService]:
+            service = ffwi_service.FfwiService(max_delay=0.05)
+            await service.start()
+            try:
+                results = await asyncio.gather(service.submit(['A'], inputs[0:1]),
+                                               service.submit(['B'], [bad]),
+                                               service.submit(['C'], inputs[1:2]),
+                                               return_exceptions=True)
+            finally:
+                await service.stop()
+            return results, service
+
+        results, service = asyncio.run(run())
+        assert isinstance(results[1], OverflowError)
+        assert [len(outputs) for outputs in (results[0], results[2])] == [1, 1]
+        assert service.states.station_ids.tolist() == ['A', 'C']
+
+
+if __name__ == '__main__':
+    pytest.main(['a3_ffwi_tests.py'])
@@ -0,0 +1,352 @@
+"""Array versions of the equations in a3_ffwi_system.
+
+Every function here mirrors the function of the same name in a3_ffwi_system, but takes NumPy
+arrays (or anything np.asarray accepts) of observations instead of a single WeatherMetrics, and
+returns an array with one value per observation. The branches of the scalar functions are
+evaluated as masked operations over the whole array.
+
+The results agree with the scalar functions to within a relative error of TOLERANCE. The only
+source of difference is the last-bit rounding of NumPy's exp/log/power compared to the math
+module.
+"""
+import numpy as np
+
+import a3_ffwi_system as ffwi
+
+# Maximum relative difference between these functions and the scalar functions in a3_ffwi_system
+TOLERANCE = 1e-9
+
+# The per-month lookup tables from a3_ffwi_system, indexed directly by month (index 0 is unused)
+DMC_DAY_LENGTH_EFFECTIVE = np.array(
+    [np.nan] + [ffwi.DMC_DAY_LENGTH_EFFECTIVE[month] for month in range(1, 13)])
+DC_DAY_LENGTH_FACTORS = np.array(
+    [np.nan] + [ffwi.DC_DAY_LENGTH_FACTORS[month] for month in range(1, 13)])
+
+# Both sides of a branch are evaluated before one is selected, so the side that is not selected
+# may divide by zero or take the log of a negative number. Those values are always discarded.
+_UNSELECTED_BRANCH_ERRORS = {'divide': 'ignore', 'invalid': 'ignore', 'over': 'ignore'}
+
+
+def calculate_mr(precipitation: np.ndarray, mo: np.ndarray) -> np.ndarray:
+    """Return the fine fuel moisture content after rain (mr) for each pair of values in
+    precipitation and mo.
+
+    Preconditions:
+        - all(precipitation > 0.5)
+    """
+    precipitation = np.asarray(precipitation, dtype=float)
+    mo = np.asarray(mo, dtype=float)
+
+    # Equation 2
+    rf = precipitation - 0.5
+
+    # Equation 3a
+    mr = mo + 42.5 * rf * np.exp(-100.0 / (251.0 - mo)) * (1.0 - np.exp(-6.93 / rf))
+
+    # Equation 3b
+    return np.where(mo > 150.0, mr + (0.0015 * (mo - 150.0) ** 2) * np.sqrt(rf), mr)
+
+
+def calculate_m(temperature: np.ndarray, humidity: np.ndarray, wind_speed: np.ndarray,
+                ed: np.ndarray, mo: np.ndarray) -> np.ndarray:
+    """Return the fine fuel moisture content after drying (m) for each observation, based on
+    the EMC for drying in ed and the fine fuel moisture content from the previous day in mo.
+
+    Preconditions:
+        - all(mo <= 250.0)
+    """
+    temperature = np.asarray(temperature, dtype=float)
+    humidity = np.asarray(humidity, dtype=float)
+    wind_speed = np.asarray(wind_speed, dtype=float)
+    ed = np.asarray(ed, dtype=float)
+    mo = np.asarray(mo, dtype=float)
+
+    with np.errstate(**_UNSELECTED_BRANCH_ERRORS):
+        # Equation 5
+        ew = 0.618 * (humidity ** .753) + (10.0 * np.exp((humidity - 100.0) / 10.0)) \
+            + 0.18 * (21.1 - temperature) * (1.0 - 1.0 / np.exp(0.115 * humidity))
+
+        # Use log wetting rate
+        # Equation 7a
+        k1 = 0.424 * (1.0 - ((100.0 - humidity) / 100.0) ** 1.7) + \
+            (.0694 * np.sqrt(wind_speed)) * (1.0 - ((100.0 - humidity) / 100.0) ** 8)
+        kw = k1 * (0.581 * np.exp(0.0365 * temperature))  # Equation 7b
+        wetted = ew - (ew - mo) / 10.0 ** kw  # Equation 9
+
+        # Use log drying rate
+        # Equation 6a
+        k0 = 0.424 * (1.0 - (humidity / 100.0) ** 1.7) + (
+            (0.0694 * np.sqrt(wind_speed)) * (1.0 - (humidity / 100.0) ** 8))
+        kd = k0 * (0.581 * np.exp(0.0365 * temperature))  # Equation 6b
+        dried = ed + (mo - ed) / 10.0 ** kd  # Equation 8
+
+    m = np.where(mo > ed, dried, mo)
+    return np.where((mo < ed) & (mo <= ew), wetted, m)
+
+
+def calculate_ffmc(temperature: np.ndarray, humidity: np.ndarray, wind_speed: np.ndarray,
+                   precipitation: np.ndarray, f0: np.ndarray) -> np.ndarray:
+    """Return the Fine Fuel Moisture Code (FFMC) for each observation, based on the previous
+    day's FFMC in f0.
+    """
+    temperature = np.asarray(temperature, dtype=float)
+    humidity = np.asarray(humidity, dtype=float)
+    precipitation = np.asarray(precipitation, dtype=float)
+    f0 = np.asarray(f0, dtype=float)
+
+    # Calculate the fine fuel moisture content from the previous day
+    mo = (147.2 * (101.0 - f0)) / (59.5 + f0)  # Equation 1
+    with np.errstate(**_UNSELECTED_BRANCH_ERRORS):
+        mo = np.where(precipitation > 0.5, calculate_mr(precipitation, mo), mo)
+
+    mo = np.minimum(mo, 250.0)
+
+    # Equation 4 - Fine Fuel equilibrium moisture content (EMC) for drying
+    ed = 0.942 * (humidity ** .679) + (11.0 * np.exp((humidity - 100.0) / 10.0)) + (
+        0.18 * (21.1 - temperature) * (1.0 - 1.0 / np.exp(0.1150 * humidity)))
+
+    m = calculate_m(temperature, humidity, wind_speed, ed, mo)
+
+    # Equation 10
+    f = (59.5 * (250.0 - m)) / (147.2 + m)
+
+    return np.clip(f, 0.0, 101.0)
+
+
+def calculate_dmr(precipitation: np.ndarray, dm0: np.ndarray) -> np.ndarray:
+    """Return the Duff moisture content after rain for each pair of values in precipitation and
+    the previous day's DMC in dm0.
+
+    Preconditions:
+        - all(precipitation > 1.5)
+    """
+    precipitation = np.asarray(precipitation, dtype=float)
+    dm0 = np.asarray(dm0, dtype=float)
+
+    rw = 0.92 * precipitation - 1.27  # Equation 11
+    wmi = 20.0 + 280.0 / np.exp(0.023 * dm0)  # Equation 12
+
+    with np.errstate(**_UNSELECTED_BRANCH_ERRORS):
+        b = np.where(dm0 <= 33.0,
+                     100.0 / (0.5 + 0.3 * dm0),  # Equation 13a
+                     np.where(dm0 <= 65.0,
+                              14.0 - 1.3 * np.log(dm0),  # Equation 13b
+                              6.2 * np.log(dm0) - 17.2))  # Equation 13c
+
+    return wmi + (1000 * rw) / (48.77 + b * rw)  # Equation 14
+
+
+def calculate_dmc_k(temperature: np.ndarray, humidity: np.ndarray,
+                    month: np.ndarray) -> np.ndarray:
+    """Return the log drying rate in DMC for each observation."""
+    # Cannot use temperatures less than -1.1 in Equation 16
+    temperature = np.maximum(np.asarray(temperature, dtype=float), -1.1)
+    humidity = np.asarray(humidity, dtype=float)
+
+    # Equations 16 and 17
+    return 1.894 * (temperature + 1.1) * (100.0 - humidity) * (
+        DMC_DAY_LENGTH_EFFECTIVE[np.asarray(month, dtype=int)] * 0.0001)
+
+
+def calculate_dmc(month: np.ndarray, temperature: np.ndarray, humidity: np.ndarray,
+                  precipitation: np.ndarray, dm0: np.ndarray) -> np.ndarray:
+    """Return the Duff Moisture Code (DMC) for each observation, based on the previous day's DMC
+    in dm0.
+    """
+    precipitation = np.asarray(precipitation, dtype=float)
+    dm0 = np.asarray(dm0, dtype=float)
+
+    with np.errstate(**_UNSELECTED_BRANCH_ERRORS):
+        dmr = calculate_dmr(precipitation, dm0)
+        pr = np.where(precipitation <= 1.5, dm0,
+                      43.43 * (5.6348 - np.log(dmr - 20.0)))  # Equation 15
+
+    # The DMC after rain cannot, theoretically, be less than 0; ensure it is at least 0
+    pr = np.maximum(pr, 0.0)
+
+    d = pr + calculate_dmc_k(temperature, humidity, month)
+
+    return np.maximum(d, 1.0)
+
+
+def calculate_qr(precipitation: np.ndarray, dc0: np.ndarray) -> np.ndarray:
+    """Return the moisture equivalent after rain for each pair of values in precipitation and the
+    previous day's DC in dc0.
+
+    Preconditions:
+        - all(precipitation > 2.8)
+    """
+    rd = 0.83 * np.asarray(precipitation, dtype=float) - 1.27  # Equation 18
+    qo = 800.0 * np.exp(-np.asarray(dc0, dtype=float) / 400.0)  # Equation 19
+
+    return qo + 3.937 * rd  # Equation 20
+
+
+def calculate_dc(month: np.ndarray, temperature: np.ndarray, precipitation: np.ndarray,
+                 dc0: np.ndarray) -> np.ndarray:
+    """Return the Drought Code (DC) for each observation, based on the previous day's DC in dc0.
+    """
+    temperature = np.maximum(np.asarray(temperature, dtype=float), -2.8)
+    precipitation = np.asarray(precipitation, dtype=float)
+    dc0 = np.asarray(dc0, dtype=float)
+
+    v = 0.36 * (temperature + 2.8) + DC_DAY_LENGTH_FACTORS[np.asarray(month, dtype=int)]  # Eq. 22
+    # The potential evapotranspiration cannot, theoretically, be less than 0; ensure it's at least 0
+    v = np.maximum(v, 0.0)
+
+    with np.errstate(**_UNSELECTED_BRANCH_ERRORS):
+        dr = 400 * np.log(800 / calculate_qr(precipitation, dc0))  # Equation 21
+
+    return np.where(precipitation > 2.8, dr, dc0) + 0.5 * v  # Equation 23
+
+
+def calculate_isi(wind_speed: np.ndarray, ffmc: np.ndarray) -> np.ndarray:
+    """Return the Initial Spread Index (ISI) for each pair of values in wind_speed and the
+    current ffmc.
+    """
+    ffmc = np.asarray(ffmc, dtype=float)
+
+    mo = 147.2 * (101.0 - ffmc) / (59.5 + ffmc)
+    ff = 19.115 * np.exp(mo * -0.1386) * (1.0 + (mo ** 5.31) / 49300000.0)
+
+    return ff * np.exp(0.05039 * np.asarray(wind_speed, dtype=float))
+
+
+def calculate_bui(dmc: np.ndarray, dc: np.ndarray) -> np.ndarray:
+    """Return the Buildup Index (BUI) for each pair of values in the current dmc and dc.
+    """
+    dmc = np.asarray(dmc, dtype=float)
+    dc = np.asarray(dc, dtype=float)
+
+    with np.errstate(**_UNSELECTED_BRANCH_ERRORS):
+        b = np.where(dmc <= 0.4 * dc,
+                     (0.8 * dc * dmc) / (dmc + 0.4 * dc),
+                     dmc - (1.0 - 0.8 * dc / (dmc + 0.4 * dc)) * (0.92 + (0.0114 * dmc) ** 1.7))
+
+    return np.maximum(b, 0.0)
+
+
+def calculate_fwi(isi: np.ndarray, bui: np.ndarray) -> np.ndarray:
+    """Return the Fire Weather Index (FWI) for each pair of values in the current isi and bui.
+    """
+    isi = np.asarray(isi, dtype=float)
+    bui = np.asarray(bui, dtype=float)
+
+    with np.errstate(**_UNSELECTED_BRANCH_ERRORS):
+        f_d = np.where(bui <= 80.0,
+                       0.626 * bui ** 0.809 + 2.0,  # Equation 28a
+                       1000.0 / (25. + 108.64 * np.exp(-0.023 * bui)))  # Equation 28b
+
+        bb = 0.1 * isi * f_d  # Equation 29
+        return np.where(bb <= 1.0,
+                        bb,  # Equation 30b
+                        np.exp(2.72 * (0.434 * np.log(bb)) ** 0.647))  # Equation 30a
+
+
+def calculate_all(month: np.ndarray, temperature: np.ndarray, humidity: np.ndarray,
+                  wind_speed: np.ndarray, precipitation: np.ndarray, f0: np.ndarray,
+                  dm0: np.ndarray, dc0: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray,
+                                                              np.ndarray, np.ndarray, np.ndarray]:
+    """Return a tuple of six arrays containing the FFMC, DMC, DC, ISI, BUI, and FWI for each
+    observation, in that order, based on the previous day's FFMC, DMC, and DC in f0, dm0, and dc0.
+    """
+    ffmc = calculate_ffmc(temperature, humidity, wind_speed, precipitation, f0)
+    dmc = calculate_dmc(month, temperature, humidity, precipitation, dm0)
+    dc = calculate_dc(month, temperature, precipitation, dc0)
+    isi = calculate_isi(wind_speed, ffmc)
+    bui = calculate_bui(dmc, dc)
+    fwi = calculate_fwi(isi, bui)
+
+    return ffmc, dmc, dc, isi, bui, fwi
+
+
+def calculate_station_season(month: np.ndarray, temperature: np.ndarray, humidity: np.ndarray,
+                             wind_speed: np.ndarray, precipitation: np.ndarray,
+                             f0: float = ffwi.INITIAL_FFMC, dm0: float = ffwi.INITIAL_DMC,
+                             dc0: float = ffwi.INITIAL_DC) -> tuple[np.ndarray, np.ndarray,
+                                                                    np.ndarray, np.ndarray,
+                                                                    np.ndarray, np.ndarray]:
+    """Return a tuple of six arrays containing the FFMC, DMC, DC, ISI, BUI, and FWI for every day
+    of a season at one station, in that order, chaining each day's FFMC, DMC, and DC into the
+    next day, starting from f0, dm0, and dc0.
+
+    Each day depends on the day before it, so a single station cannot be calculated with array
+    operations. The scalar functions in a3_ffwi_system are chained over the values as Python
+    floats instead, which is much faster than array operations on one value at a time, and gives
+    exactly the results of a3_part4.calculate_ffwi_outputs.
+
+    Preconditions:
+        - month, temperature, humidity, wind_speed, and precipitation all have the same length
+        - the weather arrays are one-dimensional, with one day per element in chronological order
+    """
+    ffmc, dmc, dc = float(f0), float(dm0), float(dc0)
+
+    # ACCUMULATOR values_so_far: the FFMC, DMC, DC, ISI, BUI, and FWI of each day so far, one day
+    # after another
+    values_so_far = []
+
+    # One WeatherMetrics is reused for every day, with each day's weather assigned to it by the
+    # for loop, since creating one per day takes longer than the assignments. The day of the
+    # month is not used by the equations.
+    wm = ffwi.WeatherMetrics(1, 0, 0.0, 0.0, 0.0, 0.0)
+    for wm.month, wm.temperature, wm.humidity, wm.wind_speed, wm.precipitation in zip(
+            np.asarray(month, dtype=int).tolist(),
+            *(np.asarray(column, dtype=float).tolist()
+              for column in (temperature, humidity, wind_speed, precipitation))):
+        ffmc = ffwi.calculate_ffmc(wm, ffmc)
+        dmc = ffwi.calculate_dmc(wm, dmc)
+        dc = ffwi.calculate_dc(wm, dc)
+        isi = ffwi.calculate_isi(wm, ffmc)
+        bui = ffwi.calculate_bui(dmc, dc)
+        values_so_far.extend((ffmc, dmc, dc, isi, bui, ffwi.calculate_fwi(isi, bui)))
+
+    table = np.array(values_so_far, dtype=float).reshape(-1, 6)
+    return tuple(np.ascontiguousarray(table[:, i]) for i in range(6))
+
+
+def calculate_season(month: np.ndarray, temperature: np.ndarray, humidity: np.ndarray,
+                     wind_speed: np.ndarray, precipitation: np.ndarray,
+                     f0: np.ndarray | float = ffwi.INITIAL_FFMC,
+                     dm0: np.ndarray | float = ffwi.INITIAL_DMC,
+                     dc0: np.ndarray | float = ffwi.INITIAL_DC) -> tuple[np.ndarray, np.ndarray,
+                                                                          np.ndarray, np.ndarray,
+                                                                          np.ndarray, np.ndarray]:
+    """Return a tuple of six arrays containing the FFMC, DMC, DC, ISI, BUI, and FWI for every day
+    of a season, in that order, chaining each day's FFMC, DMC, and DC into the next day.
+
+    The weather arrays have shape (days,) for one station or (days, stations) for many stations;
+    the returned arrays have the same shape. Every station is calculated together for each day,
+    and the days are calculated one at a time in order, starting from f0, dm0, and dc0 (a single
+    value for every station, or one value per station). A single station is calculated with
+    calculate_station_season instead, since array operations on one value at a time are slower
+    than the scalar functions.
+
+    Preconditions:
+        - month, temperature, humidity, wind_speed, and precipitation all have the same shape
+        - each row of the weather arrays is one day, in chronological order
+    """
+    weather = [np.asarray(column, dtype=float)
+               for column in (month, temperature, humidity, wind_speed, precipitation)]
+    if weather[0].ndim == 1:
+        return calculate_station_season(*weather, f0, dm0, dc0)
+
+    outputs = tuple(np.empty(weather[0].shape) for _ in range(6))
+
+    ffmc = np.broadcast_to(np.asarray(f0, dtype=float), weather[0].shape[1:])
+    dmc = np.broadcast_to(np.asarray(dm0, dtype=float), weather[0].shape[1:])
+    dc = np.broadcast_to(np.asarray(dc0, dtype=float), weather[0].shape[1:])
+
+    for day in range(weather[0].shape[0]):
+        day_outputs = calculate_all(*(column[day] for column in weather), ffmc, dmc, dc)
+        for output, day_output in zip(outputs, day_outputs):
+            output[day] = day_output
+        ffmc, dmc, dc = day_outputs[0], day_outputs[1], day_outputs[2]
+
+    return outputs
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,234 @@
+"""A compact on-disk format for the uniform and one-word-context text models.
+
+A saved model is a directory of .npy files and a model.json file describing them. Every distinct
+word is stored once, in a string table of UTF-8 bytes, and the model refers to words by their
+index in that table:
+
+    - strings.npy, string_offsets.npy: the string table, where word i is the bytes
+      strings[string_offsets[i]:string_offsets[i + 1]]
+    - counts.npy: for a uniform model, the frequency of each word, in the model's order
+    - follow_offsets.npy, follows.npy: for a one-word-context model, the follow list of word i
+      (the i-th key, in the model's order) is follows[follow_offsets[i]:follow_offsets[i + 1]]
+
+The arrays are memory-mapped when a model is loaded, so loading takes the same short time for
+any model size, and processes that load the same model share its pages.
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from a3_part1 import UniformSampler
+
+# The version of the format written by this module
+FORMAT_VERSION = 1
+
+# The type of the word indexes stored in follows.npy
+INDEX_DTYPE = np.uint32
+
+
+@dataclass
+class StringTable:
+    """A sequence of strings stored as one array of UTF-8 bytes.
+
+    The strings are separated by a newline byte, so a whole table can be decoded with one call
+    and then split.
+
+    Instance Attributes:
+        - data: the UTF-8 bytes of every string, each followed by a newline
+        - offsets: the index in data of the first byte of each string, followed by len(data)
+
+    Representation Invariants:
+        - self.data.dtype == np.uint8
+        - self.offsets[0] == 0 and self.offsets[-1] == len(self.data)
+    """
+    data: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> 'StringTable':
+        """Return a StringTable containing strings, in order.
+
+        Preconditions:
+            - no string in strings contains a newline
+        """
+        encoded = [string.encode() + b'\n' for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def to_list(self) -> list[str]:
+        """Return every string in this table, in order."""
+        if len(self) == 0:
+            return []
+        return self.data.tobytes().decode()[:-1].split('\n')
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.data[self.offsets[index]:self.offsets[index + 1] - 1].tobytes().decode()
+
+
+@dataclass
+class UniformModelFile:
+    """A uniform model loaded from disk.
+
+    Instance Attributes:
+        - words: the words of the model, in the model's order
+        - counts: the frequency of each word in words
+
+    Representation Invariants:
+        - len(self.words) == len(self.counts)
+    """
+    words: StringTable
+    counts: np.ndarray
+
+    def to_dict(self) -> dict[str, int]:
+        """Return this model in the format returned by a3_part1.create_model_uniform."""
+        return dict(zip(self.words.to_list(), self.counts.tolist()))
+
+    def sampler(self) -> UniformSampler:
+        """Return a UniformSampler for this model, without building its dict."""
+        return UniformSampler(self.words.to_list(), np.cumsum(self.counts).tolist())
+
+
+@dataclass
+class OwcModelFile:
+    """A one-word-context model loaded from disk.
+
+    Instance Attributes:
+        - word_count: the word count returned by a3_part2.create_model_owc with the model
+        - words: every word of the model, starting with the keys in the model's order
+        - follow_offsets: the index in follows of the first word in each key's follow list,
+          followed by len(follows)
+        - follows: the index in words of every word of every follow list
+
+    Representation Invariants:
+        - len(self.follow_offsets) <= len(self.words) + 1
+        - self.follow_offsets[-1] == len(self.follows)
+    """
+    word_count: int
+    words: StringTable
+    follow_offsets: np.ndarray
+    follows: np.ndarray
+
+    def keys(self) -> int:
+        """Return the number of keys in this model."""
+        return len(self.follow_offsets) - 1
+
+    def follow_list(self, index: int) -> list[str]:
+        """Return the follow list of the key with the given index.
+
+        Preconditions:
+            - 0 <= index < self.keys()
+        """
+        return [self.words[i]
+                for i in self.follows[self.follow_offsets[index]:self.follow_offsets[index + 1]]]
+
+    def to_dict(self) -> dict[str, list[str]]:
+        """Return this model in the format returned by a3_part2.create_model_owc."""
+        words = self.words.to_list()
+        follows = [words[i] for i in self.follows.tolist()]
+        offsets = self.follow_offsets.tolist()
+
+        return {words[i]: follows[offsets[i]:offsets[i + 1]] for i in range(self.keys())}
+
+
+def _save_arrays(directory: str, manifest: dict, arrays: dict[str, np.ndarray]) -> None:
+    """Save each array in arrays to directory as a .npy file named after it, and then manifest
+    as model.json. model.json is written last, so a model that was only partly saved cannot be
+    loaded.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'model.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + '.npy'), array)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(dict(manifest, version=FORMAT_VERSION), f)
+
+
+def _load_arrays(directory: str, kind: str, names: list[str]) -> tuple[dict, list[np.ndarray]]:
+    """Return the manifest of the model saved in directory and its arrays with the given names,
+    memory-mapped.
+
+    Raise a ValueError if directory does not hold a complete model of the given kind in this
+    version of the format.
+    """
+    try:
+        with open(os.path.join(directory, 'model.json')) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f'{directory} does not contain a saved model')
+
+    if manifest.get('kind') != kind or manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f'{directory} does not contain a version {FORMAT_VERSION} {kind} model')
+
+    return manifest, [np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+                      for name in names]
+
+
+def save_uniform_model(directory: str, model: dict[str, int]) -> None:
+    """Save model, in the format returned by a3_part1.create_model_uniform, to directory."""
+    table = StringTable.from_strings(model)
+    _save_arrays(directory, {'kind': 'uniform'},
+                 {'strings': table.data, 'string_offsets': table.offsets,
+                  'counts': np.fromiter(model.values(), dtype=np.int64, count=len(model))})
+
+
+def load_uniform_model(directory: str) -> UniformModelFile:
+    """Return the uniform model saved in directory by save_uniform_model, memory-mapped.
+
+    Raise a ValueError if directory does not contain a uniform model.
+    """
+    _, (strings, string_offsets, counts) = _load_arrays(directory, 'uniform',
+                                                        ['strings', 'string_offsets', 'counts'])
+    return UniformModelFile(StringTable(strings, string_offsets), counts)
+
+
+def save_owc_model(directory: str, word_count: int, model: dict[str, list[str]]) -> None:
+    """Save model and its word_count, as returned by a3_part2.create_model_owc, to directory.
+
+    Preconditions:
+        - the model has fewer than 2 ** 32 distinct words
+    """
+    # ACCUMULATOR index_so_far: the index of each word seen so far, keys first
+    index_so_far = {key: i for i, key in enumerate(model)}
+    follows = []
+    for follow_list in model.values():
+        for word in follow_list:
+            follows.append(index_so_far.setdefault(word, len(index_so_far)))
+
+    follow_offsets = np.zeros(len(model) + 1, dtype=np.int64)
+    np.cumsum([len(follow_list) for follow_list in model.values()], out=follow_offsets[1:])
+    table = StringTable.from_strings(index_so_far)
+
+    _save_arrays(directory, {'kind': 'owc', 'word_count': word_count},
+                 {'strings': table.data, 'string_offsets': table.offsets,
+                  'follow_offsets': follow_offsets,
+                  'follows': np.array(follows, dtype=INDEX_DTYPE)})
+
+
+def load_owc_model(directory: str) -> OwcModelFile:
+    """Return the one-word-context model saved in directory by save_owc_model, memory-mapped.
+
+    Raise a ValueError if directory does not contain a one-word-context model.
+    """
+    manifest, (strings, string_offsets, follow_offsets, follows) = _load_arrays(
+        directory, 'owc', ['strings', 'string_offsets', 'follow_offsets', 'follows'])
+    return OwcModelFile(manifest['word_count'], StringTable(strings, string_offsets),
+                        follow_offsets, follows)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
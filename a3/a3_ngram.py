@@ -0,0 +1,319 @@
+"""k-word context (n-gram) text models.
+
+These models generalize a3_part2's one-word-context model: the words that follow each sequence
+of k consecutive words (a context) are collected into a follow list, and text is generated by
+repeatedly drawing the next word from the follow list of the last k words generated.
+
+create_model_ngram builds the model as a dict keyed by tuples of words, which is easy to read
+but takes a tuple and a list per context. NgramModel stores the same model compactly: words are
+interned to integer ids, the contexts are rows of a (contexts, k) array of ids, the follow lists
+are in CSR form, and a context is found from its ids through a hash table whose buckets are also
+stored in CSR form.
+"""
+import math
+import random
+import time
+import tracemalloc
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+# The type of the word and context ids
+ID_DTYPE = np.uint32
+
+# The offset basis and prime of the 64-bit FNV-1a hash used for contexts, and the multipliers of
+# the MurmurHash3 finalizer applied to it so that the top bits, which choose a context's bucket,
+# depend on every bit of every word id
+FNV_OFFSET = 14695981039346656037
+FNV_PRIME = 1099511628211
+FMIX_MULTIPLIERS = (0xff51afd7ed558ccd, 0xc4ceb9fe1a85ec53)
+_MASK64 = (1 << 64) - 1
+
+
+def create_model_ngram(text: str, k: int) -> tuple[int, dict[tuple[str, ...], list[str]]]:
+    """Return a tuple of the number of words in text and the k-word context model of text.
+
+    The model maps each sequence of k consecutive words in text that is followed by another word
+    to the list of words that follow it, in order. With k == 1, the model is the same as
+    a3_part2.create_model_owc's with each key wrapped in a tuple.
+
+    Preconditions:
+        - k >= 1
+        - len(str.split(text)) > k
+    """
+    words = str.split(text)
+    model = {}
+
+    for i in range(0, len(words) - k):
+        context = tuple(words[i:i + k])
+        if context not in model:
+            model[context] = [words[i + k]]
+        else:
+            list.append(model[context], words[i + k])
+
+    return (len(words), model)
+
+
+def hash_context(ids: Iterable[int]) -> int:
+    """Return the 64-bit hash of a context's word ids, the same value hash_contexts gives for
+    that context."""
+    h = FNV_OFFSET
+    for word_id in ids:
+        h = ((h ^ word_id) * FNV_PRIME) & _MASK64
+    for multiplier in FMIX_MULTIPLIERS:
+        h = ((h ^ (h >> 33)) * multiplier) & _MASK64
+
+    return h ^ (h >> 33)
+
+
+def hash_contexts(contexts: np.ndarray) -> np.ndarray:
+    """Return the hash_context of every row of the (contexts, k) array of word ids contexts."""
+    hashes = np.full(len(contexts), FNV_OFFSET, dtype=np.uint64)
+    for column in range(contexts.shape[1]):
+        hashes ^= contexts[:, column].astype(np.uint64)
+        hashes *= np.uint64(FNV_PRIME)
+    for multiplier in FMIX_MULTIPLIERS:
+        hashes ^= hashes >> np.uint64(33)
+        hashes *= np.uint64(multiplier)
+
+    return hashes ^ (hashes >> np.uint64(33))
+
+
+@dataclass
+class NgramModel:
+    """A k-word context model with interned words, CSR follow lists, and a hashed context table.
+
+    Context c is the k words with ids contexts[c], and its follow list is the words with ids
+    followers[offsets[c]:offsets[c + 1]]. The contexts whose hash has its top bucket_bits bits
+    equal to b are bucket_contexts[bucket_offsets[b]:bucket_offsets[b + 1]].
+
+    Instance Attributes:
+        - k: the number of words in each context
+        - word_count: the number of words in the text the model was built from
+        - words: the word with each id
+        - contexts: the word ids of each context, in order of first occurrence in the text
+        - offsets: the index in followers of the first word of each context's follow list,
+          followed by len(followers)
+        - followers: the id of every word of every follow list
+        - bucket_bits: the number of bits of each hash used to choose its bucket
+        - bucket_offsets: the index in bucket_contexts of the first context in each bucket,
+          followed by len(bucket_contexts)
+        - bucket_contexts: the id of every context, grouped by bucket
+
+    Representation Invariants:
+        - self.k >= 1
+        - self.contexts.shape == (len(self.offsets) - 1, self.k)
+        - all(self.offsets[:-1] < self.offsets[1:])
+        - len(self.bucket_offsets) == 2 ** self.bucket_bits + 1
+        - len(self.bucket_contexts) == len(self.contexts)
+    """
+    k: int
+    word_count: int
+    words: list[str]
+    contexts: np.ndarray
+    offsets: np.ndarray
+    followers: np.ndarray
+    bucket_bits: int
+    bucket_offsets: np.ndarray
+    bucket_contexts: np.ndarray
+
+    @classmethod
+    def from_ids(cls, words: list[str], token_ids: np.ndarray, k: int) -> 'NgramModel':
+        """Return the NgramModel of a text whose i-th word is words[token_ids[i]].
+
+        Preconditions:
+            - k >= 1
+            - len(token_ids) > k
+        """
+        # Each window of k ids that has a following word, as one opaque value so that np.unique
+        # can compare whole windows
+        windows = np.ascontiguousarray(
+            np.lib.stride_tricks.sliding_window_view(token_ids[:-1], k), dtype=ID_DTYPE)
+        keys = windows.view(np.dtype((np.void, windows.itemsize * k))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+        # Number the contexts in order of their first occurrence
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        context_of_window = rank[inverse.ravel()]
+        contexts = windows[first[order]]
+
+        offsets = np.zeros(len(contexts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(context_of_window, minlength=len(contexts)), out=offsets[1:])
+        followers = token_ids[k:][np.argsort(context_of_window, kind='stable')]
+
+        bucket_bits = max(1, math.ceil(math.log2(len(contexts))))
+        buckets = (hash_contexts(contexts) >> np.uint64(64 - bucket_bits)).astype(np.int64)
+        bucket_offsets = np.zeros(2 ** bucket_bits + 1, dtype=np.int64)
+        np.cumsum(np.bincount(buckets, minlength=2 ** bucket_bits), out=bucket_offsets[1:])
+        bucket_contexts = np.argsort(buckets, kind='stable').astype(ID_DTYPE)
+
+        return cls(k, len(token_ids), words, contexts, offsets, followers.astype(ID_DTYPE),
+                   bucket_bits, bucket_offsets, bucket_contexts)
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[str], k: int) -> 'NgramModel':
+        """Return the NgramModel of the sequence of words in tokens, making a single pass over
+        tokens to intern them.
+
+        Preconditions:
+            - k >= 1
+            - tokens has more than k words, and fewer than 2 ** 32 distinct words
+        """
+        # ACCUMULATOR ids_so_far: the id of each word seen so far
+        ids_so_far = {}
+        token_ids = array('I', (ids_so_far.setdefault(token, len(ids_so_far))
+                                for token in tokens))
+
+        return cls.from_ids(list(ids_so_far), np.frombuffer(token_ids, dtype=ID_DTYPE), k)
+
+    @classmethod
+    def from_text(cls, text: str, k: int) -> 'NgramModel':
+        """Return the NgramModel of text, equivalent to create_model_ngram(text, k).
+
+        Preconditions:
+            - k >= 1
+            - len(str.split(text)) > k
+        """
+        return cls.from_tokens(text.split(), k)
+
+    def find_context(self, ids: Iterable[int]) -> int:
+        """Return the id of the context with the given word ids, or -1 if there is none."""
+        ids = list(ids)
+        bucket = hash_context(ids) >> (64 - self.bucket_bits)
+        for c in self.bucket_contexts[self.bucket_offsets[bucket]:
+                                      self.bucket_offsets[bucket + 1]].tolist():
+            if self.contexts[c].tolist() == ids:
+                return c
+
+        return -1
+
+    def to_dict(self) -> dict[tuple[str, ...], list[str]]:
+        """Return this model in the format returned by create_model_ngram."""
+        followers = [self.words[i] for i in self.followers.tolist()]
+        offsets = self.offsets.tolist()
+
+        return {tuple(self.words[i] for i in context): followers[offsets[c]:offsets[c + 1]]
+                for c, context in enumerate(self.contexts.tolist())}
+
+    def nbytes(self) -> int:
+        """Return the number of bytes used by this model's arrays."""
+        return sum(array_.nbytes for array_ in (self.contexts, self.offsets, self.followers,
+                                                 self.bucket_offsets, self.bucket_contexts))
+
+    def generate(self, count: Optional[int] = None, seed: Optional[int] = None,
+                 replace: bool = False) -> str:
+        """Return a string containing (count - 1) randomly generated words, without modifying
+        this model. count defaults to self.word_count.
+
+        Each word is drawn from the follow list of the last k words generated. If those words
+        are not a context with words left in its follow list, a random context is chosen
+        instead and its k words are generated. If replace is False, every drawn word is removed
+        from its follow list, as in a3_part2.generate_text_owc; with k == 1, the generated words
+        are then the same as generate_text_owc's from the same random state. If replace is True,
+        follow lists are never used up.
+
+        The words are drawn from the random module if seed is None, and from a new
+        random.Random(seed) otherwise.
+
+        Preconditions:
+            - count is None or count >= 1
+        """
+        rng = random if seed is None else random.Random(seed)
+        if count is None:
+            count = self.word_count
+        k = self.k
+        shift = 64 - self.bucket_bits
+
+        offsets = array('q', self.offsets.tobytes())
+        followers = array('I', self.followers.tobytes())
+        contexts = array('I', self.contexts.tobytes())
+        bucket_offsets = array('q', self.bucket_offsets.tobytes())
+        bucket_contexts = array('I', self.bucket_contexts.tobytes())
+        remaining = array('q', np.diff(self.offsets).tobytes())
+        # Contexts that may still have words left; emptied ones are discarded when drawn
+        keys = array('I', np.arange(len(self.contexts), dtype=ID_DTYPE).tobytes())
+
+        # ACCUMULATOR ids_so_far: the ids of the randomly-generated words so far
+        ids_so_far = array('I')
+
+        while len(ids_so_far) < count - 1:
+            c = -1
+            if len(ids_so_far) >= k:
+                last = ids_so_far[-k:]
+                bucket = hash_context(last) >> shift
+                for i in range(bucket_offsets[bucket], bucket_offsets[bucket + 1]):
+                    if contexts[bucket_contexts[i] * k:bucket_contexts[i] * k + k] == last:
+                        c = bucket_contexts[i]
+                        break
+
+            if c >= 0 and remaining[c] > 0:
+                length = remaining[c]
+                index = offsets[c] + rng.randrange(length)
+                ids_so_far.append(followers[index])
+                if not replace:
+                    followers[index] = followers[offsets[c] + length - 1]
+                    remaining[c] = length - 1
+            else:
+                while True:
+                    index = rng.randrange(len(keys))
+                    c = keys[index]
+                    if remaining[c] > 0:
+                        break
+                    keys[index] = keys[-1]
+                    keys.pop()
+                ids_so_far.extend(contexts[c * k:c * k + min(k, count - 1 - len(ids_so_far))])
+
+        return str.join(' ', [self.words[i] for i in ids_so_far])
+
+
+def measure_models(filename: str, ks: Iterable[int] = range(1, 6),
+                   seed: int = 0) -> list[dict[str, float]]:
+    """Return measurements of the k-word context models of the text in filename, for each k in
+    ks: the number of contexts, the memory used by the create_model_ngram dict and by the
+    NgramModel (both including their words), the time to build each, and the number of words
+    the NgramModel generates per second without replacement.
+
+    Preconditions:
+        - all(k >= 1 for k in ks)
+    """
+    with open(filename) as f:
+        text = str.strip(f.read())
+
+    results = []
+    for k in ks:
+        tracemalloc.start()
+        start = time.perf_counter()
+        _, model_dict = create_model_ngram(text, k)
+        dict_seconds = time.perf_counter() - start
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        del model_dict
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        model = NgramModel.from_text(text, k)
+        compact_seconds = time.perf_counter() - start
+        compact_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        model.generate(seed=seed)
+        generate_seconds = time.perf_counter() - start
+
+        results.append({'k': k, 'contexts': len(model.contexts), 'dict_bytes': dict_bytes,
+                        'compact_bytes': compact_bytes, 'dict_build_seconds': dict_seconds,
+                        'compact_build_seconds': compact_seconds,
+                        'words_per_second': (model.word_count - 1) / generate_seconds})
+
+    return results
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
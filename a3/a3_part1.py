@@ -1,4 +1,10 @@
+import itertools
 import random
+from dataclasses import dataclass
+from typing import Iterator, Optional, TextIO
+
+# The default number of words generated at a time when streaming text
+DEFAULT_CHUNK_WORDS = 65536
 
 
 def generate_text_uniform(model: dict[str, int], n: int) -> str:
@@ -21,6 +27,107 @@ def generate_text_uniform(model: dict[str, int], n: int) -> str:
     return str.join(' ', new_words)
 
 
+@dataclass
+class UniformSampler:
+    """A reusable generator of random text from one model in the format returned by
+    create_model_uniform.
+
+    The cumulative weights are computed once, when the sampler is created, rather than on every
+    call as in generate_text_uniform. Each word is then chosen with a single binary search.
+
+    Instance Attributes:
+        - words: the words of the model, in the model's order
+        - cum_weights: the sum of the frequencies of words[0], ..., words[i], for each index i
+
+    Representation Invariants:
+        - self.words != []
+        - len(self.words) == len(self.cum_weights)
+        - all(self.cum_weights[i] < self.cum_weights[i + 1] for i in range(len(self.words) - 1))
+    """
+    words: list[str]
+    cum_weights: list[int]
+
+    @classmethod
+    def from_model(cls, model: dict[str, int]) -> 'UniformSampler':
+        """Return a UniformSampler for model.
+
+        Preconditions:
+            - model != {}
+            - all(model[word] >= 1 for word in model)
+        """
+        return cls(list(model), list(itertools.accumulate(model.values())))
+
+    def sample(self, n: int, rng: Optional[random.Random] = None) -> list[str]:
+        """Return a list of n words chosen at random with rng, or with the random module if rng
+        is None.
+
+        With the random module in the same state, the words are the same as those chosen by
+        generate_text_uniform for the model this sampler was created from.
+
+        Preconditions:
+            - n >= 0
+        """
+        if rng is None:
+            rng = random
+        return rng.choices(self.words, cum_weights=self.cum_weights, k=n)
+
+    def generate(self, n: int, seed: Optional[int] = None) -> str:
+        """Return a string of n randomly-generated words, separated by single spaces.
+
+        If seed is not None, the words are chosen with a new random.Random(seed), so the same
+        seed always gives the same string.
+
+        Preconditions:
+            - n >= 0
+        """
+        rng = None if seed is None else random.Random(seed)
+        return str.join(' ', self.sample(n, rng))
+
+    def generate_batch(self, count: int, n: int, seed: Optional[int] = None) -> list[str]:
+        """Return a list of count strings, each of n randomly-generated words.
+
+        If seed is not None, every string is generated from a single random.Random(seed), so
+        the same seed always gives the same list.
+
+        Preconditions:
+            - count >= 0
+            - n >= 0
+        """
+        rng = None if seed is None else random.Random(seed)
+        return [str.join(' ', self.sample(n, rng)) for _ in range(count)]
+
+    def iter_chunks(self, n: int, seed: Optional[int] = None,
+                    chunk_words: int = DEFAULT_CHUNK_WORDS) -> Iterator[str]:
+        """Yield the text of generate(n, seed) in pieces of at most chunk_words words, so that
+        only one piece is held in memory at a time.
+
+        Joining the pieces gives exactly the string generate(n, seed) would return from the same
+        random state, since each piece continues drawing from the same random stream.
+
+        Preconditions:
+            - n >= 0
+            - chunk_words >= 1
+        """
+        rng = None if seed is None else random.Random(seed)
+        for start in range(0, n, chunk_words):
+            words = self.sample(min(chunk_words, n - start), rng)
+            if start == 0:
+                yield str.join(' ', words)
+            else:
+                yield ' ' + str.join(' ', words)
+
+    def write(self, f: TextIO, n: int, seed: Optional[int] = None,
+              chunk_words: int = DEFAULT_CHUNK_WORDS) -> None:
+        """Write the text of generate(n, seed) to f, one piece of iter_chunks at a time.
+
+        Preconditions:
+            - n >= 0
+            - chunk_words >= 1
+        """
+        for chunk in self.iter_chunks(n, seed, chunk_words):
+            f.write(chunk)
+
+
 def create_model_uniform(text: str) -> dict[str, int]:
     """Return a model of the words in text.
 
@@ -47,14 +154,23 @@ def create_model_uniform(text: str) -> dict[str, int]:
     return word_to_frequency
 
 
-def run_example(filename: str, num_words: int) -> str:
-    """Run an example to demonstrate random text generation with num_words words based on the data in filename."""
+def run_example(filename: str, num_words: int, output_path: Optional[str] = None) -> str:
+    """Run an example to demonstrate random text generation with num_words words based on the data in filename.
+
+    If output_path is not None, the generated words are streamed to the file output_path instead
+    of being returned, and output_path is returned.
+    """
     
     with open(filename) as f:
         file_text = f.read()
 
     stripped_text = str.strip(file_text)  # str.strip removes leading/trailing whitespace
     model_from_file = create_model_uniform(stripped_text)
+    if output_path is not None:
+        with open(output_path, 'w') as output:
+            UniformSampler.from_model(model_from_file).write(output, num_words)
+        return output_path
+
     generated_words = generate_text_uniform(model_from_file, num_words)
 
     return generated_words
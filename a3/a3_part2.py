@@ -1,4 +1,5 @@
 import random
+from dataclasses import dataclass
 
 def update_follow_list(model: dict[str, list[str]], word: str, follow_word: str) -> None:
     """Add follow_word and, when applicable, word to model.
@@ -42,6 +43,24 @@ def choose_from_keys(transitions: dict[str, list[str]]) -> str:
     return random.choice(keys_choice_list)
 
 
+def draw_and_remove(follow_list: list[str]) -> str:
+    """Return a random word from follow_list and remove that occurrence of it from follow_list.
+
+    Every occurrence in follow_list is equally likely to be chosen. The chosen occurrence is
+    swapped with the last one before it is removed, so the removal takes constant time, and
+    the order of the remaining words in follow_list may change.
+
+    Preconditions:
+        - follow_list != []
+    """
+    index = random.randrange(len(follow_list))
+    follow_choice = follow_list[index]
+    follow_list[index] = follow_list[-1]
+    follow_list.pop()
+
+    return follow_choice
+
+
 def choose_from_follow_list(key: str, transitions: dict[str, list[str]]) -> str:
     """Return a random word from the follow list in transitions that is associated with key.
 
@@ -53,16 +72,82 @@ def choose_from_follow_list(key: str, transitions: dict[str, list[str]]) -> str:
         - key in transitions
         - transitions[key] != []
     """
-    follow_choice_index = random.choice(range(0, len(transitions[key])))
-    follow_choice = transitions[key][follow_choice_index]
-    follow_choice_return_val = follow_choice
+    follow_choice = draw_and_remove(transitions[key])
 
     if transitions[key] == []:
         transitions.pop(key)
 
-    transitions[key].pop(follow_choice_index)
+    return follow_choice
+
+
+@dataclass
+class IndexedTransitions:
+    """A one-word-context model together with a list of its keys, so that a random key can be
+    chosen, and a key removed, in constant time.
+
+    Removing a key only removes it from transitions. Its entry in keys is left behind and is
+    discarded the first time choose_key draws it, so each removed key costs at most one extra
+    draw over the whole life of the IndexedTransitions.
+
+    Instance Attributes:
+        - transitions: the model, mapping words to a list of words that follow it
+        - keys: every key of transitions, and possibly some keys that have since been removed,
+          in no particular order
+
+    Representation Invariants:
+        - set(self.transitions) <= set(self.keys)
+        - all(self.transitions[key] != [] for key in self.transitions)
+    """
+    transitions: dict[str, list[str]]
+    keys: list[str]
+
+    @classmethod
+    def from_model(cls, transitions: dict[str, list[str]]) -> 'IndexedTransitions':
+        """Return an IndexedTransitions for transitions, without copying it.
+
+        Preconditions:
+            - all(transitions[key] != [] for key in transitions)
+        """
+        return cls(transitions, list(transitions))
+
+    def choose_key(self) -> str:
+        """Return a random key, like choose_from_keys.
+
+        Preconditions:
+            - len(self) > 0
+        """
+        while True:
+            index = random.randrange(len(self.keys))
+            key = self.keys[index]
+            if key in self.transitions:
+                return key
+
+            # Discard the removed key by moving the last key into its place
+            self.keys[index] = self.keys[-1]
+            self.keys.pop()
 
-    return follow_choice_return_val
+    def choose_follow(self, key: str) -> str:
+        """Return a random word from the follow list of key and remove it, removing key as well
+        if its follow list is then empty, like choose_from_follow_list.
+
+        Preconditions:
+            - key in self
+        """
+        return choose_from_follow_list(key, self.transitions)
+
+    def remove_key(self, key: str) -> None:
+        """Remove key and its follow list.
+
+        Preconditions:
+            - key in self
+        """
+        self.transitions.pop(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.transitions
+
+    def __len__(self) -> int:
+        return len(self.transitions)
 
 
 def generate_text_owc(count: int, transitions: dict[str, list[str]]) -> str:
@@ -72,31 +157,17 @@ def generate_text_owc(count: int, transitions: dict[str, list[str]]) -> str:
     Preconditions:
         - model is in the format described by the assignment handout
     """
+    indexed = IndexedTransitions.from_model(transitions)
+
     # ACCUMULATOR: a list of the randomly-generated words so far
     words_so_far = []
 
-    # We've provided this template as a starting point; you may modify it as necessary.
-    next_word = ''
-
-    for i in range(0, count - 1):
-        if i == 0:
-            chosen_key = choose_from_keys(transitions)
-            list.append(words_so_far, chosen_key)
-            next_word = transitions[words_so_far[i]][0]
-        elif i < count - 1:
-            if words_so_far[i - 1] not in transitions:
-                chosen_key = next_word
-            elif len(transitions[words_so_far[i - 1]]) == 1:
-                next_word = transitions[words_so_far[i - 1]][0]
-                chosen_key = words_so_far[i - 1]
-            else:
-                chosen_key = words_so_far[i - 1]
-            chosen_transition = choose_from_follow_list(chosen_key, transitions)
-            list.append(words_so_far, chosen_transition)
+    for _ in range(0, count - 1):
+        if words_so_far != [] and words_so_far[-1] in transitions:
+            next_word = choose_from_follow_list(words_so_far[-1], transitions)
         else:
-            var = [transitions[x] for x in transitions]
-            chosen_transition = var[0]
-            list.append(words_so_far, chosen_transition)
+            next_word = indexed.choose_key()
+        list.append(words_so_far, next_word)
 
     return str.join(' ', words_so_far)
 
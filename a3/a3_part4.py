@@ -1,11 +1,22 @@
 import csv  
+import warnings
+from typing import Optional
+import numpy as np
 import plotly.graph_objects as go  
   
 from a3_ffwi_system import WeatherMetrics, FfwiOutput  
+from a3_ffwi_columns import WeatherColumns, FfwiColumns
+from a3_ffwi_ensemble import EnsembleBands
+from a3_ffwi_store import FfwiSeries
 import a3_ffwi_system as ffwi  
+import a3_ffwi_cache as ffwi_cache
+import a3_ffwi_columns as columns
+import a3_ffwi_plots as plots
   
   
-def load_data(filename: str) -> tuple[list[WeatherMetrics], list[FfwiOutput]]:  
+def load_data(filename: str, columnar: bool = False, cache: bool = False,
+              cache_dir: Optional[str] = None) -> \
+        tuple[list[WeatherMetrics], list[FfwiOutput]] | tuple[WeatherColumns, FfwiColumns]:
     """Return a tuple of two parallel lists based on the data in filename. The first list contains 
     WeatherMetrics. The second list contains the corresponding FfwiOutput. 
  
@@ -13,7 +24,27 @@ def load_data(filename: str) -> tuple[list[WeatherMetrics], list[FfwiOutput]]:
     the month, day, temperature, relative humidity, wind speed, and precipitation, in that order. 
     The last six columns correspond to the FFMC, DMC, DC, ISI, BUI, and FWI values that would be 
     calculated based on the first six columns and the previous day's values. 
+
+    If columnar is True, return a WeatherColumns and an FfwiColumns instead of the two lists. 
+
+    If cache is True, the parsed data is read from (or, the first time, saved to) the binary 
+    cache in cache_dir described in a3_ffwi_cache.load_cached, so filename is only parsed again 
+    once it changes. The cached columns are read-only. 
     """  
+    if cache:
+        weather, outputs = ffwi_cache.load_cached(filename, cache_dir)
+        return (weather, outputs) if columnar else (list(weather), list(outputs))
+
+    if columnar:
+        with warnings.catch_warnings():
+            # A file with only a header has no rows, which np.loadtxt warns about
+            warnings.filterwarnings('ignore', 'loadtxt: input contained no data')
+            table = np.loadtxt(filename, delimiter=',', skiprows=1, ndmin=2)
+        if table.size == 0:
+            table = np.empty((0, 12))
+        assert table.shape[1] == 12, 'Expected every row to contain 12 elements.'
+        return columns.columns_from_table(table)
+
     # ACCUMULATOR inputs_so_far: The WeatherMetrics parsed from filename so far  
     inputs_so_far = []  
     # ACCUMULATOR outputs_so_far: The FfwiOutputs parsed from filename so far  
@@ -38,66 +69,98 @@ def load_data(filename: str) -> tuple[list[WeatherMetrics], list[FfwiOutput]]:
     return inputs_so_far, outputs_so_far  
   
   
-def calculate_ffwi_outputs(readings: list[WeatherMetrics]) -> dict[tuple[int, int], FfwiOutput]:  
+def calculate_ffwi_outputs(readings: list[WeatherMetrics] | WeatherColumns) -> \
+        dict[tuple[int, int], FfwiOutput] | FfwiColumns:
     """Return a dictionary mapping (month, day) tuples to their corresponding FfwiOutput based on 
     the daily weather measurements found in readings. 
  
     Use the functions in a3_ffwi_system for initial FFMC, DMC, and DC values and to calculate each 
-    attribute needed for FfwiOutput. 
+    attribute needed for FfwiOutput. The first reading starts from the initial values, and every 
+    later reading starts from the FFMC, DMC, and DC calculated for the reading before it. 
+
+    If readings is a WeatherColumns, calculate the season with a3_ffwi_columns.calculate_outputs, 
+    which chains the same functions over the columns, and return an FfwiColumns of the same 
+    outputs instead of a dictionary. 
  
     Preconditions: 
         - Every reading in readings has a unique (month, day) pair 
+        - readings is sorted in chronological order 
     """  
-    date_tuple_list = [(x.month, x.day) for x in readings]  
-  
-    ffmc_list = [ffwi.calculate_ffmc(x, ffwi.INITIAL_FFMC) for x in readings]  
-    dmc_list = [ffwi.calculate_dmc(x, ffwi.INITIAL_DMC) for x in readings]  
-    dc_list = [ffwi.calculate_dc(x, ffwi.INITIAL_DC) for x in readings]  
-    isi_list = [ffwi.calculate_isi(x, y) for x in readings for y in ffmc_list]  
-    bui_list = [ffwi.calculate_bui(x, y) for x in dmc_list for y in dc_list]  
-    fwi_list = [ffwi.calculate_fwi(x, y) for x in isi_list for y in bui_list]  
-  
-    ffwioutput_list = []  
-    for i in range(0, len(ffmc_list)):  
-        list.append(ffwioutput_list, FfwiOutput(ffmc_list[i], dmc_list[i], dc_list[i], isi_list[i],  
-                                                bui_list[i], fwi_list[i]))  
-  
-    return dict(zip(date_tuple_list, ffwioutput_list))  
-  
-  
-def get_xy_data(outputs: dict[tuple[int, int], FfwiOutput], attribute: str) -> \  
-        tuple[list[str], list[float]]:  
+    if isinstance(readings, WeatherColumns):
+        return columns.calculate_outputs(readings)
+
+    # ACCUMULATOR outputs_so_far: The FfwiOutput calculated for each (month, day) so far
+    outputs_so_far = {}
+
+    # The previous day's codes, carried from one reading to the next
+    ffmc = ffwi.INITIAL_FFMC
+    dmc = ffwi.INITIAL_DMC
+    dc = ffwi.INITIAL_DC
+
+    for reading in readings:
+        ffmc = ffwi.calculate_ffmc(reading, ffmc)
+        dmc = ffwi.calculate_dmc(reading, dmc)
+        dc = ffwi.calculate_dc(reading, dc)
+        isi = ffwi.calculate_isi(reading, ffmc)
+        bui = ffwi.calculate_bui(dmc, dc)
+        fwi = ffwi.calculate_fwi(isi, bui)
+        outputs_so_far[(reading.month, reading.day)] = FfwiOutput(ffmc, dmc, dc, isi, bui, fwi)
+
+    return outputs_so_far
+  
+  
+def get_xy_data(outputs: dict[tuple[int, int], FfwiOutput] | FfwiColumns | FfwiSeries,
+                attribute: str) -> tuple[list[str], list[float]]:
     """Return a tuple of two parallel lists. The first list contains the keys of outputs as 
     strings in the format 'month, day'. The second list contains the corresponding value of 
     the attribute of FfwiOutput. 
+
+    If outputs is an FfwiSeries from an a3_ffwi_store.FfwiResultStore, the first list contains 
+    its dates in the format 'YYYY-MM-DD' instead. 
  
     You can access an attribute from a data class using the getattr built-in function. For example, 
         >>> output = FfwiOutput(2.0, 3.0, 4.0, 5.0, 6.0, 7.0) 
         >>> getattr(output, 'ffmc') 
         2.0 
     """  
+    if isinstance(outputs, FfwiSeries):
+        return outputs.labels(), outputs.column(attribute).tolist()
+    if isinstance(outputs, FfwiColumns):
+        return ([f'{month}, {day}' for month, day in outputs.dates()],
+                outputs.column(attribute).tolist())
+
     output_key_list = [str(x[0]) + ", " + str(x[1]) for x in outputs]  
     attr_list = [getattr(outputs[x], attribute) for x in outputs]  
     return (output_key_list, attr_list)  
   
   
-def plot_ffwi_attribute(outputs: dict[tuple[int, int], FfwiOutput], attribute: str) -> None:  
+def plot_ffwi_attribute(outputs: dict[tuple[int, int], FfwiOutput] | FfwiColumns | FfwiSeries,
+                        attribute: str, max_points: Optional[int] = plots.DEFAULT_MAX_POINTS,
+                        webgl_threshold: int = plots.WEBGL_THRESHOLD,
+                        bands: Optional[EnsembleBands] = None) -> None:
     """Plot an attribute from FfwiOutput as a time series. 
+
+    Series with more than max_points points are downsampled to max_points points, and series 
+    with more than webgl_threshold points are drawn with WebGL (see a3_ffwi_plots.make_trace). 
+    If bands is given, the percentiles of the attribute in an ensemble run with 
+    a3_ffwi_ensemble are drawn behind the series as shaded ranges, labelled like the series. 
  
     Preconditions: 
         - attribute in {'ffmc', 'dmc', 'dc', 'isi', 'bui', 'fwi'} 
-        - outputs != {} 
+        - len(outputs) > 0 
     """  
     # Convert the outputs into parallel x and y lists  
     x_data, y_data = get_xy_data(outputs, attribute)  
   
     # Create the figure  
     fig = go.Figure()  
-    fig.add_trace(go.Scatter(x=x_data, y=y_data, name=attribute))  
+    if bands is not None:
+        plots.add_percentile_bands(fig, bands, attribute, x_data)
+    fig.add_trace(plots.make_trace(x_data, y_data, attribute, max_points, webgl_threshold))
   
-    # Configure the figure  
+    # Configure the figure, with the x-axis titled by the kind of labels in x_data  
     fig.update_layout(title=f'Time Series of {attribute}',  
-                      xaxis_title='(Month, Day)',  
+                      xaxis_title=plots.x_axis_title(outputs),
                       yaxis_title=f'Calculated {attribute}')  
   
     # Show the figure in the browser  
@@ -0,0 +1,92 @@
+"""A single-pass tokenizer for the reviews scored by a3_part3.
+
+a3_part3.clean_text calls str.replace once for each character of PUNCTUATION. tokenize instead
+encodes a review to UTF-8 and makes one pass over its bytes with bytes.translate, which replaces
+punctuation with spaces and lowercases ASCII letters at the same time. Only ASCII bytes are
+changed by the table, so the result is still valid UTF-8. A review that is not all ASCII is
+lowercased with str.lower first, so its other letters are lowercased too.
+"""
+import csv
+import string
+import time
+from typing import Iterable, Iterator
+
+from a3_part3 import PUNCTUATION, clean_text
+
+# The table used by tokenize: every ASCII uppercase letter is lowercased and every punctuation
+# mark is replaced by a space
+TOKEN_TABLE = bytes.maketrans(str.encode(string.ascii_uppercase + PUNCTUATION),
+                              str.encode(string.ascii_lowercase + ' ' * len(PUNCTUATION)))
+
+
+def tokenize(text: str) -> list[str]:
+    """Return text as a list of lowercase words with the punctuation removed.
+
+    The words are the same as a3_part3.clean_text(str.lower(text)) returns.
+    """
+    if not str.isascii(text):
+        text = str.lower(text)
+    return str.split(bytes.decode(bytes.translate(str.encode(text), TOKEN_TABLE)))
+
+
+def tokenize_batch(texts: Iterable[str]) -> list[list[str]]:
+    """Return the words of each text in texts, in order, as tokenize returns them."""
+    return [tokenize(text) for text in texts]
+
+
+def iter_tokens(texts: Iterable[str]) -> Iterator[str]:
+    """Yield every word of every text in texts, in order, as tokenize returns them.
+
+    Only one text is tokenized at a time, so texts can be a lazily-read file of any size.
+    """
+    for text in texts:
+        yield from tokenize(text)
+
+
+def iter_reviews(filename: str) -> Iterator[str]:
+    """Yield the review in each row of the CSV file filename, after its header row.
+
+    The review is the last entry of each row, as in a3_part3.read_critic_data, and the file is
+    read one row at a time.
+    """
+    with open(filename, newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield row[len(row) - 1]
+
+
+def measure_tokenizers(reviews: list[str], repeat: int = 3) -> dict[str, float]:
+    """Return the best time, out of repeat runs, to tokenize every review in reviews with
+    a3_part3.clean_text (after lowercasing, which clean_text documents) and with tokenize_batch,
+    and the number of megabytes of reviews tokenize_batch handles per second.
+
+    Preconditions:
+        - repeat >= 1
+    """
+    # ACCUMULATOR times_so_far: the time of each run of each tokenizer so far
+    times_so_far = {'clean_text_seconds': [], 'tokenize_seconds': []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = [clean_text(str.lower(review)) for review in reviews]
+        times_so_far['clean_text_seconds'].append(time.perf_counter() - start)
+        del tokens
+
+        start = time.perf_counter()
+        tokens = tokenize_batch(reviews)
+        times_so_far['tokenize_seconds'].append(time.perf_counter() - start)
+        del tokens
+
+    results = {name: min(times) for name, times in times_so_far.items()}
+    megabytes = sum(len(str.encode(review)) for review in reviews) / 1e6
+    results['tokenize_megabytes_per_second'] = megabytes / results['tokenize_seconds']
+
+    return results
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,120 @@
+"""Building uniform word models from large corpora in parallel.
+
+a3_part1.create_model_uniform needs the whole text in memory as one string. The functions in
+this module instead split each file into byte ranges of about chunk_size bytes, each ending just
+after an ASCII whitespace byte so that no word is cut in two, count the words of each range in a
+separate worker process, and merge the partial counts in file order. The merged model is the
+same dict, in the same order, as create_model_uniform would return for the files' text.
+
+The files must use an encoding in which ASCII whitespace bytes only ever encode whitespace, such
+as UTF-8 or Latin-1, so that each range can be decoded on its own.
+"""
+import locale
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+# The default number of bytes in each range of a file counted by one task
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+# The number of bytes read at a time while looking for the end of a range
+BOUNDARY_READ_SIZE = 4096
+
+# The ASCII whitespace bytes, all of which str.split treats as separators
+_WHITESPACE = re.compile(rb'[ \t\n\r\x0b\x0c\x1c-\x1f]')
+
+
+def find_chunk_ranges(filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> \
+        list[tuple[int, int]]:
+    """Return the (start, end) byte offsets of consecutive ranges that cover filename, each about
+    chunk_size bytes long and, except for the last, ending just after a whitespace byte.
+
+    Preconditions:
+        - chunk_size >= 1
+    """
+    size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+
+    with open(filename, 'rb') as f:
+        while start < size:
+            end = min(start + chunk_size, size)
+            f.seek(end)
+            while end < size:
+                block = f.read(BOUNDARY_READ_SIZE)
+                match = _WHITESPACE.search(block)
+                if match is not None:
+                    end += match.end()
+                    break
+                end += len(block)
+
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def count_range(task: tuple[str, int, int, str]) -> dict[str, int]:
+    """Return the number of times each word occurs in the byte range of a file given by task, a
+    tuple of (filename, start, end, encoding), in order of first occurrence.
+    """
+    filename, start, end, encoding = task
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+
+    return Counter(text.split())
+
+
+def merge_counts(partial_counts: Iterable[dict[str, int]]) -> dict[str, int]:
+    """Return the sum of partial_counts, with each word in the order of its first occurrence in
+    partial_counts.
+    """
+    # ACCUMULATOR model_so_far: the sum of the partial counts seen so far
+    model_so_far = Counter()
+    for counts in partial_counts:
+        model_so_far.update(counts)
+
+    return dict(model_so_far)
+
+
+def create_model_from_files(filenames: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                            max_workers: Optional[int] = None,
+                            encoding: Optional[str] = None) -> dict[str, int]:
+    """Return a model of the words in filenames, in the format returned by
+    a3_part1.create_model_uniform.
+
+    The model is the same as create_model_uniform returns for the text of the files joined by
+    whitespace. Each file is counted in ranges of about chunk_size bytes by a pool of
+    max_workers processes (by default, one per CPU); with one worker, or only one range, the
+    ranges are counted in this process instead. The files are decoded with encoding, by default
+    the same encoding as open uses.
+
+    Preconditions:
+        - chunk_size >= 1
+        - max_workers is None or max_workers >= 1
+        - encoding is None or ASCII whitespace bytes only encode whitespace in encoding
+    """
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    tasks = [(filename, start, end, encoding)
+             for filename in filenames
+             for start, end in find_chunk_ranges(filename, chunk_size)]
+
+    if max_workers == 1 or len(tasks) <= 1:
+        return merge_counts(map(count_range, tasks))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return merge_counts(executor.map(count_range, tasks))
+
+
+if __name__ == '__main__':
+    import python_ta
+    import python_ta.contracts
+    python_ta.contracts.DEBUG_CONTRACTS = False
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,324 @@
+import glob
+import random
+
+import pytest
+
+import a3_batch_generation as batch
+from a3_compact_model import CompactOwcModel
+import a3_model_files as model_files
+import a3_ngram as ngram
+import a3_part1
+import a3_part2
+import a3_part3
+import a3_sentiment_tokens as tokens
+import a3_text_corpus as corpus
+
+TEXT_FILES = sorted(glob.glob('data/texts/*.txt'))
+
+
+class TestCreateModelFromFiles:
+    """Tests for the parallel uniform model builder in a3_text_corpus."""
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+    def test_same_as_create_model_uniform(self, chunk_size: int) -> None:
+        """Test that each file's model, including the order of its words, is the same as
+        create_model_uniform's for any chunk size."""
+        for filename in TEXT_FILES:
+            with open(filename) as f:
+                expected = a3_part1.create_model_uniform(f.read().strip())
+
+            actual = corpus.create_model_from_files([filename], chunk_size, max_workers=1)
+            assert list(actual.items()) == list(expected.items())
+
+    def test_several_files_in_worker_processes(self) -> None:
+        """Test that the model of several files counted by worker processes is the model of
+        their joined text."""
+        texts = []
+        for filename in TEXT_FILES:
+            with open(filename) as f:
+                texts.append(f.read())
+        expected = a3_part1.create_model_uniform(' '.join(texts))
+
+        actual = corpus.create_model_from_files(TEXT_FILES, 10000, max_workers=2)
+        assert list(actual.items()) == list(expected.items())
+
+    def test_ranges_end_after_whitespace(self, tmp_path) -> None:
+        """Test that the chunk ranges cover the file and never split a word."""
+        filename = tmp_path / 'words.txt'
+        filename.write_text('alpha beta\tgamma\n\ndelta  epsilon')
+
+        ranges = corpus.find_chunk_ranges(str(filename), 3)
+        assert ranges == [(0, 6), (6, 11), (11, 17), (17, 24), (24, 32)]
+
+
+class TestUniformSampler:
+    """Tests for the reusable sampler in a3_part1."""
+
+    def test_same_words_as_generate_text_uniform(self) -> None:
+        """Test that, with the random module in the same state, the sampler generates the same
+        text as generate_text_uniform."""
+        model = {'a': 3, 'b': 1, 'c': 5, 'd': 2}
+        random.seed(20)
+        expected = a3_part1.generate_text_uniform(model, 200)
+        random.seed(20)
+        actual = a3_part1.UniformSampler.from_model(model).generate(200)
+
+        assert actual == expected
+
+    def test_seeded_batch(self) -> None:
+        """Test that a seeded batch is reproducible and has the requested shape."""
+        sampler = a3_part1.UniformSampler.from_model({'x': 1, 'y': 4})
+        batch = sampler.generate_batch(5, 10, seed=1)
+
+        assert batch == sampler.generate_batch(5, 10, seed=1)
+        assert len(batch) == 5
+        assert all(len(text.split()) == 10 for text in batch)
+
+
+class TestStreaming:
+    """Tests for streaming long uniform texts from a3_part1."""
+
+    def test_chunks_join_to_generate(self) -> None:
+        """Test that the streamed chunks join to the same text as generate with the same seed."""
+        sampler = a3_part1.UniformSampler.from_model({'a': 3, 'b': 1, 'c': 5})
+        chunks = list(sampler.iter_chunks(1000, seed=3, chunk_words=64))
+
+        assert len(chunks) == 16
+        assert str.join('', chunks) == sampler.generate(1000, seed=3)
+
+    def test_run_example_output_path(self, tmp_path) -> None:
+        """Test that run_example streams the same text it would return to output_path."""
+        output_path = str(tmp_path / 'generated.txt')
+        random.seed(7)
+        expected = a3_part1.run_example('data/texts/zelda.txt', 500)
+        random.seed(7)
+        assert a3_part1.run_example('data/texts/zelda.txt', 500, output_path) == output_path
+
+        with open(output_path) as f:
+            assert f.read() == expected
+
+
+class TestModelFiles:
+    """Tests for saving and loading models with a3_model_files."""
+
+    def test_uniform_round_trip(self, tmp_path) -> None:
+        """Test that a saved uniform model loads as the same dict, in the same order."""
+        with open('data/texts/alice.txt') as f:
+            model = a3_part1.create_model_uniform(f.read().strip())
+        model_files.save_uniform_model(str(tmp_path), model)
+        loaded = model_files.load_uniform_model(str(tmp_path))
+
+        assert list(loaded.to_dict().items()) == list(model.items())
+        assert loaded.sampler() == a3_part1.UniformSampler.from_model(model)
+
+    def test_owc_round_trip(self, tmp_path) -> None:
+        """Test that a saved one-word-context model loads as the same dict and word count."""
+        with open('data/texts/alice.txt') as f:
+            word_count, model = a3_part2.create_model_owc(f.read().strip())
+        model_files.save_owc_model(str(tmp_path), word_count, model)
+        loaded = model_files.load_owc_model(str(tmp_path))
+
+        assert loaded.word_count == word_count
+        assert list(loaded.to_dict().items()) == list(model.items())
+        assert loaded.follow_list(1) == list(model.values())[1]
+
+    def test_wrong_kind(self, tmp_path) -> None:
+        """Test that loading a uniform model as a one-word-context model raises a ValueError."""
+        model_files.save_uniform_model(str(tmp_path), {'a': 1})
+        with pytest.raises(ValueError):
+            model_files.load_owc_model(str(tmp_path))
+
+
+class TestFollowListDraws:
+    """Tests for the constant-time follow list draws in a3_part2."""
+
+    def test_draws_every_occurrence_once(self) -> None:
+        """Test that drawing until a follow list is empty returns each occurrence once."""
+        follow_list = ['a', 'b', 'a', 'c', 'd']
+        draws = [a3_part2.draw_and_remove(follow_list) for _ in range(5)]
+
+        assert follow_list == []
+        assert sorted(draws) == ['a', 'a', 'b', 'c', 'd']
+
+    def test_same_first_draw_as_random_index(self) -> None:
+        """Test that a draw picks the occurrence at the same random index as random.choice
+        over the indexes of the follow list would."""
+        random.seed(11)
+        expected_index = random.choice(range(0, 6))
+        random.seed(11)
+
+        assert a3_part2.draw_and_remove(list('uvwxyz')) == 'uvwxyz'[expected_index]
+
+    def test_generate_text_owc_follows_transitions(self) -> None:
+        """Test that every generated word either follows the previous word in the text or is a
+        key chosen because the previous word had no transitions left."""
+        with open('data/texts/alice.txt') as f:
+            word_count, model = a3_part2.create_model_owc(f.read().strip())
+        original = {key: list(follow_list) for key, follow_list in model.items()}
+        words = a3_part2.generate_text_owc(word_count, model).split()
+
+        assert len(words) == word_count - 1
+        assert all(words[i + 1] in original.get(words[i], []) or words[i + 1] in original
+                   for i in range(len(words) - 1))
+
+
+class TestIndexedTransitions:
+    """Tests for the indexed key set in a3_part2."""
+
+    def test_removes_emptied_keys(self) -> None:
+        """Test that a key is removed from both the model and the key list once its follow list
+        is empty."""
+        transitions = {'The': ['cat'], 'cat': ['in', 'on'], 'in': ['the']}
+        indexed = a3_part2.IndexedTransitions.from_model(transitions)
+
+        assert indexed.choose_follow('The') == 'cat'
+        assert transitions == {'cat': ['in', 'on'], 'in': ['the']}
+        assert 'The' not in indexed
+        assert len(indexed) == 2
+
+    def test_choose_key_is_a_key(self) -> None:
+        """Test that every chosen key is still in the model."""
+        indexed = a3_part2.IndexedTransitions.from_model({'a': ['b'], 'b': ['c'], 'c': ['a']})
+        indexed.remove_key('a')
+
+        assert {indexed.choose_key() for _ in range(50)} == {'b', 'c'}
+        assert sorted(indexed.keys) == ['b', 'c']
+
+
+class TestCompactOwcModel:
+    """Tests for the interned CSR model in a3_compact_model."""
+
+    def test_same_model_as_create_model_owc(self) -> None:
+        """Test that the compact model of every text converts to the same dict, in the same
+        order, as create_model_owc's, directly and through from_dict."""
+        for filename in TEXT_FILES:
+            with open(filename) as f:
+                text = f.read().strip()
+            word_count, model = a3_part2.create_model_owc(text)
+            compact = CompactOwcModel.from_text(text)
+
+            assert compact.word_count == word_count
+            assert list(compact.to_dict().items()) == list(model.items())
+            assert list(CompactOwcModel.from_dict(word_count, model).to_dict().items()) == \
+                list(model.items())
+
+    def test_same_text_as_generate_text_owc(self) -> None:
+        """Test that, with the random module in the same state, the compact model generates the
+        same text as generate_text_owc and is not modified."""
+        with open('data/texts/alice.txt') as f:
+            text = f.read().strip()
+        word_count, model = a3_part2.create_model_owc(text)
+        compact = CompactOwcModel.from_text(text)
+
+        random.seed(5)
+        expected = a3_part2.generate_text_owc(word_count, model)
+        random.seed(5)
+        assert compact.generate() == expected
+        assert list(compact.to_dict().items()) == \
+            list(a3_part2.create_model_owc(text)[1].items())
+
+    def test_from_model_file(self, tmp_path) -> None:
+        """Test that a saved model loads as the same compact model."""
+        word_count, model = a3_part2.create_model_owc('a b a c b a d')
+        model_files.save_owc_model(str(tmp_path), word_count, model)
+        compact = CompactOwcModel.from_model_file(model_files.load_owc_model(str(tmp_path)))
+
+        assert compact.to_dict() == model
+        assert compact.generate(10, seed=3) == CompactOwcModel.from_dict(
+            word_count, model).generate(10, seed=3)
+
+
+class TestNgramModel:
+    """Tests for the k-word context models in a3_ngram."""
+
+    @pytest.mark.parametrize('k', [1, 2, 3, 4, 5])
+    def test_same_model_as_create_model_ngram(self, k: int) -> None:
+        """Test that the compact model converts to the same dict as create_model_ngram, and that
+        every context can be found through the hash table."""
+        with open('data/texts/alice.txt') as f:
+            text = f.read().strip()
+        word_count, expected = ngram.create_model_ngram(text, k)
+        model = ngram.NgramModel.from_text(text, k)
+
+        assert model.word_count == word_count
+        assert list(model.to_dict().items()) == list(expected.items())
+        assert all(model.find_context(context) == c
+                   for c, context in enumerate(model.contexts.tolist()))
+        assert model.find_context([len(model.words)] * k) == -1
+
+    def test_one_word_context_matches_generate_text_owc(self) -> None:
+        """Test that with k == 1 and the random module in the same state, the generated text is
+        the same as generate_text_owc's."""
+        with open('data/texts/shakespeare.txt') as f:
+            text = f.read().strip()
+        word_count, model = a3_part2.create_model_owc(text)
+
+        random.seed(9)
+        expected = a3_part2.generate_text_owc(word_count, model)
+        random.seed(9)
+        assert ngram.NgramModel.from_text(text, 1).generate() == expected
+
+    def test_generate_with_replacement(self) -> None:
+        """Test that drawing with replacement can generate more words than the text has."""
+        model = ngram.NgramModel.from_text('a b c a b d a b c', 2)
+        words = model.generate(100, seed=2, replace=True).split()
+
+        assert len(words) == 99
+        assert set(words) <= {'a', 'b', 'c', 'd'}
+
+
+class TestBatchGeneration:
+    """Tests for generating documents from a shared model with a3_batch_generation."""
+
+    def test_document_same_as_compact_generate(self, tmp_path) -> None:
+        """Test that a document drawn through the overlay is the text the compact model generates
+        with the same seed, and that the shared model is not modified."""
+        with open('data/texts/alice.txt') as f:
+            compact = CompactOwcModel.from_text(f.read().strip())
+        batch.save_shared_model(str(tmp_path), compact)
+        shared = batch.SharedOwcModel.load(str(tmp_path))
+
+        for count in [1, 2, 300, compact.word_count]:
+            assert batch.generate_document(shared, count, 4) == compact.generate(count, 4)
+        assert list(shared.model.to_dict().items()) == list(compact.to_dict().items())
+
+    def test_same_documents_for_any_workers(self, tmp_path) -> None:
+        """Test that a batch depends only on its seed, not on the number of workers or the size
+        of the ranges they are sent."""
+        batch.save_shared_model(str(tmp_path), CompactOwcModel.from_text('a b a c b a d c a'))
+        documents = batch.generate_documents(str(tmp_path), 9, seed=3, max_workers=1)
+
+        assert len(documents) == 9
+        assert all(len(document.split()) == 8 for document in documents)
+        assert batch.generate_documents(str(tmp_path), 9, seed=3, max_workers=2,
+                                        chunk_size=2) == documents
+        assert batch.generate_documents(str(tmp_path), 9, seed=4, max_workers=1) != \
+            documents
+
+
+class TestSentimentTokens:
+    """Tests for the single-pass review tokenizer in a3_sentiment_tokens."""
+
+    def test_same_words_as_clean_text(self) -> None:
+        """Test that every review, including one with non-ASCII letters, is tokenized into the
+        same words as the lowercased review is by clean_text."""
+        reviews = [a3_part3.read_critic_data(filename)
+                   for filename in sorted(glob.glob('data/reviews/*.csv'))]
+        reviews.append('DÉJÀ-VU! \u03a3\u039f\u03a6\u0399\u0391 (Excellent), "terrible"...')
+
+        for review in reviews:
+            assert tokens.tokenize(review) == a3_part3.clean_text(str.lower(review))
+        assert tokens.tokenize_batch(reviews) == [tokens.tokenize(review) for review in reviews]
+
+    def test_iter_tokens_from_review_dump(self, tmp_path) -> None:
+        """Test that the tokens of a CSV dump of reviews are yielded lazily and in order."""
+        filename = tmp_path / 'reviews.csv'
+        filename.write_text('critic,review\na,"Amusing, BRILLIANTLY so!"\nb,Terrible.\n')
+        words = tokens.iter_tokens(tokens.iter_reviews(str(filename)))
+
+        assert next(words) == 'amusing'
+        assert list(words) == ['brilliantly', 'so', 'terrible']
+
+
+if __name__ == '__main__':
+    pytest.main(['a3_text_tests.py'])